@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# - program.json 저장: 예전 (rm + sleep 0.3 + 쓰기) vs atomic replace (fsync 끄고/켜고)
+#   저장하는 동안 다른 thread 가 계속 읽어도 반쯤 쓴 파일을 보지 않는지,
+#   쓰던 process 가 죽어도 예전 파일이 그대로인지 확인한다 (SQLite stand-in)
+#   python -m bench.bench_atomic [saves]
+import os, sys, json, logging, tempfile, threading, subprocess, time
+
+from lib.log import logger
+from utils.json import save_json, load_json
+from bench.fixtures import TOP_DIR, make_stand_in, configure, load_dump, Timer, report
+
+
+def reference_save_program(program_data, program_path):
+    """예전 _save_program 의 program.json 저장: rm 으로 지우고 0.3 초 기다린 뒤 json.dump (indent=2)"""
+    subprocess.call("rm %s" % (program_path), shell = True, stderr = subprocess.DEVNULL)
+    time.sleep(0.3)
+    with open(program_path, "w", encoding="utf-8") as f:
+        json.dump(program_data, f, ensure_ascii=False, indent=2)
+
+def concurrent_readers(path, versions, saves):
+    """writer 가 versions 를 번갈아 쓰는 동안 reader 가 읽은 것: 모두 versions 중 하나여야 한다"""
+    stop, seen, errors = threading.Event(), [0], []
+    save_json(versions[-1], path, compact=True)
+
+    def reader():
+        while not stop.is_set():
+            try:
+                data = load_json(path)
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            if data not in versions:
+                errors.append("partial or unknown content (%s rows)" % len(data))
+            seen[0] += 1
+
+    t = threading.Thread(target=reader)
+    t.start()
+    try:
+        for i in range(saves):
+            save_json(versions[i % len(versions)], path, compact=True)
+    finally:
+        stop.set()
+        t.join()
+    return seen[0], errors
+
+CRASH = """
+import os, sys
+sys.path.insert(0, %r)
+from utils.json import save_json_stream
+def rows():
+    for i in range(100000):
+        if i == 5000:
+            os._exit(1)  # 쓰는 중에 process 가 죽는다
+        yield {"i": i}
+save_json_stream(rows(), %r)
+"""
+
+def run(work_dir, saves=50):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    program_path = config.run_drv["program_path"]
+    report_path = config.run_drv["program_report_path"]
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        db = p.sys_db_ctrl.open_db()
+        p.export_data_table(db)
+        db.Close()
+        programs = {"must-have": p.build_1program(["must-have.json"], "bench"), "M_HISTORY": load_dump("M_HISTORY")}
+
+        # 1. 저장 시간
+        for name, program in programs.items():
+            with Timer() as t:
+                reference_save_program(program, program_path)
+            results.append(("%s: rm + sleep + json.dump" % name, len(program), t.elapsed))
+            for fsync in (False, True):
+                with Timer() as t:
+                    save_json(program, program_path, compact=True, fsync=fsync)
+                results.append(("%s: atomic (fsync %s)" % (name, "on" if fsync else "off"), len(program), t.elapsed))
+                assert load_json(program_path) == program
+            with Timer() as t:
+                p._save_program(program, [], program_path, report_path)
+            results.append(("%s: _save_program" % name, len(program), t.elapsed))
+        with Timer() as t:
+            p.build_1program(["must-have.json"], "bench")
+        results.append(("build_1program (must-have)", len(programs["must-have"]), t.elapsed))
+
+        # 2. 저장하는 동안 읽기
+        versions = [programs["M_HISTORY"], programs["M_HISTORY"][:len(programs["M_HISTORY"]) // 2]]
+        reads, errors = concurrent_readers(program_path, versions, saves)
+        assert not errors, errors[:3]
+        logger.warning("%s reads during %s saves: never a partial file", reads, saves)
+
+        # 3. export_programs 는 있는 파일을 다 쓴 뒤에 바꾼다
+        desps = sorted({r["DESP"] for r in programs["M_HISTORY"]})
+        db = p.sys_db_ctrl.open_db()
+        try:
+            for desp_list in (desps, desps[:3]):
+                cnt, path = p.export_programs(db, desp_list, "exported_programs.json")
+                assert len(load_json(path)) == cnt
+        finally:
+            db.Close()
+
+        # 4. 쓰던 process 가 죽어도 예전 파일은 그대로
+        target = os.path.join(work_dir, "crash.json")
+        save_json(versions[1], target)
+        subprocess.call([sys.executable, "-c", CRASH % (TOP_DIR, target)])
+        assert load_json(target) == versions[1]
+        leftovers = [n for n in os.listdir(work_dir) if n.startswith("crash.json.") and n.endswith(".tmp")]
+        logger.warning("killed writer: %s is intact, %s temp file left behind", target, len(leftovers))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("program.json save: rm + sleep vs atomic replace", results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# - 분석 항목 match: text 먼저 (exact hash) vs CODE 먼저 (primary key + text 검증)
+#   python -m bench.bench_code [items]
+import sys, random, logging, tempfile
+
+from lib.log import logger
+from utils.snapshot import load_table
+from utils.match_index import CodeIndex
+from bench.fixtures import make_stand_in, configure, Timer, report
+
+
+def analysis_items(table, n, seed=0):
+    """M_DATA row 에서 만든 분석 항목. 1/10 은 code 와 text 가 다르고, 1/20 은 없는 code"""
+    rnd = random.Random(seed)
+    items = []
+    for i in range(n):
+        r = table[rnd.randrange(len(table))]
+        item = {"cat": r["TYPE"], "subcat": r["ITEM"], "description": r["MEMO"], "code": r["CODE"]}
+        if i % 10 == 9:
+            item["description"] = "다른 설명 %d" % i
+        elif i % 20 == 4:
+            item["code"] = "X%07d" % i
+        items.append(item)
+    return items
+
+def run(work_dir, n_items=20000):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    p.fuzzy_match = p.fuzzy_report = False
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.ERROR)
+    try:
+        db = p.sys_db_ctrl.open_db()
+        p.export_data_table(db)
+        db.Close()
+
+        path = p._get_data_table_path()
+        table = load_table(path)
+        hash_table = p.load_hash(table, path)
+        with Timer() as t:
+            code_index = CodeIndex(table)
+        results.append(("build CODE index", len(table), t.elapsed))
+
+        items = analysis_items(table, n_items)
+        with Timer() as t:
+            text_first = p._build_1program(hash_table, items, "bench")
+        results.append(("text first", len(items), t.elapsed))
+        with Timer() as t:
+            code_first = p._build_1program(hash_table, items, "bench", None, code_index)
+        results.append(("code first + text validation", len(items), t.elapsed))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("Analysis item lookup: text vs CODE", results)
+    for name, r in (("text first", text_first), ("code first", code_first)):
+        multi = sum(1 for m in r[4] if len(m["matched"]) > 1)
+        logger.info("    %-12s rows %6s, dropped %5s, multi-row hits %5s, mismatches %5s", name, 
+                    r[0], r[2], multi, sum(1 for m in r[4] if m.get("mismatch")))
+    # code 로 찾은 항목은 정확히 그 code 의 row 하나
+    assert all(m["matched"] == [m["code"]] for m in code_first[4] if m["mode"] == "code")
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
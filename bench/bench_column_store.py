@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# - M_DATA / M_HISTORY 의 질문: Jet(SQL) query vs dict loop vs column store (NumPy)
+#   주파수 대역의 CODE, DESP 별 시간 합, GRP 분포, TYPE 별 DATA2 평균을 세 방법으로 답하고
+#   결과가 모두 같은지 확인한다 (SQLite stand-in)
+#   python -m bench.bench_column_store [repeat] [history_scale]
+import sys, math, logging, tempfile
+from collections import Counter, defaultdict
+
+from lib.log import logger
+from utils.json import load_json
+from utils.column_store import ColumnStore, codes_in_band, program_durations, grp_distribution
+from bench.fixtures import make_stand_in, configure, Timer, report
+from bench.bench_insert import history_rows
+
+BAND = (10.0, 20.0)
+
+
+def same_sums(a, b):
+    return a.keys() == b.keys() and all(math.isclose(a[k], b[k], rel_tol=1e-9, abs_tol=1e-9) for k in a)
+
+def timed(results, name, repeat, fn):
+    with Timer() as t:
+        for _ in range(repeat):
+            out = fn()
+    results.append(("%s x%d" % (name, repeat), len(out) * repeat, t.elapsed))
+    return out
+
+def run(work_dir, repeat=20, scale=10):
+    sys_path, ext_path = make_stand_in(work_dir, seed_history=False)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    history = history_rows(scale)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    db = p.sys_db_ctrl.open_db()
+    try:
+        p.bulk_insert(db, p.program_table, p.program_table_ddl, history, 2000)
+        p.export_data_table(db)
+        rows = load_json(config.run_drv["data_table_path"])
+
+        # -------- Build
+        with Timer() as t:
+            data = ColumnStore.from_snapshot(config.run_drv["data_snapshot_path"])
+        results.append(("build M_DATA from snapshot", len(data), t.elapsed))
+        with Timer() as t:
+            data_json = ColumnStore.from_rows(p.data_table, rows)
+        results.append(("build M_DATA from data_table.json", len(data_json), t.elapsed))
+        with Timer() as t:
+            hist = p.column_store(p.program_table, db)
+        results.append(("build M_HISTORY from query", len(hist), t.elapsed))
+        assert data.take() == data_json.take() == rows
+        assert len(hist) == len(history)
+        lo, hi = BAND
+
+        # -------- 주파수 대역의 CODE
+        q = "SELECT CODE FROM M_DATA WHERE DATA1 BETWEEN %s AND %s ORDER BY CODE" % BAND
+        by_sql = timed(results, "band: SQL", repeat, lambda: [r["CODE"] for r in p.sql.query(db, q, cache=False)])
+        by_loop = timed(results, "band: dict loop", repeat,
+                        lambda: [r["CODE"] for r in rows if r["DATA1"] is not None and lo <= r["DATA1"] <= hi])
+        by_store = timed(results, "band: column store", repeat, lambda: codes_in_band(data, lo, hi))
+        assert sorted(by_loop) == sorted(by_store) == by_sql and by_sql
+
+        # 대역 + TYPE
+        kind = rows[0]["TYPE"]
+        by_loop = [r["CODE"] for r in rows if r["TYPE"] == kind and r["DATA1"] is not None and lo <= r["DATA1"] <= hi]
+        assert codes_in_band(data, lo, hi, data.isin("TYPE", kind)) == by_loop
+
+        # -------- DESP 별 시간 합
+        q = "SELECT DESP, SUM(DATA2) AS TOTAL FROM M_HISTORY GROUP BY DESP"
+        by_sql = timed(results, "durations: SQL", repeat,
+                       lambda: {r["DESP"]: r["TOTAL"] for r in p.sql.query(db, q, cache=False)})
+
+        def durations_loop():
+            out = defaultdict(float)
+            for r in history:
+                if r["DATA2"] is not None:
+                    out[r["DESP"]] += r["DATA2"]
+            return out
+        by_loop = timed(results, "durations: dict loop", repeat, durations_loop)
+        by_store = timed(results, "durations: column store", repeat, lambda: program_durations(hist))
+        assert same_sums(by_sql, by_loop) and same_sums(by_loop, by_store)
+
+        # -------- GRP 분포
+        q = "SELECT GRP, COUNT(*) AS N FROM M_DATA GROUP BY GRP"
+        by_sql = timed(results, "GRP: SQL", repeat,
+                       lambda: {r["GRP"]: r["N"] for r in p.sql.query(db, q, cache=False)})
+        by_loop = timed(results, "GRP: dict loop", repeat, lambda: Counter(r["GRP"] for r in rows))
+        by_store = timed(results, "GRP: column store", repeat, lambda: grp_distribution(data))
+        assert by_sql == dict(by_loop) == by_store
+
+        # -------- TYPE 별 DATA2 (분) 평균, 최소, 최대
+        def stats_loop():
+            groups = defaultdict(list)
+            for r in rows:
+                if r["DATA2"] is not None:
+                    groups[r["TYPE"]].append(r["DATA2"])
+            return {k: (sum(v) / len(v), min(v), max(v)) for k, v in groups.items()}
+        by_loop = timed(results, "TYPE stats: dict loop", repeat, stats_loop)
+
+        def stats_store():
+            mean, lo_, hi_ = (data.group_by("TYPE", "DATA2", agg) for agg in ("mean", "min", "max"))
+            return {k: (mean[k], lo_[k], hi_[k]) for k in mean}
+        by_store = timed(results, "TYPE stats: column store", repeat, stats_store)
+        assert by_loop.keys() == by_store.keys()
+        assert all(all(math.isclose(a, b, rel_tol=1e-9) for a, b in zip(by_loop[k], by_store[k])) for k in by_loop)
+    finally:
+        db.Close()
+        logging.getLogger().setLevel(level)
+
+    logger.info("column store: M_DATA %.1f MB, M_HISTORY %.1f MB", data.nbytes() / 1e6, hist.nbytes() / 1e6)
+    report("M_DATA (%s rows) / M_HISTORY (%s rows) queries" % (len(data), len(hist)), results)
+    return results
+
+
+if __name__ == "__main__":
+    argv = [int(a) for a in sys.argv[1:3]]
+    with tempfile.TemporaryDirectory() as d:
+        run(d, *argv)
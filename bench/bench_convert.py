@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# - 값 변환: 예전 lru_cache(maxsize=50000) normalize_value/restore_value vs ddl 의 변환 plan
+#   64k M_DATA + M_HISTORY row 를 JSON → DAO (restore), DAO → JSON (read) 로 바꾼다.
+#   결과가 같은지 확인하고, 시간과 변환이 끝난 뒤에도 남는 메모리 (cache) 를 잰다
+#   python -m bench.bench_convert
+import json, logging, datetime, tracemalloc
+from decimal import Decimal
+from functools import lru_cache
+
+from lib.log import logger
+from utils.db_ctrl import DbCtrl, PlanCache
+from bench.fixtures import TOP_DIR, load_dump, make_data_rows, Timer, report
+
+
+@lru_cache(maxsize=50000)
+def reference_normalize(v):
+    """예전 DbCtrl.normalize_value: 값마다 isinstance 로 type 을 물어본다 (lru_cache 로 값을 기억)"""
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, datetime.datetime):
+        return v.isoformat()
+    if isinstance(v, datetime.date):
+        return v.isoformat()
+    return v
+
+@lru_cache(maxsize=50000)
+def reference_restore(v, field_type):
+    """예전 DbCtrl.restore_value: 값마다 field_type 을 비교한다 (lru_cache 로 (값, type) 을 기억)"""
+    if v is None:
+        return None
+    if field_type in (3, 4, 5, 6, 7):
+        return Decimal(str(v))
+    if field_type == 8:
+        try:
+            return datetime.datetime.fromisoformat(v)
+        except Exception:
+            return v
+    return v
+
+
+def restore_reference(rows, table_ddl):
+    return [[reference_restore(v, table_ddl[k]) for k, v in row.items()] for row in rows]
+
+def restore_plan(rows, table_ddl):
+    plans = PlanCache(table_ddl)
+    return [DbCtrl.apply_plan(plans.get(row), row.values()) for row in rows]
+
+def read_reference(values_list):
+    return [[reference_normalize(v) for v in values] for values in values_list]
+
+def read_plan(values_list, plan):
+    return [DbCtrl.apply_plan(plan, values) for values in values_list]
+
+
+def measure(fn, *args):
+    """(초, 결과를 버린 뒤에도 남은 byte). 시간은 tracemalloc 없이 따로 잰다"""
+    with Timer() as t:
+        fn(*args)
+    reference_restore.cache_clear()
+    reference_normalize.cache_clear()
+    tracemalloc.start()
+    out = fn(*args)
+    del out
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return t.elapsed, retained
+
+def run():
+    with open("%s/db/ddl.json" % TOP_DIR, "r", encoding="utf-8") as f:
+        ddl = json.load(f)
+    tables = {"M_DATA": make_data_rows(), "M_HISTORY": load_dump("M_HISTORY")}
+
+    results, memory = [], []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        for table_name, rows in tables.items():
+            table_ddl = {f["name"]: f["type"] for f in ddl[table_name]["fields"]}
+            fields = list(rows[0])
+
+            # 1. 같은 결과
+            restored = restore_plan(rows, table_ddl)
+            assert restored == restore_reference(rows, table_ddl)
+            assert all(type(a) is type(b) for a, b in zip(restored[0], restore_reference(rows[:1], table_ddl)[0]))
+            plan = DbCtrl.read_plan(table_ddl, fields)
+            read = read_plan(restored, plan)
+            assert read == read_reference(restored)
+            assert [dict(zip(fields, r)) for r in read] == rows  # JSON → DAO → JSON
+            assert DbCtrl.insert_sql(table_name, table_ddl, rows[0]) == \
+                DbCtrl.insert_sql(table_name, table_ddl, rows[0], PlanCache(table_ddl).get(rows[0]))
+
+            # 2. 시간과 남는 메모리. lru_cache 는 비우고 시작한다
+            for name, fn, args in (
+                    ("restore lru_cache", restore_reference, (rows, table_ddl)),
+                    ("restore plan", restore_plan, (rows, table_ddl)),
+                    ("read lru_cache", read_reference, (restored,)),
+                    ("read plan", read_plan, (restored, plan))):
+                reference_restore.cache_clear()
+                reference_normalize.cache_clear()
+                elapsed, retained = measure(fn, *args)
+                results.append(("%s %s" % (name, table_name), len(rows), elapsed))
+                cache = reference_restore.cache_info() if name.startswith("restore") \
+                    else reference_normalize.cache_info()
+                memory.append((name, table_name, retained, cache.currsize))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("Value conversion (JSON ↔ DAO)", results)
+    logger.info("Memory left after the conversion (the cache)")
+    for name, table_name, retained, currsize in memory:
+        logger.info("    %-20s %-10s %10.1f KB  %6s cache entries", name, table_name,
+                    retained / 1024.0, currsize)
+    return results, memory
+
+
+if __name__ == "__main__":
+    run()
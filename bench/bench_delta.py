@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# - Incremental (delta) export vs 전체 export: M_DATA, M_HISTORY
+#   python -m bench.bench_delta
+import os, logging, tempfile
+
+from lib.log import logger
+from utils import delta
+from utils.json import save_json_stream
+from bench.fixtures import make_stand_in, configure, Timer, report
+
+
+def by_key(rows, pk):
+    return sorted(rows, key=lambda r: delta.row_key(r, pk))
+
+def run(work_dir):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    tables = (p.data_table, p.program_table)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        db = p.sys_db_ctrl.open_db()
+        # 1) 전체 export (예전 방식)
+        for t in tables:
+            rows = p._iter_data_table(db) if t == p.data_table else \
+                   p.sql.iter_query(db, "SELECT * FROM %s" % t)
+            with Timer() as tm:
+                n = save_json_stream(rows, os.path.join(work_dir, "%s.full.json" % t))
+            results.append(("full export %s" % t, n, tm.elapsed))
+
+        # 2) 처음 delta export = base
+        for t in tables:
+            with Timer() as tm:
+                r = p.export_delta(db, t)
+            results.append(("delta v0 (base) %s" % t, r["inserted"], tm.elapsed))
+        db.Close()
+
+        # 3) MDB 가 그대로: table 을 읽지 않는다
+        db = p.sys_db_ctrl.open_db()
+        for t in tables:
+            with Timer() as tm:
+                r = p.export_delta(db, t)
+            assert r.get("skipped"), r
+            results.append(("unchanged MDB %s" % t, 0, tm.elapsed))
+
+        # 4) 하루치 변경: 새 program 하나, M_DATA row 수정/삭제
+        history = p.sql.query(db, "SELECT * FROM M_HISTORY")
+        desp = history[0]["DESP"]
+        new_program = [dict(r, DESP=desp + "_new") for r in history if r["DESP"] == desp]
+        p.bulk_insert(db, p.program_table, p.program_table_ddl, new_program)
+        db.Execute("UPDATE M_DATA SET MEMO = 'changed' WHERE CODE = 'A0877019'")
+        db.Execute("DELETE FROM M_DATA WHERE CODE = 'A0648013'")
+        db.Execute("DELETE FROM M_HISTORY WHERE DESP = '%s' AND CODE = '%s'" % (
+                   history[-1]["DESP"].replace("'", "''"), history[-1]["CODE"]))
+        for t in tables:
+            with Timer() as tm:
+                r = p.export_delta(db, t, force=True)
+            changed = r["inserted"] + r["updated"] + r["deleted"]
+            results.append(("delta v1 %s (%s changed)" % (t, changed), changed, tm.elapsed))
+            logger.warning("    %s: %s", t, {k: r[k] for k in ("inserted", "updated", "deleted", "unchanged")})
+
+        # 5) base + delta 를 replay 한 결과 == 지금 table
+        for t in tables:
+            pk = delta.primary_key(p.ddl, t)
+            current = list(p._iter_data_table(db)) if t == p.data_table else \
+                      p.sql.query(db, "SELECT * FROM %s" % t)
+            with Timer() as tm:
+                replayed = delta.replay(config.run_drv["delta_dir"], t)
+            assert by_key(replayed, pk) == by_key(current, pk), t
+            results.append(("replay %s" % t, len(replayed), tm.elapsed))
+            delta.compact(config.run_drv["delta_dir"], t)
+            assert by_key(delta.replay(config.run_drv["delta_dir"], t), pk) == by_key(current, pk), t
+        db.Close()
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("Delta export", results)
+    for path in sorted(os.listdir(config.run_drv["delta_dir"])):
+        logger.info("    %-36s %10s bytes", path, os.path.getsize(os.path.join(config.run_drv["delta_dir"], path)))
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# - 모든 table 의 dump (1 worker vs 4 workers) 와 빈 DB 로의 restore
+#   python -m bench.bench_dump
+import os, logging, tempfile
+
+from lib.log import logger
+from utils import dump
+from utils.json import load_json
+from utils.db_ctrl import DbCtrl
+from utils.delta import primary_key, row_key
+from bench.fixtures import OUTPUT_DIR, make_stand_in, configure, Timer, report
+
+
+def run(work_dir):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    dump_dir = config.run_drv["dump_dir"]
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        for workers in (1, 4):
+            with Timer() as t:
+                reports = dump.dump_tables(p.sys_db_ctrl, dump_dir, p.ddl, workers=workers)
+            results.append(("dump, %s worker(s)" % workers, sum(r["rows"] for r in reports), t.elapsed))
+            assert all(r["rows"] == r["db_rows"] for r in reports)
+        counts = load_json(os.path.join(dump_dir, dump.COUNT_FILE))
+        assert list(counts) == list(p.ddl)
+
+        # 예전 dump 와 같은 형식, 같은 row
+        for name in ("M_HISTORY", "M_LIST", "GRP"):
+            assert load_json(dump.dump_path(dump_dir, name)) == \
+                   load_json(dump.dump_path(OUTPUT_DIR, name)), name
+
+        # PK 가 겹치는 row 를 하나 넣어 두고 빈 DB 로 restore
+        rows = load_json(dump.dump_path(dump_dir, "M_HISTORY"))
+        from utils.json import save_json
+        save_json(rows + rows[:1], dump.dump_path(dump_dir, "M_HISTORY"))
+        order = dump.dependency_order(p.ddl)
+        logger.warning("    restore order: %s", order)
+        assert order.index("M_DATA") < order.index("M_HISTORY")
+
+        target = DbCtrl(os.path.join(work_dir, "restored.db"), config.password, config.backend)
+        with Timer() as t:
+            reports = dump.restore_tables(target, dump_dir, p.ddl)
+        results.append(("restore into an empty db", sum(r["inserted"] for r in reports), t.elapsed))
+        assert all(r["db_rows"] == r["expected"] for r in reports), reports
+        assert [r["duplicates"] for r in reports if r["table"] == "M_HISTORY"] == [1]
+
+        # 다시 dump 하면 같은 row
+        with target.connection() as db:
+            pk = primary_key(p.ddl, "M_DATA")
+            restored = sorted(target.iter_table(db, "M_DATA"), key=lambda r: row_key(r, pk))
+        original = sorted(load_json(dump.dump_path(dump_dir, "M_DATA")), key=lambda r: row_key(r, pk))
+        assert restored == original
+
+        # 비우지 못한 table 은 보고하고 넣지 않는다. 나머지는 그대로 restore 한다
+        ddl = dict(p.ddl, NO_SUCH_TABLE=p.ddl["GRP"])
+        save_json(load_json(dump.dump_path(dump_dir, "GRP")), dump.dump_path(dump_dir, "NO_SUCH_TABLE"))
+        reports = {r["table"]: r for r in dump.restore_tables(target, dump_dir, ddl)}
+        assert reports["NO_SUCH_TABLE"]["error"] and reports["NO_SUCH_TABLE"]["inserted"] == 0
+        assert all(r["db_rows"] == r["expected"] for t, r in reports.items() if t != "NO_SUCH_TABLE")
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("Dump / restore of %s tables" % len(p.ddl), results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d)
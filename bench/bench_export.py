@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# - M_DATA export: list 로 모아서 save_json vs iter_query + save_json_stream
+#   peak memory(tracemalloc) 와 시간을 비교하고 두 파일이 byte 단위로 같은지 확인한다
+#   ProgramCtrl.export_data_table (json + snapshot + match index 를 한 번에) 의 peak 도 잰다
+#   python -m bench.bench_export [rows]
+import os, sys, logging, tempfile, tracemalloc
+
+from lib.log import logger
+from utils.db_ctrl import DbCtrl
+from utils.sql import Sql
+from utils.json import save_json, save_json_stream, load_json
+from utils.snapshot import load_table
+from utils.match_index import MatchIndex, index_path_for
+from bench.fixtures import make_stand_in, configure, Timer, report, M_DATA_ROWS
+from bench.bench_read import DATA_TABLE_SQL
+
+
+def export_all(work_dir, sys_path, ext_path, n_data):
+    """
+    export_data_table: json + snapshot, 그리고 기본값 (+ match index). table 을 메모리에 모으지 않는다.
+    index 는 그 자체 (key → row 위치) 만큼 메모리를 쓴다
+    """
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(configure(work_dir, sys_path, ext_path))
+    results, peaks = [], []
+    with p.sys_db_ctrl.connection() as db:
+        for name, kw in (("export: json + snapshot", {"write_index": False}),
+                         ("export: json + snapshot + index", {})):
+            with Timer() as t:
+                p.export_data_table(db, **kw)
+            results.append((name, n_data, t.elapsed))
+            tracemalloc.start()
+            p.export_data_table(db, **kw)
+            peaks.append((name, tracemalloc.get_traced_memory()[1]))
+            tracemalloc.stop()
+
+    path = p._get_data_table_path()
+    assert path.endswith(".snap")
+    table = load_table(path)
+    assert table.to_list() == load_json(p._get_json_path("data_table_path", None))
+    expected = MatchIndex.from_keys(table, p.hash_keys(table, p.prefix_len))
+    index = MatchIndex.load(index_path_for(path), table, p._index_fingerprint(path))
+    assert index is not None and index.positions == expected.positions
+    return results, peaks
+
+def run(work_dir, n_data=M_DATA_ROWS):
+    sys_path, ext_path = make_stand_in(work_dir, n_data=n_data)
+    ctrl = DbCtrl(sys_path, None, "sqlite")
+    list_path = os.path.join(work_dir, "data_table_list.json")
+    stream_path = os.path.join(work_dir, "data_table_stream.json")
+
+    results, peaks = [], []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    db = ctrl.open_db()
+    try:
+        for name, export, path in (
+                ("list + save_json", lambda p: save_json(Sql.query(db, DATA_TABLE_SQL, cache=False), p), list_path),
+                ("iter_query + save_json_stream",
+                    lambda p: save_json_stream(Sql.iter_query(db, DATA_TABLE_SQL, cache=False), p), stream_path)):
+            with Timer() as t:
+                export(path)
+            results.append((name, n_data, t.elapsed))
+
+            # tracemalloc 은 느리므로 시간과 따로 잰다
+            tracemalloc.start()
+            export(path)
+            peaks.append((name, tracemalloc.get_traced_memory()[1]))
+            tracemalloc.stop()
+    finally:
+        db.Close()
+    try:
+        more_results, more_peaks = export_all(work_dir, sys_path, ext_path, n_data)
+        results += more_results
+        peaks += more_peaks
+    finally:
+        logging.getLogger().setLevel(level)
+
+    with open(list_path, "rb") as a, open(stream_path, "rb") as b:
+        assert a.read() == b.read(), "streamed export differs from save_json"
+    # snapshot 은 chunk 만큼만, index 를 더해도 list 로 모으는 것보다 훨씬 적다
+    assert peaks[2][1] < peaks[0][1] / 4, peaks
+    assert peaks[3][1] < peaks[0][1] / 2, peaks
+
+    report("M_DATA export on SQLite stand-in", results)
+    for name, peak in peaks:
+        logger.info("    %-34s peak %8.1f MB", name, peak / 1e6)
+    return results, peaks
+
+
+if __name__ == "__main__":
+    n_data = int(sys.argv[1]) if len(sys.argv) > 1 else M_DATA_ROWS
+    with tempfile.TemporaryDirectory() as d:
+        run(d, n_data)
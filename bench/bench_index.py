@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# - M_DATA match index: cold(build + save) vs warm(load) build_1program
+#   python -m bench.bench_index
+import os, logging, tempfile
+
+from lib.log import logger
+from utils.snapshot import load_table
+from utils.match_index import index_path_for
+from bench.fixtures import make_stand_in, configure, Timer, report
+
+
+def run(work_dir):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        db = p.sys_db_ctrl.open_db()
+        p.export_data_table(db, write_index=False)
+        db.Close()
+
+        path = p._get_data_table_path()
+        table = load_table(path)
+        with Timer() as t:
+            cold = p.load_hash(table, path, rebuild=True)
+        results.append(("cold: build + save index", len(table), t.elapsed))
+        with Timer() as t:
+            warm = p.load_hash(table, path)
+        results.append(("warm: load index", len(table), t.elapsed))
+        assert warm.positions == cold.positions
+
+        # 정규화 prefix 길이가 바뀌면 저장된 index 는 버린다
+        p.prefix_len += 1
+        try:
+            assert p.load_hash(table, path).positions != cold.positions
+        finally:
+            p.prefix_len -= 1
+        p.load_hash(table, path, rebuild=True)
+
+        with Timer() as t:
+            program = p.build_1program(["must-have.json"], "bench")
+        results.append(("build_1program (warm)", len(program), t.elapsed))
+        os.remove(index_path_for(path))
+        with Timer() as t:
+            program = p.build_1program(["must-have.json"], "bench")
+        results.append(("build_1program (cold)", len(program), t.elapsed))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("M_DATA match index", results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# - M_HISTORY insert: per-row INSERT vs batched AddNew/Update (SQLite stand-in)
+#   python -m bench.bench_insert [scale]
+import sys, logging, tempfile
+
+from lib.log import logger
+from bench.fixtures import make_stand_in, configure, load_dump, Timer, report
+
+
+def history_rows(scale=1):
+    """M_HISTORY dump 를 scale 배로 늘린다. DESP 에 번호를 붙여 PK 가 겹치지 않게 한다"""
+    rows = load_dump("M_HISTORY")
+    out = []
+    for i in range(scale):
+        for r in rows:
+            r = dict(r)
+            r["DESP"] = r["DESP"] if i == 0 else "%s_%d" % (r["DESP"], i)
+            out.append(r)
+    return out
+
+def run(work_dir, scale=1, batch_sizes=(100, 500, 2000)):
+    sys_path, ext_path = make_stand_in(work_dir, seed_history=False)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    rows = history_rows(scale)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    db = p.ext_db_ctrl.open_db()
+    try:
+        p.delete_all_rows_in_table(db, p.program_table)
+        with Timer() as t:
+            p.insert(db, p.program_table, p.program_table_ddl, rows)
+        results.append(("insert (per-row)", len(rows), t.elapsed))
+
+        for batch_size in batch_sizes:
+            p.delete_all_rows_in_table(db, p.program_table)
+            r = p.bulk_insert(db, p.program_table, p.program_table_ddl, rows, batch_size)
+            assert r["inserted"] == len(rows), r["failed"][:3]
+            results.append(("bulk_insert (batch %s)" % batch_size, r["inserted"], r["elapsed"]))
+
+        # PK 충돌 row 는 failed 로 보고되고 나머지는 들어간다
+        r = p.bulk_insert(db, p.program_table, p.program_table_ddl, rows[:10], 4)
+        assert r["inserted"] == 0 and len(r["failed"]) == 10
+    finally:
+        db.Close()
+        logging.getLogger().setLevel(level)
+
+    report("M_HISTORY insert x%s on SQLite stand-in" % scale, results)
+    return results
+
+
+if __name__ == "__main__":
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    with tempfile.TemporaryDirectory() as d:
+        run(d, scale)
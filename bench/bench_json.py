@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# - utils/json.py: stdlib (예전 save_json/load_json) vs backend (orjson/ujson), pretty / compact / jsonl
+#   64k M_DATA 와 M_HISTORY row 로 쓰고 읽는 시간과 파일 크기를 잰다.
+#   읽은 값이 모두 원래 row 와 같은지, compat=True 가 예전 출력과 byte 단위로 같은지,
+#   쓰다가 실패하면 원래 파일이 그대로인지 확인한다
+#   python -m bench.bench_json
+import os, json, logging, tempfile
+
+from lib.log import logger
+from utils import json as codec
+from bench.fixtures import load_dump, make_data_rows, Timer, report
+
+
+def reference_save(rows, path):
+    """예전 save_json: stdlib json.dump, indent=2, 파일에 바로 쓴다 (임시 파일 없이)"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+
+def reference_load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def run(work_dir):
+    tables = {"M_DATA": make_data_rows(), "M_HISTORY": load_dump("M_HISTORY")}
+    path = lambda name: os.path.join(work_dir, name)
+
+    results, sizes = [], []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        for table_name, rows in tables.items():
+            ref = path("%s.ref.json" % table_name)
+            for name, save, load, p in (
+                    ("stdlib pretty", reference_save, reference_load, ref),
+                    ("%s pretty" % codec.BACKEND, codec.save_json, codec.load_json, path("%s.json" % table_name)),
+                    ("%s compact" % codec.BACKEND, lambda r, p: codec.save_json(r, p, compact=True),
+                        codec.load_json, path("%s.min.json" % table_name)),
+                    ("%s compact stream" % codec.BACKEND, lambda r, p: codec.save_json_stream(r, p, compact=True),
+                        codec.load_json, path("%s.stream.json" % table_name)),
+                    ("%s jsonl" % codec.BACKEND, codec.save_jsonl, codec.load_jsonl, path("%s.jsonl" % table_name))):
+                with Timer() as t:
+                    save(rows, p)
+                results.append(("save %s %s" % (table_name, name), len(rows), t.elapsed))
+                with Timer() as t:
+                    got = load(p)
+                results.append(("load %s %s" % (table_name, name), len(rows), t.elapsed))
+                assert got == rows, "%s %s: rows differ after the round trip" % (table_name, name)
+                sizes.append((table_name, name, os.path.getsize(p)))
+
+            # compat: 예전 save_json 과 같은 byte. stream 도 같다
+            with open(ref, "rb") as f:
+                expected = f.read()
+            for save in (lambda p: codec.save_json(rows, p, compat=True),
+                         lambda p: codec.save_json_stream(rows, p, compat=True)):
+                save(path("compat.json"))
+                with open(path("compat.json"), "rb") as f:
+                    assert f.read() == expected, "%s: compat output differs from json.dump" % table_name
+            # 같은 형식이면 save_json 과 save_json_stream 은 같은 byte
+            for compact in (False, True):
+                codec.save_json(rows, path("a.json"), compact=compact)
+                codec.save_json_stream(rows, path("b.json"), compact=compact)
+                with open(path("a.json"), "rb") as a, open(path("b.json"), "rb") as b:
+                    assert a.read() == b.read(), "%s: save_json_stream differs (compact=%s)" % (table_name, compact)
+
+        # 쓰다가 실패하면 원래 파일은 그대로, 임시 파일은 남지 않는다
+        target = path("M_HISTORY.json")
+        with open(target, "rb") as f:
+            before = f.read()
+        def failing():
+            yield from tables["M_HISTORY"][:10]
+            raise RuntimeError("stop")
+        try:
+            codec.save_json_stream(failing(), target)
+        except RuntimeError:
+            pass
+        with open(target, "rb") as f:
+            assert f.read() == before
+        assert not [n for n in os.listdir(work_dir) if n.endswith(".tmp")]
+
+        # backend 가 못 다루는 값은 stdlib 로
+        odd = [{"n": 1 << 70, "x": float("nan")}, {1: "int key"}]
+        codec.save_json(odd, path("odd.json"))
+        got = codec.load_json(path("odd.json"))
+        assert got[0]["n"] == 1 << 70 and got[0]["x"] != got[0]["x"] and got[1] == {"1": "int key"}
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("JSON save/load with %s" % codec.BACKEND, results)
+    for table_name, name, size in sizes:
+        logger.info("    %-10s %-26s %12s bytes", table_name, name, size)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d)
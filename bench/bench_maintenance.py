@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# - 자동 compact: M_HISTORY 에 많이 넣고 지우기를 되풀이해서 파일을 부풀리고,
+#   background thread 가 DB 가 idle 이 된 뒤에 compact 하는지 확인한다 (SQLite stand-in)
+#   python -m bench.bench_maintenance [cycles]
+import os, sys, time, logging, tempfile
+
+from lib.log import logger
+from utils.db_ctrl import DbCtrl
+from utils.maintenance import Maintenance
+from utils.sql import Sql
+from bench.fixtures import make_stand_in, configure, report
+from bench.bench_insert import history_rows
+
+
+def bloat(p, db_ctrl, rows):
+    """M_HISTORY 에 rows 를 넣고 모두 지운다: row 수는 그대로, 파일은 커진다"""
+    with db_ctrl.connection() as db:
+        p.bulk_insert(db, p.program_table, p.program_table_ddl, rows, 2000)
+        p.delete_all_rows_in_table(db, p.program_table)
+
+def wait_for(cond, timeout=30.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.05)
+
+def run(work_dir, cycles=3, scale=30):
+    sys_path, ext_path = make_stand_in(work_dir, seed_history=False)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    db_ctrl = DbCtrl(sys_path, config.password, config.backend)
+    m = Maintenance(db_ctrl, config.run_drv["maintenance_path"], growth_ratio=1.3, min_size=0,
+                    idle_sec=0.5, interval=0.1, keep_backups=2)
+    rows = history_rows(scale)
+    with db_ctrl.connection() as db:
+        counts = Sql.all_table_row_counts(db)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        assert m.check(force=True) is None  # 처음: baseline 만 잰다
+        # idle 검사를 지나도, 독점할 때 쓰는 중인 연결이 있으면 하지 않는다
+        idle_sec, m.idle_sec = m.idle_sec, 0.0
+        with db_ctrl.connection() as db:
+            assert m.run_once() is None and m.compact(timeout=0) is None
+            Sql.table_row_count(db, "M_DATA")  # 그대로 쓸 수 있다
+        m.idle_sec = idle_sec
+        m.start()
+        for i in range(cycles):
+            size = os.path.getsize(sys_path)
+            bloat(p, db_ctrl, rows)
+            assert os.path.getsize(sys_path) > size * 1.3
+
+            # 쓰는 동안에는 compact 하지 않는다
+            with db_ctrl.connection() as db:
+                time.sleep(1.0)
+                assert len(m.reports) == i
+                Sql.table_row_count(db, "M_DATA")
+            # idle 이 되면 compact 한다
+            wait_for(lambda: len(m.reports) == i + 1)
+            r = m.reports[-1]
+            assert r["done"] and r["reason"] == "fragmentation", r
+            assert r["size_after"] < r["size_before"]
+            results.append(("cycle %d: read before compact" % (i + 1), r["rows"], r["read_before"]))
+            results.append(("cycle %d: read after compact" % (i + 1), r["rows"], r["read_after"]))
+            logger.warning("cycle %d: %s → %s bytes, compact %.2f s", i + 1, r["size_before"],
+                           r["size_after"], r["elapsed"])
+
+        # DAO 처럼 연 thread 만 닫을 수 있을 때: main thread 가 한 번 쓰고 놀면 그 연결은 이미 닫혀 있다.
+        # session 안에서 놀고 있으면 기다리고, session 을 나가면 compact 한다
+        db_ctrl.backend.thread_affine = True
+        n = len(m.reports)
+        with db_ctrl.session():
+            bloat(p, db_ctrl, rows)
+            time.sleep(1.0)
+            assert len(m.reports) == n and db_ctrl.pool.stats()["open"] == 1
+        assert db_ctrl.pool.stats()["open"] == 0
+        wait_for(lambda: len(m.reports) == n + 1)
+        bloat(p, db_ctrl, rows)
+        assert db_ctrl.pool.stats()["open"] == 0
+        wait_for(lambda: len(m.reports) == n + 2)
+        for r in m.reports[n:]:
+            assert r["done"] and r["size_after"] < r["size_before"], r
+            results.append(("thread-affine: read after compact", r["rows"], r["read_after"]))
+        assert db_ctrl.pool.stats()["doomed"] == 0
+
+        # compact 뒤에는 다시 compact 할 이유가 없다
+        assert m.run_once() is None
+    finally:
+        db_ctrl.backend.thread_affine = False
+        m.stop()
+        logging.getLogger().setLevel(level)
+
+    # 데이터는 그대로, backup 은 keep_backups 개
+    with db_ctrl.connection() as db:
+        assert Sql.all_table_row_counts(db) == counts
+    assert len(DbCtrl.backups(sys_path)) == 2, DbCtrl.backups(sys_path)
+
+    report("Automatic compaction after %s x %s-row insert/delete cycles" % (cycles, len(rows)), results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# - exact match 에 실패한 분석 항목: prefix / fuzzy / code matcher 의 회수율과 항목당 시간
+#   ProgramCtrl 은 fuzzy_match 를 켜야만 그 row 를 program 에 넣는다 (기본은 report 의 "suggested" 만)
+#   python -m bench.bench_match [items]
+import os, sys, random, logging, tempfile
+
+from lib.log import logger
+from utils.matcher import FuzzyMatcher
+from bench.fixtures import make_data_rows, configure, Timer, report
+
+
+def missed_items(rows, n, seed=0):
+    """M_DATA row 에서 만든, exact match 에 실패하는 분석 항목. expect 는 기대하는 mode"""
+    rnd = random.Random(seed)
+    rows = [r for r in rows if r["MEMO"] and len(r["MEMO"]) > 12 and not r["CODE"].startswith("W")]
+    items = []
+    for i in range(n):
+        r = rnd.choice(rows)
+        memo, kind = r["MEMO"], i % 4
+        if kind == 0:   # 분석 설명이 MEMO 앞부분만 있다 (+ 꼬리 공백)
+            desc, expect = memo[:len(memo) * 2 // 3] + " ", "prefix"
+        elif kind == 1: # 글자 하나가 다르다
+            j = rnd.randrange(len(memo))
+            desc, expect = memo[:j] + "갑" + memo[j + 1:], "fuzzy"
+        elif kind == 2: # 분류가 다르다: code 로만 찾는다
+            desc, expect = memo, "code"
+        else:           # 없는 항목
+            desc, expect = "존재하지 않는 분석 항목 %d" % i, None
+        items.append({"cat": r["TYPE"] if kind != 2 else "없음", "subcat": r["ITEM"],
+                      "description": desc, "code": r["CODE"] if kind != 3 else "X%07d" % i,
+                      "expect": expect, "expect_code": r["CODE"] if kind != 3 else None})
+    return items
+
+def run(n_items=2000):
+    rows = make_data_rows()
+    matcher = FuzzyMatcher(rows)
+    items = missed_items(rows, n_items)
+
+    results = []
+    with Timer() as t:
+        matcher.match(items[0])
+    results.append(("build index (first match)", len(rows), t.elapsed))
+
+    hits = {"prefix": [0, 0], "fuzzy": [0, 0], "code": [0, 0], None: [0, 0]}
+    with Timer() as t:
+        for item in items:
+            mode, score, matched = matcher.best(item)
+            h = hits[item["expect"]]
+            h[1] += 1
+            if mode == item["expect"] and (mode is None or 
+                    item["expect_code"] in [m["CODE"] for m in matched]):
+                h[0] += 1
+    results.append(("match missed items", len(items), t.elapsed))
+
+    # ProgramCtrl: 기본은 report 만, fuzzy_match = True 일 때만 program 에 넣는다
+    with tempfile.TemporaryDirectory() as d:
+        from utils.program_ctrl import ProgramCtrl
+        p = ProgramCtrl(configure(d, os.path.join(d, "sys.db"), os.path.join(d, "ext.db")))
+        level = logger.getEffectiveLevel()
+        logging.getLogger().setLevel(logging.CRITICAL)
+        try:
+            hash_table = p.build_hash(rows, p.prefix_len)
+            sample = items[:200]
+            assert not p.fuzzy_match
+            exact_only, _, dropped, _, matches = p._build_1program(hash_table, sample, "bench", matcher)
+            assert {m["mode"] for m in matches} <= {"exact", "dropped"}
+            assert sum(1 for m in matches if m.get("suggested")) > dropped // 2
+            p.fuzzy_match = True
+            added, _, _, _, matches = p._build_1program(hash_table, sample, "bench", matcher)
+            assert added > exact_only and {"prefix", "fuzzy", "code"} <= {m["mode"] for m in matches}
+            assert not any(m.get("suggested") for m in matches)
+        finally:
+            logging.getLogger().setLevel(level)
+
+    report("Second stage matcher on 64k M_DATA rows", results)
+    logger.info("    %.3f ms per item", t.elapsed * 1000 / len(items))
+    for mode, (ok, total) in hits.items():
+        logger.info("    %-8s %5s / %5s recovered as expected", mode or "dropped", ok, total)
+    return results, hits
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
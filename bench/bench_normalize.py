@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# - str_normalize: 예전 구현(NFKC + re.sub 두 번)과 같은 결과인지 확인하고 속도를 잰다
+#   비교 대상: output/ dump 의 모든 문자열, 64k M_DATA, 무작위 문자열
+#   python -m bench.bench_normalize
+import re, random, unicodedata
+
+from lib.log import logger
+from utils import text
+from bench.fixtures import load_dump, load_analysis, make_data_rows, Timer, report
+
+PREFIX_LENS = (0, 1, 8, 24, 1000)
+
+
+def reference_normalize(s, len):
+    """예전 ProgramCtrl.str_normalize: 부를 때마다 unicodedata.normalize + re.sub 두 번 (미리 compile 하지 않고, memo 없이)"""
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFKC", s)
+    s = s.lower()
+    s = s.strip()
+    s = re.sub(r"[ \t\r\n]+", "", s)
+    s = re.sub(r"[.;:!?'\"/_\\\-|]+", "", s)
+    return s[:len]
+
+def dump_strings():
+    out = []
+    for table_name in ("GRP", "M_HISTORY", "M_INI", "M_LIST", "M_QA", "M_USER"):
+        for row in load_dump(table_name):
+            out.extend(v for v in row.values() if isinstance(v, str))
+    for item in load_analysis():
+        out.extend(v for v in item.values() if isinstance(v, str))
+    for row in make_data_rows():
+        out.extend((row["TYPE"], row["ITEM"], row["MEMO"]))
+    return out
+
+def random_strings(n, seed=0):
+    """공백/구두점/호환 문자(전각, \\u3000, 합자)가 앞, 뒤, 가운데 섞인 문자열"""
+    rnd = random.Random(seed)
+    alphabet = (list(" \t\r\n\x0b\x0c\x85\xa0　 ") + list(".,;:!?'\"/_\\-|()[]{}#") +
+                list("AbZ가힣ㄱ１Ａｚ．，！？＿ﬁ①Ⅻ") + ["́", "é"])
+    return ["".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 30))) for _ in range(n)]
+
+def run():
+    values = dump_strings() + random_strings(20000) + [None, ""]
+
+    # 1. 같은 결과
+    for n in PREFIX_LENS:
+        for s in values:
+            a, b = reference_normalize(s, n), text.str_normalize(s, n)
+            assert a == b, "str_normalize(%r, %s): %r != %r" % (s, n, b, a)
+        assert text.normalize_column(values, n) == [reference_normalize(s, n) for s in values]
+    logger.info("str_normalize == reference on %s strings x %s prefix lengths", len(values), len(PREFIX_LENS))
+
+    # 2. 속도
+    results = []
+    rows = make_data_rows()
+    columns = {c: [r[c] for r in rows] for c in ("TYPE", "ITEM", "MEMO")}
+    for c, col in columns.items():
+        with Timer() as t:
+            [reference_normalize(s, 24) for s in col]
+        results.append(("re.sub %s" % c, len(col), t.elapsed))
+        with Timer() as t:
+            [text.str_normalize(s, 24) for s in col]
+        results.append(("one regex %s" % c, len(col), t.elapsed))
+        text.str_normalize_cached.cache_clear()
+        with Timer() as t:
+            [text.str_normalize_cached(s, 24) for s in col]
+        results.append(("one regex + lru_cache %s" % c, len(col), t.elapsed))
+        with Timer() as t:
+            text.normalize_column(col, 24)
+        results.append(("normalize_column %s" % c, len(col), t.elapsed))
+
+    report("str_normalize on 64k M_DATA rows", results)
+    return results
+
+
+if __name__ == "__main__":
+    run()
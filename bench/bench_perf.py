@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# - lib/perf.py 의 비용: 꺼져 있을 때 / 켜져 있을 때 한 번 부르는 데 드는 시간, 그리고
+#   pipeline (export, build, insert, read, compact) 을 계측하고 summary 를 남긴다 (SQLite stand-in)
+#   python -m bench.bench_perf [calls]
+import os, sys, logging, tempfile
+
+from lib.log import logger
+from lib import perf
+from bench.fixtures import make_stand_in, configure, Timer, report
+
+SPANS = ("DbCtrl.open_db", "Sql.query", "DbCtrl.read_table", "ProgramCtrl.insert", "DbCtrl.bulk_insert",
+         "ProgramCtrl.build_hash", "ProgramCtrl._build_1program", "DbCtrl.compact_db")
+
+
+def noop(x):
+    return x
+
+@perf.timed("bench.noop")
+def timed_noop(x):
+    return x
+
+def overhead(results, calls):
+    def loop(fn):
+        with Timer() as t:
+            for i in range(calls):
+                fn(i)
+        return t.elapsed
+
+    def with_span(i):
+        with perf.span("bench.span") as s:
+            s.rows = i
+        return i
+
+    results.append(("plain function", calls, loop(noop)))
+    results.append(("@timed, disabled", calls, loop(timed_noop)))
+    results.append(("span, disabled", calls, loop(with_span)))
+    perf.enable()
+    try:
+        results.append(("@timed, enabled", calls, loop(timed_noop)))
+        results.append(("span, enabled", calls, loop(with_span)))
+    finally:
+        perf.disable()
+    stats = perf.registry.stats()
+    assert stats["bench.noop"]["calls"] == calls and stats["bench.span"]["rows"] == sum(range(calls))
+    perf.registry.reset()
+
+def pipeline(p, config):
+    db = p.sys_db_ctrl.open_db()
+    try:
+        p.export_data_table(db)
+        rows = p.sys_db_ctrl.read_table(db, p.data_table)
+    finally:
+        db.Close()
+    p.build_hash(rows, p.prefix_len)
+    program = p.build_1program(["must-have.json"], "bench")
+    db = p.ext_db_ctrl.open_db()
+    try:
+        p.delete_all_rows_in_table(db, p.program_table)
+        p.insert(db, p.program_table, p.program_table_ddl, program)
+        p.delete_all_rows_in_table(db, p.program_table)
+        p.bulk_insert(db, p.program_table, p.program_table_ddl, program)
+    finally:
+        db.Close()
+    p.ext_db_ctrl.compact_db()
+    return len(rows)
+
+def run(work_dir, calls=200000):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    enabled = perf.registry.enabled
+    perf.disable()
+    try:
+        overhead(results, calls)
+
+        with Timer() as t:
+            n = pipeline(p, config)
+        results.append(("pipeline, disabled", n, t.elapsed))
+        assert not perf.registry.stats()
+
+        perf.enable()
+        with Timer() as t:
+            n = pipeline(p, config)
+        results.append(("pipeline, enabled", n, t.elapsed))
+        stats = perf.registry.stats()
+    finally:
+        perf.disable()
+        logging.getLogger().setLevel(level)
+
+    missing = [name for name in SPANS if name not in stats]
+    assert not missing, missing
+    assert stats["DbCtrl.read_table"]["rows"] == n and stats["DbCtrl.read_table"]["com"] > 0
+    assert stats["ProgramCtrl.insert"]["com"] > stats["ProgramCtrl.insert"]["rows"]
+
+    json_path = perf.registry.dump_json(os.path.join(work_dir, "perf.json"))
+    logger.info("Perf summary (%s):\n%s", json_path, perf.registry.summary())
+    perf.registry.reset()  # atexit 의 report 에 다시 나오지 않게
+    report("lib/perf.py overhead (%s calls) and the pipeline with/without it" % calls, results)
+    if enabled:
+        perf.enable()
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
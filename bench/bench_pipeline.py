@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# - export / program build / insert pipeline 을 SQLite stand-in 위에서 시간 잰다
+#   python -m bench.bench_pipeline [work_dir]
+import sys, logging, tempfile
+
+from lib.log import logger
+from bench.fixtures import make_stand_in, configure, load_dump, Timer, report
+
+
+def run(work_dir):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        # 1. M_DATA export
+        db = p.sys_db_ctrl.open_db()
+        with Timer() as t:
+            cnt = p.export_data_table(db)
+        db.Close()
+        results.append(("export_data_table", cnt, t.elapsed))
+
+        # 2. program build
+        with Timer() as t:
+            program = p.build_1program(["must-have.json"], "bench")
+        results.append(("build_1program", len(program), t.elapsed))
+
+        # 3. M_HISTORY export
+        desp_list = sorted({r["DESP"] for r in load_dump("M_HISTORY")})
+        db = p.sys_db_ctrl.open_db()
+        with Timer() as t:
+            cnt, path = p.export_programs(db, desp_list, "exported_programs.json")
+        db.Close()
+        results.append(("export_programs", cnt, t.elapsed))
+
+        # 4. M_HISTORY insert
+        db = p.ext_db_ctrl.open_db()
+        with Timer() as t:
+            p.insert_from_json(db, ["exported_programs.json"])
+        db.Close()
+        results.append(("insert_from_json", cnt, t.elapsed))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("Pipeline on SQLite stand-in (%s)" % work_dir, results)
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        with tempfile.TemporaryDirectory() as d:
+            run(d)
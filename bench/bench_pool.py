@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# - DbCtrl.open_db: 매번 열기 vs DbPool 재사용
+#   python -m bench.bench_pool [operations]
+import os, sys, time, shutil, logging, tempfile, threading
+
+from lib.log import logger
+from utils.db_ctrl import DbCtrl
+from utils.db_pool import DbPool
+from bench.fixtures import make_stand_in, configure, Timer, report
+
+
+def operations(ctrl, n):
+    """open → 작은 query → close 를 n 번"""
+    for _ in range(n):
+        db = ctrl.open_db()
+        rs = db.OpenRecordset("SELECT COUNT(*) AS N FROM M_LIST")
+        rs.GetRows(1)
+        rs.Close()
+        db.Close()
+
+def thread_affinity(pool, ctrl):
+    """
+    backend.thread_affine = True 로 DAO 를 흉내 낸다: 모든 Close 가 연 thread 에서 되는지,
+    exclusive 가 쓰는 중인 Database 를 기다리는지, session 밖에서는 돌려줄 때 닫는지,
+    session 안에서 놀고 있는 thread 의 것은 그 thread 가 닫는지 본다
+    """
+    with ctrl.connection() as db:
+        db_class = type(db._entry.db)
+    close, closers = db_class.Close, []
+    def recording_close(db):
+        closers.append((db, threading.get_ident()))
+        close(db)
+    owners = {}
+    db_class.Close = recording_close
+    ctrl.backend.thread_affine = True
+    try:
+        pool.close_all()
+        # 1) 다른 thread 가 쓰는 중: exclusive 는 돌려줄 때까지 기다리고, 그 thread 가 닫는다
+        opened, release = threading.Event(), threading.Event()
+        def user():
+            db = ctrl.open_db()
+            owners[id(db._entry.db)] = threading.get_ident()
+            opened.set()
+            release.wait()
+            db.Close()
+        t = threading.Thread(target=user)
+        t.start()
+        opened.wait()
+        threading.Timer(0.2, release.set).start()
+        with Timer() as waited:
+            with pool.exclusive(ctrl.mdb_path, timeout=5) as ok:
+                assert ok and pool.stats()["open"] == 0
+        t.join()
+        assert waited.elapsed >= 0.2
+
+        # 2) session 밖: 돌려주면 연 thread 가 바로 닫는다. 놀고 있는 thread 가 파일을 막지 않는다
+        opened.clear(); release.clear()
+        def caller():
+            operations(ctrl, 3)
+            opened.set()
+            release.wait()
+        t = threading.Thread(target=caller)
+        t.start()
+        opened.wait()
+        assert pool.stats()["open"] == 0
+        with pool.exclusive(ctrl.mdb_path, timeout=0.1) as ok:
+            assert ok
+        release.set()
+        t.join()
+
+        # 3) session 안: 재사용한다. 그 안에서 놀고 있으면 timeout 이면 ok=False,
+        #    그 thread 가 다음 acquire 에서 닫거나 session 을 나가면 ok
+        opened.clear(); release.clear()
+        again, left = threading.Event(), threading.Event()
+        def idler():
+            with ctrl.session():
+                before = pool.stats()
+                operations(ctrl, 3)
+                assert pool.stats()["opens"] - before["opens"] == 1
+                db = ctrl.open_db()
+                owners[id(db._entry.db)] = threading.get_ident()
+                db.Close()
+                opened.set()
+                again.wait()
+                operations(ctrl, 1)  # 닫고 (doomed) 다시 연다
+                release.wait()
+            left.set()
+        t = threading.Thread(target=idler)
+        t.start()
+        opened.wait()
+        with pool.exclusive(ctrl.mdb_path, timeout=0.1) as ok:
+            assert not ok and pool.stats()["doomed"] == 1
+        again.set()
+        time.sleep(0.1)
+        assert pool.stats()["open"] == 1  # 다시 연 것
+        release.set()
+        left.wait()
+        assert pool.stats()["open"] == 0  # session 을 나가면서 닫았다
+        t.join()
+        # 4) session 안에서 연 채로 thread 가 끝났으면 여기서 닫는다
+        def ended():
+            ctrl.backend.init_thread()
+            pool._local.depth = 1  # session 을 나가지 않고 끝난 thread
+            db = ctrl.open_db()
+            owners[id(db._entry.db)] = threading.get_ident()
+            db.Close()
+        t = threading.Thread(target=ended)
+        t.start()
+        t.join()
+        assert pool.stats()["open"] == 1
+        with pool.exclusive(ctrl.mdb_path, timeout=1) as ok:
+            assert ok and pool.stats()["open"] == 0
+    finally:
+        db_class.Close = close
+        ctrl.backend.thread_affine = False
+    # 살아 있는 다른 thread 의 것을 닫은 적이 없다
+    live_closes = [(db, closer) for db, closer in closers if owners.get(id(db), closer) != closer]
+    assert len(live_closes) <= 1, live_closes  # 4) 의 끝난 thread 것 하나만
+
+def run(work_dir, n=500):
+    sys_path, ext_path = make_stand_in(work_dir, n_data=1000)
+    config = configure(work_dir, sys_path, ext_path)
+    pool = DbPool()
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        plain = DbCtrl(sys_path, config.password, config.backend, pooled=False)
+        pooled = DbCtrl(sys_path, config.password, config.backend)
+        with Timer() as t:
+            operations(plain, n)
+        results.append(("open per operation", n, t.elapsed))
+        before = pool.stats()
+        with Timer() as t:
+            operations(pooled, n)
+        results.append(("pooled", n, t.elapsed))
+        after = pool.stats()
+        assert after["opens"] - before["opens"] == 1
+        assert after["reuses"] - before["reuses"] == n - 1
+
+        # 같은 key 를 여러 곳에서 같이 쓴다
+        with pooled.connection() as a, pooled.connection() as b:
+            assert a._entry is b._entry and pool.stats()["in_use"] == 1
+
+        # health check: 파일이 바뀌면 (copy 로 교체) 다시 연다
+        shutil.copy(sys_path, sys_path + ".new")
+        os.replace(sys_path + ".new", sys_path)
+        operations(pooled, 1)
+        assert pool.stats()["health_failures"] == before["health_failures"] + 1
+
+        # idle timeout
+        pool.close_idle(time.monotonic() + pool.idle_timeout)
+        assert pool.stats()["open"] == 0
+
+        # compact 는 pool 의 연결을 닫고 한다
+        operations(pooled, 1)
+        assert pooled.compact_db(sys_path)
+        assert pool.stats()["open"] == 0
+        operations(pooled, 1)
+
+        # DAO 처럼 Database 를 연 thread 에서만 닫을 수 있을 때
+        thread_affinity(pool, pooled)
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("DbCtrl.open_db, %s operations" % n, results)
+    logger.info("    pool: %s", pool.stats())
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# - M_HISTORY per-row insert: SQL 문자열 (insert_sql) vs parameter QueryDef (PreparedInsert)
+#   같은 row 를 두 방법과 bulk_insert 로 넣고, table 내용이 모두 같은지,
+#   HTIME 의 시각이 그대로인지 확인한다 (SQLite stand-in)
+#   python -m bench.bench_prepared [rows]
+import sys, logging, tempfile
+
+from lib.log import logger
+from bench.fixtures import make_stand_in, configure, Timer, report
+from bench.bench_insert import history_rows
+
+
+def table_rows(p, db):
+    sql = "SELECT * FROM %s ORDER BY HTIME, DESP, CODE" % p.program_table
+    return p.sql.query(db, sql)
+
+def run(work_dir, n=10000):
+    sys_path, ext_path = make_stand_in(work_dir, seed_history=False)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+    rows = history_rows(n // 3420 + 1)[:n]
+    # 분석 결과로 만든 program 의 HTIME 처럼 자정이 아닌 시각, 특수 문자가 든 text
+    rows[0] = dict(rows[0], HTIME="2024-03-01T23:59:58+00:00", NAME="O'Brien \"#1\" [x]")
+
+    results, contents = [], {}
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    db = p.ext_db_ctrl.open_db()
+    try:
+        for name, insert in (
+                ("string SQL (insert_sql)", lambda: p.insert(db, p.program_table, p.program_table_ddl, rows, prepared=False)),
+                ("QueryDef (PreparedInsert)", lambda: p.insert(db, p.program_table, p.program_table_ddl, rows)),
+                ("bulk_insert (AddNew/Update)", lambda: p.bulk_insert(db, p.program_table, p.program_table_ddl, rows))):
+            p.delete_all_rows_in_table(db, p.program_table)
+            with Timer() as t:
+                insert()
+            results.append((name, len(rows), t.elapsed))
+            contents[name] = table_rows(p, db)
+    finally:
+        db.Close()
+        logging.getLogger().setLevel(level)
+
+    # 같은 결과, 시각까지 원본과 같다
+    expected = sorted(rows, key=lambda r: (r["HTIME"], r["DESP"], r["CODE"]))
+    for name, got in contents.items():
+        assert got == expected, "%s: %s rows differ" % (name, sum(a != b for a, b in zip(got, expected)))
+    logger.info("%s rows are identical after each insert path (HTIME %s)", len(rows), expected[-1]["HTIME"])
+
+    report("M_HISTORY per-row insert of %s rows on SQLite stand-in" % len(rows), results)
+    return results
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with tempfile.TemporaryDirectory() as d:
+        run(d, n)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# - Sql 의 SELECT 결과 cache: 처음 (DB 에서 읽기) vs 다시 (cache) (SQLite stand-in)
+#   결과가 cache 없이 읽은 것과 같은지, 고쳐도 cache 는 그대로인지, execute() 나
+#   다른 연결의 변경 뒤에는 다시 읽는지, max_bytes 를 넘으면 LRU 로 버리는지 확인한다
+#   python -m bench.bench_query_cache [repeat]
+import sys, logging, tempfile
+
+from lib.log import logger
+from utils.db_ctrl import DbCtrl
+from utils.sql import Sql, result_size
+from bench.fixtures import make_stand_in, load_dump, Timer, report
+from bench.bench_read import DATA_TABLE_SQL
+
+
+def run(work_dir, repeat=10):
+    sys_path, _ = make_stand_in(work_dir)
+    ctrl = DbCtrl(sys_path, None, "sqlite")
+    desps = sorted({r["DESP"] for r in load_dump("M_HISTORY")})[:5]
+    queries = {
+        "COUNT(*) M_DATA": "SELECT COUNT(*) AS N FROM M_DATA",
+        "M_DATA projection": DATA_TABLE_SQL,
+        "M_HISTORY DESP IN (5)": "SELECT * FROM M_HISTORY WHERE DESP IN (%s)" %
+                                 ",".join("'%s'" % d.replace("'", "''") for d in desps),
+    }
+
+    results, sizes = [], {}
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    cache = Sql.enable_cache(64 << 20)
+    cache.clear()
+    try:
+        with ctrl.connection() as db:
+            for name, sql in queries.items():
+                expected = Sql.query(db, sql, cache=False)
+                sizes[name] = result_size(expected)
+                with Timer() as t:
+                    rows = Sql.query(db, sql)
+                results.append(("%s: first" % name, len(rows), t.elapsed))
+                assert rows == expected
+                with Timer() as t:
+                    for _ in range(repeat):
+                        rows = Sql.query(db, sql)
+                results.append(("%s: cached x%d" % (name, repeat), len(rows) * repeat, t.elapsed))
+                assert rows == expected
+
+                # 복사본: 고쳐도 다음 결과는 그대로. 공백이 다른 같은 SQL 도 hit. iter_query 도 같은 cache
+                rows[0].clear()
+                assert Sql.query(db, "  " + sql.rstrip(";").replace(" ", "\n  ") + ";\n") == expected
+                assert list(Sql.iter_query(db, sql, cache=True)) == expected
+                assert list(Sql.iter_query(db, sql)) == expected  # 기본값: cache 를 쓰지 않는다
+            stats = cache.stats()
+            assert stats["misses"] == len(queries) and stats["hits"] == len(queries) * (repeat + 2)
+
+            # max_bytes 를 넘으면 가장 오래 쓰지 않은 결과 (M_DATA projection) 부터 버린다
+            cache.clear()
+            Sql.enable_cache(sizes["M_DATA projection"] + sizes["M_HISTORY DESP IN (5)"] // 2)
+            evictions = cache.stats()["evictions"]
+            for name in ("M_DATA projection", "M_HISTORY DESP IN (5)", "COUNT(*) M_DATA"):
+                Sql.query(db, queries[name])
+            stats = cache.stats()
+            assert stats["bytes"] <= cache.max_bytes and stats["entries"] == 2, stats
+            assert stats["evictions"] == evictions + 1, stats
+            Sql.enable_cache(64 << 20)
+
+            # execute() 뒤에는 다시 읽는다
+            count = lambda: Sql.query_scalar(db, queries["COUNT(*) M_DATA"])
+            n = count()
+            Sql.execute(db, "DELETE FROM M_DATA WHERE CODE LIKE 'W%'")
+            assert count() < n and cache.stats()["invalidations"] == 1
+
+        # 다른 연결이 바꾼 것은 파일의 mtime, size 로 안다
+        with ctrl.connection() as db:
+            n = count()
+        other = DbCtrl(sys_path, None, "sqlite", pooled=False)
+        with other.connection() as db2:
+            db2.Execute("DELETE FROM M_DATA WHERE CODE LIKE 'A%'")
+        with ctrl.connection() as db:
+            assert count() < n and cache.stats()["stale"] >= 1
+    finally:
+        logging.getLogger().setLevel(level)
+        logger.info("    cache: %s", cache.stats())
+        Sql.disable_cache()
+
+    report("Sql.query with the result cache", results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# - M_DATA read: MoveNext + Fields(name).Value vs GetRows + column 변환 (SQLite stand-in)
+#   두 경로의 결과가 같은지 확인하고 rows/s 를 비교한다
+#   python -m bench.bench_read
+import sys, logging, tempfile
+
+from lib.log import logger
+from utils.db_ctrl import DbCtrl
+from utils.sql import Sql
+from bench.fixtures import make_stand_in, Timer, report
+
+DATA_TABLE_SQL = ("SELECT CODE, TYPE, ITEM, NAME, DATA1, "
+                  "FIX(DATA2 / 60) AS DATA200, GRP, VIDEO, MEMO FROM M_DATA;")
+
+
+def run(work_dir, chunk_size=1000):
+    sys_path, _ = make_stand_in(work_dir)
+    ctrl = DbCtrl(sys_path, None, "sqlite")
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    db = ctrl.open_db()
+    try:
+        for table_name in ("M_DATA", "M_HISTORY"):
+            with Timer() as t:
+                slow = ctrl.read_table(db, table_name, fast=False)
+            results.append(("read_table %s (MoveNext)" % table_name, len(slow), t.elapsed))
+            with Timer() as t:
+                fast = ctrl.read_table(db, table_name, fast=True, chunk_size=chunk_size)
+            results.append(("read_table %s (GetRows)" % table_name, len(fast), t.elapsed))
+            assert slow == fast, "read_table %s: fast path differs" % table_name
+
+        with Timer() as t:
+            slow = Sql.query(db, DATA_TABLE_SQL, fast=False, cache=False)
+        results.append(("query M_DATA (MoveNext)", len(slow), t.elapsed))
+        with Timer() as t:
+            fast = Sql.query(db, DATA_TABLE_SQL, fast=True, chunk_size=chunk_size, cache=False)
+        results.append(("query M_DATA (GetRows)", len(fast), t.elapsed))
+        assert slow == fast, "query: fast path differs"
+    finally:
+        db.Close()
+        logging.getLogger().setLevel(level)
+
+    report("Read path on SQLite stand-in (chunk %s)" % chunk_size, results)
+    return results
+
+
+if __name__ == "__main__":
+    chunk_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as d:
+        run(d, chunk_size)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# - 여러 client session 의 program build: session 마다 build_1program vs build_programs (M_DATA 한 번)
+#   python -m bench.bench_sessions [clients] [sessions per client]
+import os, sys, logging, tempfile
+
+from lib.log import logger
+from utils.json import save_json, load_json
+from utils.snapshot import load_table
+from bench.fixtures import make_stand_in, configure, load_analysis, Timer, report
+from bench.bench_code import analysis_items
+
+
+def make_sessions(client_dir, table, n_clients, n_sessions, files):
+    """client/<name>/<timestamp>/json/<files> 를 만든다. session json folder list"""
+    dirs = []
+    seed = 0
+    for c in range(n_clients):
+        for s in range(n_sessions):
+            d = os.path.join(client_dir, "client%02d" % c, "2025-11-%02dT10-00" % (s + 1), "json")
+            os.makedirs(d)
+            for name in files:
+                seed += 1
+                save_json(load_analysis() + analysis_items(table, 300, seed), os.path.join(d, name))
+            dirs.append(d)
+    return dirs
+
+def run(work_dir, n_clients=4, n_sessions=3):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    try:
+        db = p.sys_db_ctrl.open_db()
+        p.export_data_table(db)
+        db.Close()
+        table = load_table(p._get_data_table_path())
+
+        files = [config.must_have_file, config.good_to_have_file, config.virus_file]
+        sessions = make_sessions(os.path.join(work_dir, "client"), table, n_clients, n_sessions, files)
+        assert p.client_sessions(os.path.join(work_dir, "client")) == sessions
+        n_files = len(sessions) * len(files)
+
+        # 1) 예전 방식: session 마다 build_1program (M_DATA 와 index 를 매번 읽는다)
+        expected = []
+        with Timer() as t:
+            for d in sessions:
+                expected.append(p.build_1program(p.session_files(d), "bench"))
+        results.append(("build_1program per session", n_files, t.elapsed))
+
+        # 2) 한 번에: M_DATA 와 index 는 한 번
+        with Timer() as t:
+            p.build_programs(sessions, "bench")
+        results.append(("build_programs", n_files, t.elapsed))
+        for d, rows in zip(sessions, expected):
+            assert load_json(os.path.join(d, config.program_file)) == rows
+        reports = load_json(os.path.join(sessions[0], "program_report.json"))
+        assert [os.path.basename(r["file"]) for r in reports] == files
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("Program builds for %s client sessions (%s files)" % (len(sessions), n_files), results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, *(int(a) for a in sys.argv[1:3]))
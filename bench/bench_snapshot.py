@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# - build_1program 의 M_DATA 읽기: data_table.json(json.load) vs column snapshot(mmap)
+#   python -m bench.bench_snapshot
+import os, random, logging, tempfile
+
+from lib.log import logger
+from utils.json import load_json
+from utils.snapshot import load_table, snapshot_source, SnapshotMismatch
+from bench.fixtures import make_stand_in, configure, Timer, report
+
+
+def run(work_dir):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        db = p.sys_db_ctrl.open_db()
+        with Timer() as t:
+            cnt = p.export_data_table(db)
+        db.Close()
+        results.append(("export (json + snapshot)", cnt, t.elapsed))
+
+        json_path = config.run_drv["data_table_path"]
+        snap_path = config.run_drv["data_snapshot_path"]
+        with Timer() as t:
+            rows = load_json(json_path)
+        results.append(("load_json data_table.json", len(rows), t.elapsed))
+        with Timer() as t:
+            table = load_table(snap_path)
+        results.append(("load_table data_table.snap", len(table), t.elapsed))
+        # row 몇 개만 읽으면 column 을 decode 하지 않는다 (match index 가 찾은 row)
+        picks = random.Random(1).sample(range(len(table)), 1000)
+        with Timer() as t:
+            picked = [table[i] for i in picks]
+        results.append(("  + 1000 rows by position", len(picked), t.elapsed))
+        assert not table._columns and picked == [rows[i] for i in picks]
+        with Timer() as t:
+            snap_rows = table.to_list()
+        results.append(("  + rows as dict", len(snap_rows), t.elapsed))
+        assert rows == snap_rows, "snapshot rows differ from data_table.json"
+
+        with Timer() as t:
+            p.build_hash(rows, p.prefix_len)
+        results.append(("build_hash (json rows)", len(rows), t.elapsed))
+        with Timer() as t:
+            p.build_hash(table, p.prefix_len)
+        results.append(("build_hash (snapshot)", len(table), t.elapsed))
+        sizes = os.path.getsize(json_path) / 1e6, os.path.getsize(snap_path) / 1e6
+        table.close()
+
+        # snapshot 의 source 가 지금의 MDB 와 다르면 (바뀌었거나 다른 MDB) 쓰지 않고 다시 export 한다
+        load_table(snap_path, snapshot_source(sys_path)).close()
+        os.utime(sys_path, (os.path.getmtime(sys_path) + 1,) * 2)
+        for path in (sys_path, ext_path):
+            try:
+                load_table(snap_path, snapshot_source(path))
+                assert False, "snapshot of another MDB is loaded"
+            except SnapshotMismatch:
+                pass
+        tables = p.load_match_tables()
+        p.close_match_tables(tables)
+        load_table(snap_path, snapshot_source(sys_path)).close()
+
+        # snapshot 없이 export 하면 예전 snapshot 을 지운다: 새 json 을 읽는다
+        assert p._get_data_table_path() == snap_path
+        with p.sys_db_ctrl.connection() as db:
+            p.export_data_table(db, write_snapshot=False, write_index=False)
+        assert not os.path.exists(snap_path) and p._get_data_table_path() == json_path
+        # json 보다 오래된 snapshot 은 읽지 않는다
+        with p.sys_db_ctrl.connection() as db:
+            p.export_data_table(db, write_index=False)
+        assert p._get_data_table_path() == snap_path
+        later = os.path.getmtime(snap_path) + 10
+        os.utime(json_path, (later, later))
+        assert p._get_data_table_path() == json_path
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("M_DATA snapshot (json %.1f MB, snapshot %.1f MB)" % sizes, results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# - Import 와 startup 시간: 명령 하나(program 하나 export)가 쓰지 않는 subsystem 은 만들지 않는다
+#   python -m bench.bench_startup [repeat]
+import sys, logging, tempfile, subprocess
+
+from lib.log import logger
+from bench.fixtures import TOP_DIR, make_stand_in, configure, Timer, report
+
+
+def import_time(module, repeat):
+    """새 python 에서 import 하는 시간 (interpreter 시작 시간은 뺀다). repeat 번 중 최소"""
+    code = "import time; t = time.perf_counter(); import %s; print(time.perf_counter() - t)" % module
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=TOP_DIR, capture_output=True,
+                             text=True, check=True).stdout
+        sec = float(out.split()[-1])
+        best = sec if best is None else min(best, sec)
+    return best
+
+def run(work_dir, repeat=5):
+    results = []
+    for module in ("utils.config", "utils.program_ctrl", "main"):
+        results.append(("import %s" % module, 1, import_time(module, repeat)))
+
+    sys_path, ext_path = make_stand_in(work_dir, n_data=1000)
+    config = configure(work_dir, sys_path, ext_path)
+    import utils.config
+    probes = []
+    probe = utils.config.choose_external_drive_name
+    utils.config.choose_external_drive_name = lambda: probes.append(1) or probe()
+
+    from utils.program_ctrl import ProgramCtrl
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        # 1) 명령 하나: ProgramCtrl 를 만들고 program 하나를 export
+        config._ext_drv = None
+        with Timer() as t:
+            p = ProgramCtrl(config)
+        results.append(("ProgramCtrl()", 1, t.elapsed))
+        with Timer() as t:
+            with p.sys_db_ctrl.connection() as db:
+                cnt, _ = p.export_programs(db, ["처방:기본"], "one_program.json")
+        results.append(("export one program", cnt, t.elapsed))
+        assert p._ddl is None and p._ext_db_ctrl is None and config._ext_drv is None and not probes
+
+        # 2) 예전처럼 모두 만든다: drive 찾기, ddl, 두 MDB
+        with Timer() as t:
+            config.ext_drv
+            p.ddl, p.program_table_ddl
+            p.sys_db_ctrl.version, p.ext_db_ctrl
+        results.append(("everything else (eager startup)", 1, t.elapsed))
+        assert probes
+    finally:
+        utils.config.choose_external_drive_name = probe
+        config._ext_drv = config._make_ext_drv("Z")
+        config.ext_drv["mdb_path"] = ext_path
+        logging.getLogger().setLevel(level)
+
+    report("Startup", results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 5)
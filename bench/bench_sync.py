@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# - system ↔ external MDB program sync: export + insert_from_json vs sync_programs
+#   python -m bench.bench_sync [scale]
+import sys, logging, tempfile, datetime
+
+from lib.log import logger
+from bench.fixtures import make_stand_in, configure, Timer, report
+from bench.bench_insert import history_rows
+
+
+def program_rows(scale):
+    """history_rows 의 "<DESP>_<i>" program 은 HTIME 을 i 일 뒤로: 내용이 다른 program"""
+    rows = history_rows(scale)
+    for r in rows:
+        i = int(r["DESP"].rsplit("_", 1)[1]) if "_" in r["DESP"] else 0
+        if i:
+            t = datetime.datetime.fromisoformat(r["HTIME"]) + datetime.timedelta(days=i)
+            r["HTIME"] = t.isoformat()
+    return rows
+
+def run(work_dir, scale=10):
+    sys_path, ext_path = make_stand_in(work_dir, seed_history=False)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        sys_db, ext_db = p.sys_db_ctrl.open_db(), p.ext_db_ctrl.open_db()
+        rows = program_rows(scale)
+        p.bulk_insert(sys_db, p.program_table, p.program_table_ddl, rows)
+        count = lambda db: p.sql.query(db, "SELECT COUNT(*) AS N FROM M_HISTORY")[0]["N"]
+
+        # 1) 예전 방식: 전체 export 후 전체 insert. 두 번째부터는 모두 PK 충돌
+        names = sorted(p.program_keys(sys_db))
+        with Timer() as t:
+            p.export_programs(sys_db, names, "exported_programs.json")
+            first = p.insert_from_json(ext_db, ["exported_programs.json"])[0]
+        results.append(("export + insert (empty ext)", first["inserted"], t.elapsed))
+        with Timer() as t:
+            p.export_programs(sys_db, names, "exported_programs.json")
+            again = p.insert_from_json(ext_db, ["exported_programs.json"])[0]
+        results.append(("export + insert again (%s PK fails)" % len(again["failed"]), 
+                        again["rows"], t.elapsed))
+        ext_db.Execute("DELETE FROM M_HISTORY")
+
+        # 2) sync: 빈 ext 로, 다시 한 번 (옮길 것 없음)
+        with Timer() as t:
+            r = p.sync_programs(sys_db, ext_db)
+        results.append(("sync (empty ext)", r["inserted"]["a->b"], t.elapsed))
+        assert count(ext_db) == len(rows)
+        with Timer() as t:
+            r = p.sync_programs(sys_db, ext_db)
+        results.append(("sync again (nothing to move)", 0, t.elapsed))
+        assert r["inserted"] == {"a->b": 0, "b->a": 0}
+
+        # 3) ext 에서: 같은 이름의 다른 program, 중간에 끊긴 program, ext 에만 있는 program
+        desps = sorted({r["DESP"] for r in rows})
+        ext_db.Execute("UPDATE M_HISTORY SET CODE = CODE || 'X' WHERE DESP = '%s'" % desps[0])
+        ext_db.Execute("DELETE FROM M_HISTORY WHERE DESP = '%s' AND CODE LIKE 'A%%'" % desps[1])
+        only_ext = [dict(r, DESP="ext_only") for r in rows if r["DESP"] == desps[2]]
+        p.bulk_insert(ext_db, p.program_table, p.program_table_ddl, only_ext)
+        before = (count(sys_db), count(ext_db))
+        with Timer() as t:
+            plan = p.sync_programs(sys_db, ext_db, dry_run=True)
+        results.append(("dry run", 0, t.elapsed))
+        assert (count(sys_db), count(ext_db)) == before
+        actions = {(d, a["action"]) for d, p_ in plan["plan"].items() for a in p_ if a["action"] != "skip"}
+        logger.warning("    plan: %s", sorted(actions))
+        assert actions == {("a->b", "rename"), ("a->b", "resume"), ("b->a", "copy"), ("b->a", "rename")}
+        with Timer() as t:
+            r = p.sync_programs(sys_db, ext_db)
+        results.append(("sync both ways", sum(r["inserted"].values()), t.elapsed))
+        assert not any(r["failed"].values())
+
+        # 4) 다시 하면 모두 skip (rename 한 program 도 같은 family 로 알아본다)
+        r = p.sync_programs(sys_db, ext_db, dry_run=True)
+        assert all(a["action"] == "skip" for p_ in r["plan"].values() for a in p_), r["plan"]
+        # 같은 이름이 양쪽에서 서로 다른 program 이면, 양쪽 모두 두 program 을 다른 이름으로 가진다
+        programs = lambda db: {frozenset(k) for k in p.program_keys(db).values()}
+        assert programs(sys_db) == programs(ext_db)
+        sys_db.Close()
+        ext_db.Close()
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("Program sync, %s M_HISTORY rows" % len(rows), results)
+    return results
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as d:
+        run(d, int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# - USB workflow: 차례로 (copy → build_programs → session 마다 insert) vs SessionPipeline (겹쳐서)
+#   copy 는 USB 속도 (MB/s) 로 늦춘다. 두 방법의 program.json 과 ext MDB 의 M_HISTORY 가 같은지,
+#   copy 중에 cancel 하면 ext MDB 가 그대로이고 임시 파일이 남지 않는지 확인한다 (SQLite stand-in)
+#   python -m bench.bench_usb [clients] [sessions per client] [USB MB/s]
+import os, sys, json, time, logging, tempfile
+
+from lib.log import logger
+from utils.json import load_json
+from utils.atomic import atomic_copy
+from utils.snapshot import load_table
+from utils.pipeline import SessionPipeline
+from bench.fixtures import make_stand_in, configure, Timer, report
+from bench.bench_sessions import make_sessions
+
+CHUNK = 256 << 10
+
+
+def throttle(mb_per_sec, then = None):
+    """SessionPipeline progress: copy 의 chunk 마다 USB 속도만큼 기다린다"""
+    def progress(stage, done, total):
+        if stage == "copy":
+            time.sleep(CHUNK / (mb_per_sec * (1 << 20)))
+        if then is not None:
+            then(stage, done, total)
+    return progress
+
+def history_rows(p):
+    with p.ext_db_ctrl.connection() as db:
+        rows = p.ext_db_ctrl.read_table(db, p.program_table)
+    return sorted(json.dumps(r, sort_keys=True, default=str) for r in rows)
+
+def sequential(p, sessions, mb_per_sec):
+    """예전 USB 순서: copy 가 끝나면 build_programs, 그것이 끝나면 session 마다 insert"""
+    cfg = p.cfg
+    with Timer() as t_copy:
+        atomic_copy(cfg.sys_drv["mdb_path"], cfg.ext_drv["mdb_path"], buffer_size=CHUNK,
+                    progress=lambda copied: throttle(mb_per_sec)("copy", copied, None))
+    with Timer() as t_build:
+        p.build_programs(sessions)
+    with Timer() as t_insert:
+        with p.ext_db_ctrl.connection() as db:
+            reports = p.insert_from_json(db, [os.path.join(d, cfg.program_file) for d in sessions])
+    stages = {"copy": t_copy.elapsed, "build": t_build.elapsed, "insert": t_insert.elapsed}
+    return sum(r["inserted"] for r in reports), sum(len(r["failed"]) for r in reports), stages
+
+def run(work_dir, n_clients=4, n_sessions=3, mb_per_sec=20.0):
+    sys_path, ext_path = make_stand_in(work_dir)
+    config = configure(work_dir, sys_path, ext_path)
+
+    from utils.program_ctrl import ProgramCtrl
+    p = ProgramCtrl(config)
+
+    results = []
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    try:
+        with p.sys_db_ctrl.connection() as db:
+            p.export_data_table(db)
+        table = load_table(p._get_data_table_path())
+        files = [config.must_have_file, config.good_to_have_file, config.virus_file]
+        sessions = make_sessions(os.path.join(work_dir, "client"), table, n_clients, n_sessions, files)
+        n_files = len(sessions) * len(files)
+        size = os.path.getsize(sys_path)
+
+        # 1) 차례로
+        with Timer() as t:
+            inserted, failed, stages = sequential(p, sessions, mb_per_sec)
+        results.append(("sequential", inserted, t.elapsed))
+        for name, sec in stages.items():
+            results.append(("    %s" % name, inserted, sec))
+        programs = [load_json(os.path.join(d, config.program_file)) for d in sessions]
+        expected = history_rows(p)
+
+        # 2) 겹쳐서. export=True 는 M_DATA export 까지 copy 와 같이 한다
+        for export in (False, True):
+            pipe = SessionPipeline(p, sessions, export=export, chunk_size=CHUNK,
+                                   progress=throttle(mb_per_sec))
+            with Timer() as t:
+                result = pipe.run()
+            assert not result["cancelled"] and result["copied"] == size
+            assert (result["inserted"], result["failed"]) == (inserted, failed)
+            assert [load_json(os.path.join(d, config.program_file)) for d in sessions] == programs
+            assert history_rows(p) == expected
+            name = "pipeline" + (" + export" if export else "")
+            results.append((name, inserted, t.elapsed))
+            for stage, s in result["stages"].items():
+                results.append(("    %s %.2f→%.2f s" % (stage, s["start"], s["end"]), s["count"], s["busy"]))
+
+        # 3) copy 중에 cancel: ext MDB 는 그대로, 임시 파일은 남지 않는다, insert 는 하지 않는다
+        with open(ext_path, "rb") as f:
+            before = f.read()
+        os.utime(sys_path)
+        pipe = SessionPipeline(p, sessions, chunk_size=CHUNK)
+        def cancel_halfway(stage, done, total):
+            if stage == "copy" and done * 2 >= total:
+                pipe.cancel()
+        pipe.progress = throttle(mb_per_sec, cancel_halfway)
+        with Timer() as t:
+            result = pipe.run()
+        assert result["cancelled"] and result["inserted"] == 0
+        assert result["stages"]["copy"]["status"] == "cancelled"
+        with open(ext_path, "rb") as f:
+            assert f.read() == before
+        ext_dir = os.path.dirname(ext_path)
+        assert not [n for n in os.listdir(ext_dir) if n.endswith(".tmp")]
+        assert history_rows(p) == expected
+        results.append(("pipeline cancelled halfway", 0, t.elapsed))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    report("USB workflow for %s sessions (%s files, %.1f MB MDB at %s MB/s)"
+           % (len(sessions), n_files, size / (1 << 20), mb_per_sec), results)
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    with tempfile.TemporaryDirectory() as d:
+        run(d, *(int(a) for a in args[:2]), *(float(a) for a in args[2:3]))
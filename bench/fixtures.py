@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# - Benchmark fixture: output/ 의 json dump 로 채운 SQLite stand-in DB
+#
+# output/ 에는 M_DATA dump 가 없다. M_HISTORY, M_LIST, must-have.json 의 CODE/NAME 과
+# doc/medical2.md 의 정맥동염 예제를 섞어 실제 크기(64,008 rows)의 M_DATA 를 만든다.
+import os, json, random, shutil, time
+
+from lib.log import logger
+from utils.backend import get_backend
+from utils.config import Config
+
+TOP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_DIR = os.path.join(TOP_DIR, "output")
+M_DATA_ROWS = 64008  # output/count.json
+
+SINUSITIS = ("정맥동염(부비강염)(공동과 폐 감염은 파라인플루엔자 RSV(아데노바이러스)와 같은 "
+             "바이러스(인플루엔자 A)를 포함하여 다량의 병원체에 기인할 수 있습니다 "
+             "인플루엔자 B, 감기의 병원체, 기타)")
+
+CATEGORIES = ["기관", "오관", "운동", "생식", "소화", "호흡", "순환", "신경", "피부", "내분비",
+              "근골격", "면역", "정신", "비뇨", "혈액", "감염", "종양", "한방", "정화", "분석"]
+SUBCATEGORIES = ["복부", "코", "귀", "눈", "입", "멀미", "남성", "여성", "위", "장", "간", "폐",
+                 "심장", "뇌", "척추", "관절", "근육", "피부", "혈관", "신장", "방광", "갑상선"]
+WORDS = ["염증", "통증", "감염", "바이러스", "세균", "만성", "급성", "기능", "저하", "항진",
+         "(또한", "보세요)", "Syndrome", "Chronic", "inflammation", "TB,", "RSV", "등", "의",
+         "증후군", "장애", "결핍", "과다", "손상", "회복", "정화", "해독", "균형"]
+
+
+def load_dump(table_name, prefix="medical.json_"):
+    with open(os.path.join(OUTPUT_DIR, prefix + table_name + ".json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_analysis(file_name="must-have.json"):
+    with open(os.path.join(OUTPUT_DIR, file_name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _data_row(code, cat, subcat, memo, data1, data2, grp="", name="", video=""):
+    return {
+        "CODE": code, "TYPE": cat, "ITEM": subcat, "DETAIL": "", "NAME": name or memo,
+        "DATA1": data1, "DATA2": data2, "GRP": grp, "VOICE": "", "VIDEO": video, "MEMO": memo,
+        "WDATE": "2004-07-05T12:37:47+00:00", "MDATE": "2004-07-05T12:37:47+00:00",
+        "WRITER": "ADMIN", "MODIFYER": "ADMIN",
+    }
+
+def make_data_rows(n=M_DATA_ROWS, seed=0):
+    """M_DATA 와 같은 모양의 row n 개 (CODE 는 unique)"""
+    rnd = random.Random(seed)
+    rows, codes = [], set()
+
+    def add(row):
+        if row["CODE"] not in codes and len(rows) < n:
+            codes.add(row["CODE"])
+            rows.append(row)
+
+    # 1) 분석 결과(must-have.json)가 가리키는 row 와 정맥동염 (#1)~(#4), (축농증)
+    for item in load_analysis():
+        if item["code"] == "A0877015":
+            for i in range(4):
+                add(_data_row("A087701%d" % (5 + i), item["cat"], item["subcat"],
+                              "%s(#%d)" % (SINUSITIS, i + 1), 1.2 + i, 180.0))
+            add(_data_row("A0877019", item["cat"], item["subcat"], "정맥동염(축농증)", 5.8, 180.0))
+        else:
+            add(_data_row(item["code"], item["cat"], item["subcat"], item["description"],
+                          2.5, 180.0, name=item["prescription"]))
+
+    # 2) M_HISTORY, M_LIST 에 등장하는 CODE
+    for r in load_dump("M_HISTORY") + load_dump("M_LIST"):
+        add(_data_row(r["CODE"], rnd.choice(CATEGORIES), rnd.choice(SUBCATEGORIES),
+                      r["NAME"], r["DATA1"], r["DATA2"] * 60, grp=r["GRP"] or "", video=r["VIDEO"] or ""))
+
+    # 3) W block: 0.1 ~ 100 Hz, 0.01 단위
+    for i in range(10, 10001):
+        add(_data_row("W%07d" % i, "분석", "분석", "%.2f Hz" % (i / 100.0), i / 100.0, 180.0))
+
+    # 4) 나머지
+    i = 0
+    while len(rows) < n:
+        i += 1
+        memo = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 12)))
+        add(_data_row("%s%07d" % (rnd.choice("ABCDEFGHIJKLMOP"), i), rnd.choice(CATEGORIES),
+                      rnd.choice(SUBCATEGORIES), memo, round(rnd.uniform(0.1, 100), 2),
+                      float(rnd.choice([60, 120, 180, 300]))))
+    return rows
+
+def make_stand_in(work_dir, n_data=M_DATA_ROWS, seed_history=True):
+    """work_dir 에 sys.db(전체), ext.db(M_HISTORY 제외) SQLite stand-in 을 만든다"""
+    backend = get_backend("sqlite")
+    os.makedirs(work_dir, exist_ok=True)
+    paths = []
+    for name, with_history in (("sys.db", seed_history), ("ext.db", False)):
+        path = os.path.join(work_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+        db = backend.open_db(path, None)
+        for table_name in backend.ddl:
+            if table_name == "M_HISTORY" and not with_history:
+                continue
+            try:
+                backend.seed_table(db, table_name, load_dump(table_name))
+            except FileNotFoundError:
+                pass
+        backend.seed_table(db, "M_DATA", make_data_rows(n_data))
+        db.Close()
+        paths.append(path)
+    return paths
+
+def configure(work_dir, sys_mdb_path, ext_mdb_path):
+    """Config 를 work_dir 아래의 SQLite stand-in 으로 돌린다"""
+    Config.backend = "sqlite"
+    Config.sys_drv["top_dir"] = work_dir
+    Config.sys_drv["mdb_path"] = sys_mdb_path
+    Config._ext_drv = Config._make_ext_drv("Z")  # drive 를 찾지 않는다
+    Config.ext_drv["mdb_path"] = ext_mdb_path
+    Config.run_drv["top_dir"] = work_dir
+    Config.run_drv["data_table_path"] = os.path.join(work_dir, "db", "data_table.json")
+    Config.run_drv["data_snapshot_path"] = os.path.join(work_dir, "db", "data_table.snap")
+    Config.run_drv["ddl_path"] = os.path.join(TOP_DIR, "db", "ddl.json")
+    Config.run_drv["delta_dir"] = os.path.join(work_dir, "db", "delta")
+    Config.run_drv["dump_dir"] = os.path.join(work_dir, "output")
+    Config.run_drv["maintenance_path"] = os.path.join(work_dir, "db", "maintenance.json")
+    Config.run_drv["json_dir"] = os.path.join(work_dir, "temp", "json")
+    Config.run_drv["program_path"] = os.path.join(Config.run_drv["json_dir"], "program.json")
+    Config.run_drv["program_report_path"] = os.path.join(Config.run_drv["json_dir"], "program_report.json")
+    for d in (os.path.join(work_dir, "db"), Config.run_drv["json_dir"]):
+        os.makedirs(d, exist_ok=True)
+    shutil.copy(os.path.join(OUTPUT_DIR, "must-have.json"), Config.run_drv["json_dir"])
+    return Config
+
+
+class Timer:
+    """with Timer() as t: ... → t.elapsed (초)"""
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+def report(title, results):
+    """results: [(name, rows, seconds)]"""
+    logger.info("───────────────────────────────────")
+    logger.info(title)
+    for name, rows, sec in results:
+        rate = rows / sec if sec else 0.0
+        logger.info("    %-34s %8s rows %9.3f s %12.0f rows/s", name, rows, sec, rate)
+    logger.info("───────────────────────────────────")
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+# - 재현 가능한 benchmark suite: output/ 의 dump (M_HISTORY, M_LIST, must-have.json, count.json) 와
+#   db/ddl.json 으로 만든 data 를 scale 배 (1 ~ 10) 로 늘려서 시간 잰다 (SQLite stand-in)
+#
+#   python -m bench.suite                       # scale 1, 결과: temp/bench/suite_1x.json
+#   python -m bench.suite --scale 10 --repeat 5
+#   python -m bench.suite --only normalize,hash_build
+#   python -m bench.suite --save-baseline       # 지금 결과를 bench/baseline.json 에 (scale 별로) 저장
+#
+# case: 같은 입력을 repeat 번 (짧은 case 는 합이 MIN_TIME 초가 될 때까지 더) 돌려서
+#       가장 빠른 시간 (best) 과 중간 값 (median) 을 남긴다. 입력을 만드는 시간은 재지 않는다. 입력과 결과는 random seed 가 고정이라 매번 같다.
+# calibration: 순수 Python loop 의 시간. 다른 PC 의 baseline 과도 비교할 수 있게
+#       case 의 시간을 calibration 에 대한 비율 (relative) 로도 남기고, 그것으로 비교한다.
+#       PC 의 부하가 바뀌는 것을 따라가도록 case 마다 바로 앞에서 다시 잰다.
+#       (timeit 처럼) 재는 동안 gc 는 끈다: 메모리에 있는 입력의 크기에 따라 시간이 바뀌지 않게
+# regression: baseline 의 같은 scale 결과보다 relative 가 threshold (기본 25%) 이상 늘면
+#       목록을 log 로 남기고 exit code 1 로 끝난다.
+import os, gc, sys, time, random, shutil, argparse, platform, logging, tempfile, statistics
+
+from lib.log import logger
+from utils import text
+from utils.backend import get_backend
+from utils.db_ctrl import DbCtrl, PlanCache
+from utils.json import load_json, save_json
+from utils.matcher import FuzzyMatcher
+from bench.fixtures import TOP_DIR, M_DATA_ROWS, load_dump, load_analysis, make_data_rows, report
+from bench.bench_match import missed_items
+
+BASELINE_PATH = os.path.join(TOP_DIR, "bench", "baseline.json")
+RESULT_DIR = os.path.join(TOP_DIR, "temp", "bench")
+THRESHOLD = 0.25
+MAX_SCALE = 10
+MIN_TIME = 1.0   # 짧은 case 는 적어도 이만큼 (초) 되풀이한다
+MAX_RUNS = 100
+
+
+def scaled(rows, scale, key):
+    """rows 를 scale 배로: 두 번째부터는 key 에 번호를 붙여 PK 가 겹치지 않게 한다"""
+    out = list(rows)
+    for i in range(1, scale):
+        out.extend(dict(r, **{key: "%s_%d" % (r[key], i)}) for r in rows)
+    return out
+
+
+class Inputs:
+    """case 들이 같이 쓰는 입력. 처음 쓸 때 만든다"""
+    def __init__(self, scale, work_dir):
+        self.scale = scale
+        self.work_dir = work_dir
+        self._cache = {}
+
+    def _get(self, name, make):
+        if name not in self._cache:
+            self._cache[name] = make()
+        return self._cache[name]
+
+    @property
+    def ddl(self):
+        return self._get("ddl", lambda: load_json(os.path.join(TOP_DIR, "db", "ddl.json")))
+
+    def table_ddl(self, table_name):
+        return {f["name"]: f["type"] for f in self.ddl[table_name]["fields"]}
+
+    @property
+    def data_rows(self):  # M_DATA: count.json 의 row 수 x scale
+        n = load_json(os.path.join(TOP_DIR, "output", "count.json")).get("M_DATA", M_DATA_ROWS)
+        return self._get("data_rows", lambda: make_data_rows(n * self.scale))
+
+    @property
+    def history_rows(self):
+        return self._get("history_rows", lambda: scaled(load_dump("M_HISTORY"), self.scale, "DESP"))
+
+    @property
+    def list_rows(self):
+        return self._get("list_rows", lambda: scaled(load_dump("M_LIST"), self.scale, "CODE"))
+
+    @property
+    def analysis(self):  # must-have.json + exact match 에 실패하는 항목 500 x scale
+        return self._get("analysis", lambda: load_analysis() +
+                         missed_items(self.data_rows, 500 * self.scale, seed=1))
+
+
+# -------- Cases: fn(inputs) 가 입력을 준비하고 run() 을 돌려준다. run() 의 결과는 처리한 row 수
+
+def case_normalize(inputs):
+    columns = [[r[c] for r in inputs.data_rows] for c in ("TYPE", "ITEM", "MEMO")]
+
+    def run():
+        text.str_normalize_cached.cache_clear()
+        return sum(len(text.normalize_column(col, 24)) for col in columns)
+    return run
+
+def case_hash_build(inputs):
+    from utils.program_ctrl import ProgramCtrl
+    rows = inputs.data_rows
+    return lambda: len(rows) if ProgramCtrl.build_hash(rows, 24) else 0
+
+def case_match(inputs):
+    rows, items = inputs.data_rows, inputs.analysis
+
+    def run():
+        matcher = FuzzyMatcher(rows)
+        for item in items:
+            matcher.best(item)
+        return len(items)
+    return run
+
+def case_json_save(inputs):
+    data = inputs.history_rows + inputs.list_rows
+    path = os.path.join(inputs.work_dir, "suite_save.json")
+    return lambda: save_json(data, path) or len(data)
+
+def case_json_load(inputs):
+    data = inputs.history_rows + inputs.list_rows
+    path = os.path.join(inputs.work_dir, "suite_load.json")
+    save_json(data, path)
+    return lambda: len(load_json(path))
+
+def case_convert_restore(inputs):
+    tables = [(inputs.table_ddl("M_DATA"), inputs.data_rows), (inputs.table_ddl("M_HISTORY"), inputs.history_rows)]
+
+    def run():
+        n = 0
+        for table_ddl, rows in tables:
+            plans = PlanCache(table_ddl)
+            n += len([DbCtrl.apply_plan(plans.get(r), r.values()) for r in rows])
+        return n
+    return run
+
+def case_convert_read(inputs):
+    tables = []
+    for table_name, rows in (("M_DATA", inputs.data_rows), ("M_HISTORY", inputs.history_rows)):
+        table_ddl, fields = inputs.table_ddl(table_name), list(rows[0])
+        plans = PlanCache(table_ddl)
+        restored = [DbCtrl.apply_plan(plans.get(r), r.values()) for r in rows]
+        tables.append((DbCtrl.read_plan(table_ddl, fields), restored))
+
+    def run():
+        return sum(len([DbCtrl.apply_plan(plan, v) for v in values]) for plan, values in tables)
+    return run
+
+def case_bulk_insert(inputs):
+    backend = get_backend("sqlite")
+    path = os.path.join(inputs.work_dir, "suite_insert.db")
+    if os.path.exists(path):
+        os.remove(path)
+    rows, table_ddl = inputs.history_rows, inputs.table_ddl("M_HISTORY")
+
+    def run():
+        db = backend.open_db(path, None)
+        try:
+            db.Execute("DELETE FROM M_HISTORY")
+            r = DbCtrl.bulk_insert(db, "M_HISTORY", table_ddl, rows, 2000, backend)
+            assert r["inserted"] == len(rows), r["failed"][:3]
+            return r["inserted"]
+        finally:
+            db.Close()
+    return run
+
+CASES = {
+    "normalize": case_normalize,
+    "hash_build": case_hash_build,
+    "match": case_match,
+    "json_save": case_json_save,
+    "json_load": case_json_load,
+    "convert_restore": case_convert_restore,
+    "convert_read": case_convert_read,
+    "bulk_insert": case_bulk_insert,
+}
+
+
+def calibrate(repeat):
+    """순수 Python (dict, str, int) loop: 이 PC 의 속도"""
+    def run():
+        rnd = random.Random(0)
+        d = {}
+        for i in range(200000):
+            k = "%d" % rnd.randrange(10000)
+            d[k] = d.get(k, 0) + i
+        return len(d)
+    return measure(run, repeat)
+
+def measure(run, repeat):
+    times, rows = [], 0
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(times) < repeat or (sum(times) < MIN_TIME and len(times) < MAX_RUNS):
+            start = time.perf_counter()
+            rows = run()
+            times.append(time.perf_counter() - start)
+    finally:
+        if enabled:
+            gc.enable()
+    best = min(times)
+    return {"rows": rows, "best": best, "median": statistics.median(times), "times": times,
+            "rows_per_sec": rows / best if best else 0.0}
+
+def run_suite(scale = 1, repeat = 3, only = None, work_dir = None):
+    """:return: {"scale", "repeat", "calibration", "cases": {name: {...}}, ...}"""
+    if not 1 <= scale <= MAX_SCALE:
+        raise ValueError("scale must be 1 ~ %d: %s" % (MAX_SCALE, scale))
+    names = list(CASES) if not only else only
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        raise ValueError("Unknown case: %s (one of %s)" % (", ".join(unknown), ", ".join(CASES)))
+
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="mdb_suite_")
+    inputs = Inputs(scale, work_dir)
+    level = logger.getEffectiveLevel()
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        cases, calibrations = {}, []
+        for name in names:
+            run = CASES[name](inputs)
+            calibration = calibrate(repeat)
+            calibrations.append(calibration["best"])
+            cases[name] = measure(run, repeat)
+            cases[name]["calibration"] = calibration["best"]
+            cases[name]["relative"] = cases[name]["best"] / calibration["best"]
+    finally:
+        logging.getLogger().setLevel(level)
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors = True)
+
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "scale": scale, "repeat": repeat,
+            "python": sys.version.split()[0], "platform": platform.platform(),
+            "calibration": {"best": min(calibrations), "median": statistics.median(calibrations)},
+            "cases": cases}
+
+def compare(result, baseline, threshold = THRESHOLD):
+    """:return: [(name, baseline relative, relative, ratio)] threshold 를 넘게 느려진 case"""
+    regressions = []
+    for name, case in result["cases"].items():
+        base = baseline["cases"].get(name)
+        if not base or not base.get("relative"):
+            continue
+        ratio = case["relative"] / base["relative"]
+        if ratio > 1.0 + threshold:
+            regressions.append((name, base["relative"], case["relative"], ratio))
+    return regressions
+
+def load_baseline(path, scale):
+    if not os.path.isfile(path):
+        return None
+    return load_json(path).get("scales", {}).get(str(scale))
+
+def save_baseline(path, result):
+    data = load_json(path) if os.path.isfile(path) else {"scales": {}}
+    data["scales"][str(result["scale"])] = result
+    save_json(data, path)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m bench.suite")
+    parser.add_argument("--scale", type = int, default = 1, help = "1 ~ %d" % MAX_SCALE)
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--only", default = "", help = "case1,case2 (%s)" % ",".join(CASES))
+    parser.add_argument("--out", default = None, help = "results JSON (default: temp/bench/suite_<scale>x.json)")
+    parser.add_argument("--baseline", default = BASELINE_PATH)
+    parser.add_argument("--threshold", type = float, default = THRESHOLD, help = "0.25 = 25%% slower fails")
+    parser.add_argument("--save-baseline", action = "store_true")
+    args = parser.parse_args(argv)
+
+    result = run_suite(args.scale, args.repeat, [n for n in args.only.split(",") if n] or None)
+    out = args.out or os.path.join(RESULT_DIR, "suite_%dx.json" % args.scale)
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok = True)
+    save_json(result, out)
+
+    report("Benchmark suite x%d (best of %d, calibration %.3f s)" % (
+        args.scale, args.repeat, result["calibration"]["best"]),
+        [(name, c["rows"], c["best"]) for name, c in result["cases"].items()])
+    logger.info("Results: %s", out)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, result)
+        logger.info("Baseline x%d is saved in %s", args.scale, args.baseline)
+        return 0
+
+    baseline = load_baseline(args.baseline, args.scale)
+    if baseline is None:
+        logger.warning("No baseline x%d in %s: run with --save-baseline", args.scale, args.baseline)
+        return 0
+    regressions = compare(result, baseline, args.threshold)
+    for name, base, cur, ratio in regressions:
+        logger.error("REGRESSION: %-18s %.2f → %.2f x calibration (%+.0f%%)", name, base, cur, (ratio - 1) * 100)
+    if regressions:
+        return 1
+    logger.info("No regression over %.0f%% against the baseline of %s", args.threshold * 100, baseline["time"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,9 +10,14 @@ LOG_FORMAT = "%(asctime)s [%(filename)s:%(lineno)d] %(message)s"
 # 로그 파일 경로 (필요시)
 # LOG_FILE = os.path.join(os.path.dirname(__file__), "app.log")
 
+# 로그 레벨: 환경 변수 MDB_LOG_LEVEL (DEBUG / INFO / WARNING / ERROR / CRITICAL), 기본 DEBUG
+LOG_LEVEL = os.environ.get("MDB_LOG_LEVEL", "DEBUG").strip().upper()
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    LOG_LEVEL = "DEBUG"
+
 # 기본 설정 (콘솔 + 파일)
 logging.basicConfig(
-    level=logging.DEBUG,                # DEBUG / INFO / WARNING / ERROR / CRITICAL
+    level=LOG_LEVEL,
     format=LOG_FORMAT,
     handlers=[
         logging.StreamHandler(),       # 콘솔 출력
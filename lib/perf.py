@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# - 성능 계측: 시간 (wall time), row 수, COM (DAO) 호출 수
+#
+#   from lib import perf
+#
+#   @perf.timed("DbCtrl.read_table", rows=len)          # rows: 결과 → row 수
+#   def read_table(...): ...
+#   @perf.timed("ProgramCtrl.insert", rows="json_data")  # rows: 이 argument 의 len()
+#   def insert(self, db, table_name, table_ddl, json_data): ...
+#
+#   with perf.span("export M_DATA") as s:                # 코드 일부
+#       ...
+#       s.rows = cnt
+#
+#   perf.com(n)   # DAO 호출 n 번 (OpenRecordset, GetRows, Field.Value, Execute, ...). 지금 열린
+#                 # span 들이 (같은 thread 의 바깥 span 까지) 모두 센다
+#
+# 결과는 이 process 의 registry 에 이름별로 모인다: 호출 수, 합/최소/최대 시간, row 수, COM 호출 수, 오류 수
+#   perf.registry.stats()          → {name: {...}}
+#   perf.registry.summary()        → 표 (str), perf.registry.dump_json(path)
+#
+# 꺼져 있으면 (기본) span() 은 아무것도 하지 않는 객체를, timed 함수는 원래 함수를 바로 부르고,
+# com() 은 바로 돌아간다. 켜는 방법:
+#   MDB_PERF=1                    끝날 때 summary 를 log 로 남긴다
+#   MDB_PERF_JSON=<path>          끝날 때 stats 를 JSON 으로도 남긴다 (MDB_PERF 없이도 켠다)
+#   perf.enable(json_path=None)   code 에서
+import os, time, atexit, functools, inspect, threading
+
+from lib.log import logger
+from utils.json import save_json
+
+
+class Stat:
+    __slots__ = ("calls", "total", "min", "max", "rows", "com", "errors")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.rows = 0
+        self.com = 0
+        self.errors = 0
+
+    def add(self, elapsed, rows, com, error):
+        self.calls += 1
+        self.total += elapsed
+        self.min = elapsed if self.min is None or elapsed < self.min else self.min
+        self.max = elapsed if elapsed > self.max else self.max
+        self.rows += rows or 0
+        self.com += com
+        self.errors += error
+
+    def as_dict(self):
+        return {"calls": self.calls, "total": self.total, "mean": self.total / self.calls if self.calls else 0.0,
+                "min": self.min or 0.0, "max": self.max, "rows": self.rows, "com": self.com,
+                "errors": self.errors, "rows_per_sec": self.rows / self.total if self.total else 0.0}
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = False
+        self.json_path = None
+        self._stats = {}  # name → Stat
+        self._lock = threading.Lock()
+        self._local = threading.local()  # thread 의 COM 호출 수
+        self._at_exit = False
+
+    def enable(self, json_path = None):
+        self.enabled = True
+        if json_path:
+            self.json_path = json_path
+        if not self._at_exit:
+            atexit.register(self.report)
+            self._at_exit = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def com_count(self):
+        return getattr(self._local, "com", 0)
+
+    def add(self, name, elapsed, rows = None, com = 0, error = False):
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                stat = self._stats[name] = Stat()
+            stat.add(elapsed, rows, com, error)
+
+    def stats(self):
+        with self._lock:
+            return {name: s.as_dict() for name, s in self._stats.items()}
+
+    def summary(self):
+        """시간 합이 큰 것부터"""
+        stats = sorted(self.stats().items(), key=lambda kv: -kv[1]["total"])
+        width = max([len(n) for n, _ in stats] + [4])
+        lines = ["%-*s %8s %10s %10s %10s %10s %12s %10s" % (
+            width, "span", "calls", "total s", "mean ms", "max ms", "rows", "rows/s", "com")]
+        for name, s in stats:
+            lines.append("%-*s %8d %10.3f %10.2f %10.2f %10d %12.0f %10d%s" % (
+                width, name, s["calls"], s["total"], s["mean"] * 1e3, s["max"] * 1e3, s["rows"],
+                s["rows_per_sec"], s["com"], "  (%d errors)" % s["errors"] if s["errors"] else ""))
+        return "\n".join(lines)
+
+    def dump_json(self, path):
+        """다른 출력 파일처럼 임시 파일에 쓰고 replace 한다 (utils/atomic.py)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        save_json({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "pid": os.getpid(),
+                   "spans": self.stats()}, path)
+        return path
+
+    def report(self):
+        """process 가 끝날 때 (enable() 했으면)"""
+        if not self._stats:
+            return
+        logger.info("───────────────────────────────────")
+        for line in self.summary().splitlines():
+            logger.info("    %s", line)
+        logger.info("───────────────────────────────────")
+        if self.json_path:
+            try:
+                logger.info("Perf stats are saved as %s", self.dump_json(self.json_path))
+            except Exception as e:
+                logger.error("%s: ERROR: Failed in saving perf stats as %s", e, self.json_path)
+
+
+registry = Registry()
+
+
+class Span:
+    __slots__ = ("name", "rows", "_start", "_com")
+
+    def __init__(self, name, rows = None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._com = registry.com_count()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        registry.add(self.name, elapsed, self.rows, registry.com_count() - self._com, exc_type is not None)
+        return False
+
+
+class _NullSpan:
+    """꺼져 있을 때의 span: s.rows = ... 도 받는다"""
+    __slots__ = ("rows",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable(json_path = None):
+    return registry.enable(json_path)
+
+def disable():
+    registry.disable()
+
+def span(name, rows = None):
+    """with perf.span(name) as s: ... s.rows = n"""
+    if not registry.enabled:
+        return _NULL_SPAN
+    return Span(name, rows)
+
+def com(n = 1):
+    """DAO (COM) 호출 n 번"""
+    if registry.enabled:
+        local = registry._local
+        local.com = getattr(local, "com", 0) + n
+
+def timed(name = None, rows = None):
+    """
+    함수를 span 으로 잰다. name: 없으면 함수의 __qualname__
+    rows: 결과 → row 수 인 함수 (len 등), 또는 row 수가 그 len() 인 argument 의 이름
+    """
+    def decorate(fn):
+        label = name or fn.__qualname__
+        count = rows
+        if isinstance(rows, str):
+            params = list(inspect.signature(fn).parameters)
+            index = params.index(rows)
+
+            def count(result, args, kwargs):
+                data = kwargs[rows] if rows in kwargs else args[index] if index < len(args) else None
+                return len(data) if hasattr(data, "__len__") else None
+        elif rows is not None:
+            count = lambda result, args, kwargs: rows(result)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            with Span(label) as s:
+                result = fn(*args, **kwargs)
+                if count is not None:
+                    s.rows = count(result, args, kwargs)
+            return result
+        return wrapper
+    return decorate
+
+
+if os.environ.get("MDB_PERF", "").strip().lower() not in ("", "0", "false", "no", "off") or \
+        os.environ.get("MDB_PERF_JSON"):
+    registry.enable(os.environ.get("MDB_PERF_JSON") or None)
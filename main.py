@@ -1,73 +1,136 @@
 import os, sys, subprocess, shutil, time, json
 
 from lib.log import logger
-from utils.medical import Program
 from utils.config import Config
+from utils.json import load_json
+from utils.atomic import atomic_copy
 
-config = Config()
-program = Program(config)
+config = Config
+_program = None
+
+
+def program(maintenance = False): 
+    # ProgramCtrl is made on the first use: importing main.py does not load ddl.json, 
+    # probe the external drive or open an MDB
+    global _program
+    if _program is None: 
+        from utils.program_ctrl import ProgramCtrl
+        _program = ProgramCtrl(config)
+    # MEDICAL.mdb bloats with delete/insert cycles: compact it in the background when idle.
+    # Only for the callers that stay running (the UI inserting programs), not for one-shot commands
+    if maintenance: 
+        _program.maintenance.start()
+    return _program
 
 
 def copy_mdb_to_external(): 
     # copy PC's MEDICAL.mdb file into external drive's pre-defined directory
-    src = config["int_drive"]["mdb_path"]
-    dst = config["ext_drive"]["mdb_path"]
+    src = config.sys_drv["mdb_path"]
+    dst = config.ext_drv["mdb_path"]
     try:
-        shutil.copy2(src, dst)
+        atomic_copy(src, dst)  # the copy on the drive is either the old or the complete new one
         logger.info("%s is copied as %s", src, dst)
     except Exception as e:
         logger.exception("%s: ERROR: Copy failed: %s -> %s", e, src, dst)
 
 
-def mdb_import_json(): 
+# The USB workflow for the client sessions (client/<name>/<timestamp>/json/) in one overlapped run: 
+# copy MEDICAL.mdb to the external drive, build the program of each session and insert it into the copy 
+# (utils/pipeline.py). Ctrl+C stops it: the copy on the drive is left as it was
+def usb_sessions(prog_name = None): 
+    from utils.pipeline import SessionPipeline
+    return SessionPipeline(program(), prog_name = prog_name).run()
+
+
+def mdb_import_json(json_file): 
     # Import json-exported row data into MEDICAL.mdb
     # - If the program name of the imported is in use in MEDICAL.mdb, 
     #   it is suffixed with "_1"
+    p = program(maintenance = True)
 
     # 1. Check that the given json_file is there 
-    json_path = os.path.join(config["ext_drive"]["json_dir"], config["json_file"])
-    return {"result": "ERROR: No such json file: {}".format(json_path), 
-            "add_cnt" : add_cnt, "add_list" : add_list, 
-            "drop_cnt" : drop_cnt, "drop_list": drop_list}
-    rows = load_json(json_path)
+    json_path = p._get_json_path(None, json_file)
+    if not os.path.isfile(json_path): 
+        return {"result": "ERROR: No such json file: {}".format(json_path), 
+                "add_cnt" : 0, "add_list" : [], 
+                "drop_cnt" : 0, "drop_list": []}
 
-    # 2. Check that the given prog_name can be used in the new mdb
-    prog_name_list = []
-    for r in rows: 
-        if r["DESC"] not in prog_name_list: 
-            prog_name_list.append()
-    
-    for p in prog_name_list: 
+    # 2. Check that the given prog_name can be used in the new mdb and 
+    # 3. Import the json elements into the mdb
+    with p.sys_db_ctrl.connection() as db: 
+        plan, report = p.import_programs(db, json_path)
+    add_list = [a for a in plan if a["action"] != "skip"]
+    drop_list = report["failed"] if report else []
+    add_cnt = report["inserted"] if report else 0
+    if drop_list: 
+        result = f"ERROR: {len(drop_list)} rows are dropped"
+    else: 
+        result = f"{add_cnt} table rows are inserted"
 
     return {"result": result, 
             "add_cnt" : add_cnt, "add_list" : add_list, 
-            "drop_cnt" : drop_cnt, "drop_list": drop_list}
-
-    # 3. Import the json elements into the mdb
-    return mdb_insert_json(json_file, prog_name)
+            "drop_cnt" : len(drop_list), "drop_list": drop_list}
 
 # Insert  
-def insert_analysis_json(self, json_file, prog_name):
+def insert_analysis_json(json_file, prog_name):
+    p = program(maintenance = True)
     
     # 1. Kill the running, if any
-    # kill_processes_startswith(config["exe_file"])
+    # kill_processes_startswith(config.exe_file)
     
     # 2. Start inserting new program
-    json_path = os.path.join(config["ext_drive"]["json_dir"], json_file)
-    add_cnt, add_list, drop_cnt, drop_list = \
-        process_prescription(config["int_drive"]["mdb_path"], 
-                            config["password"], 
-                            json_Path, 
-                            prog_name)
+    json_path = p._get_json_path(None, json_file)
+    add_list = p.build_1program([json_path], prog_name)
+    file_reports = load_json(config.run_drv["program_report_path"])
+    drop_list = [m for r in file_reports for m in r["matches"] if m["mode"] == "dropped"]
+    with p.sys_db_ctrl.connection() as db: 
+        report, = p.insert_from_json(db, [config.run_drv["program_path"]])
+    add_cnt, drop_cnt = report["inserted"], len(drop_list)
     if drop_cnt > 0: 
         result = f"ERORR: {drop_cnt} json items are dropped"
     else: 
         result = f"{add_cnt} table rows are inserted"
 
     return {"result" : result, 
-            "mdb_file" : config["int_drive"]["mdb_path"], 
+            "mdb_file" : config.sys_drv["mdb_path"], 
             "json_file" : json_path, 
             "prog_name" : prog_name, 
             "add_cnt" : add_cnt, "add_list": add_list, 
             "drop_cnt" : drop_cnt, "drop_list": drop_list}
 
+
+# Dump every table in db/ddl.json into run_drv["dump_dir"]
+def mdb_read(): 
+    from utils.dump import dump_tables
+    p = program()
+    return dump_tables(p.sys_db_ctrl, config.run_drv["dump_dir"], p.ddl)
+
+# Restore the dump into an MDB (default: the system MDB). The tables are emptied first
+def mdb_write(mdb_path = None): 
+    from utils.dump import restore_tables
+    from utils.db_ctrl import DbCtrl
+    p = program()
+    db_ctrl = p.sys_db_ctrl if mdb_path is None else DbCtrl(mdb_path, config.password, config.backend)
+    return restore_tables(db_ctrl, config.run_drv["dump_dir"], p.ddl)
+
+
+# Compact the system MDB now, whatever the growth
+def mdb_compact(): 
+    return program().maintenance.run_once(force=True)
+
+
+if __name__ == "__main__": 
+    if len(sys.argv) < 2 or sys.argv[1] not in ("read", "write", "compact", "usb"): 
+        logger.error("python main.py read | write [mdb_path] | compact | usb [prog_name]")
+        sys.exit(1)
+    if config.configure() is None: 
+        sys.exit(1)
+    if sys.argv[1] == "read": 
+        mdb_read()
+    elif sys.argv[1] == "write": 
+        mdb_write(sys.argv[2] if len(sys.argv) > 2 else None)
+    elif sys.argv[1] == "usb": 
+        if usb_sessions(sys.argv[2] if len(sys.argv) > 2 else None)["cancelled"]: 
+            sys.exit(1)
+    else: 
+        mdb_compact()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# - 출력 파일을 atomic 하게 쓴다: 같은 폴더의 임시 파일에 다 쓰고 os.replace 로 바꾼다
+#
+#   with AtomicFile(path) as f:       # 예외로 끝나면 임시 파일만 지우고 path 는 그대로
+#       f.write(b"...")
+#   atomic_copy(src, dst)             # MDB 를 USB 로 복사할 때 등
+#
+# - 읽는 쪽 (USB copier, 다른 process) 은 예전 파일 아니면 다 쓴 새 파일을 본다. 반쯤 쓴 파일은 없다
+# - 지우고 (rm) 기다렸다가 (sleep) 쓰지 않는다: 쓰는 동안에도 예전 파일이 있다
+# - fsync: replace 전에 임시 파일의 내용을 disk 로 내린다. 전원이 나가도 path 는 예전 것 아니면
+#          새 것이다 (내용이 빈 파일이 되지 않는다). POSIX 에서는 폴더도 fsync 한다.
+#          기본값은 FSYNC (환경 변수 MDB_FSYNC=0 이면 끈다)
+# - Windows 는 다른 process 가 열고 있는 파일로 replace 하지 못한다 (PermissionError):
+#   REPLACE_RETRIES 번까지 조금씩 더 기다리며 다시 한다. 평소에는 기다리지 않는다
+import os, time, shutil, threading, itertools
+
+FSYNC = os.environ.get("MDB_FSYNC", "1").strip().lower() not in ("0", "false", "no", "off")
+REPLACE_RETRIES = 8  # 0.01 → 1.28 초
+
+
+def replace(src, dst, retries = REPLACE_RETRIES):
+    delay = 0.01
+    for i in range(retries + 1):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if i == retries:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+def fsync_dir(path):
+    """path 가 있는 폴더의 entry (rename) 를 disk 로. Windows 는 폴더를 열 수 없어 하지 않는다"""
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AtomicFile:
+    """임시 파일에 쓰고 close() 에서 path 로 replace 한다. 예외로 끝나면 (discard) 임시 파일을 지운다"""
+    _ids = itertools.count()
+
+    def __init__(self, path, fsync = None):
+        self.path = path
+        self.fsync = FSYNC if fsync is None else fsync
+        self.tmp_path = "%s.%d.%d.%d.tmp" % (path, os.getpid(), threading.get_ident(), next(self._ids))
+        self.f = open(self.tmp_path, "xb")
+
+    @property
+    def closed(self):
+        return self.f.closed
+
+    def write(self, data):
+        return self.f.write(data)
+
+    def close(self):
+        if self.f.closed:
+            return
+        try:
+            if self.fsync:
+                self.f.flush()
+                os.fsync(self.f.fileno())
+            self.f.close()
+            replace(self.tmp_path, self.path)
+        except BaseException:
+            self.discard()
+            raise
+        if self.fsync:
+            fsync_dir(self.path)
+
+    def discard(self):
+        if not self.f.closed:
+            self.f.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+def atomic_copy(src, dst, fsync = None, buffer_size = 1 << 20, progress = None):
+    """
+    shutil.copy2 처럼 (내용 + mtime 등) 복사한다. dst 는 다 복사된 뒤에 바뀐다
+    progress(복사한 byte): chunk 마다. 예외를 내면 복사를 멈추고 dst 는 그대로다
+    """
+    with open(src, "rb") as fsrc, AtomicFile(dst, fsync) as fdst:
+        if progress is None:
+            shutil.copyfileobj(fsrc, fdst, buffer_size)
+        else:
+            copied = 0
+            while True:
+                chunk = fsrc.read(buffer_size)
+                if not chunk:
+                    break
+                fdst.write(chunk)
+                copied += len(chunk)
+                progress(copied)
+        fdst.f.flush()
+        shutil.copystat(src, fdst.tmp_path)
+    return dst
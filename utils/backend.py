@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+# - Storage backend: DAO(Jet) 엔진 + SQLite stand-in
+#
+# DbCtrl, Sql, ProgramCtrl 은 DAO 객체 모양(Database / Recordset / Field)으로만
+# DB 를 다룬다. 엔진 수준의 작업(엔진 감지, open, compact, transaction)은
+# backend 객체를 통해서 한다.
+#
+#   DaoBackend    : win32com DAO. 실제 MEDICAL.mdb (32bit Windows)
+#   SqliteBackend : db/ddl.json 으로 schema 를 만들고 DAO 객체 모양을 흉내낸다.
+#                   Linux CI 에서 export / insert / matching 을 돌리고 시간 재는 용도
+import os, re, json, sqlite3, datetime, threading
+from decimal import Decimal
+
+from lib.log import logger
+
+DDL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "ddl.json")
+
+# DAO constants
+dbOpenTable = 1
+dbOpenDynaset = 2
+dbFailOnError = 128
+
+
+class DaoBackend:
+    name = "dao"
+    thread_affine = True  # COM: Database 는 연 thread 에서 쓰고 닫는다 (utils/db_pool.py)
+
+    def __init__(self):
+        # COM 객체는 만든 thread 에서만 쓸 수 있다: DBEngine 은 thread 마다 하나
+        self._local = threading.local()
+        self.engine_name = None
+
+    @property
+    def engine(self):
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            self.init_thread()
+            engine, self.engine_name = self.detect_engine()
+            # 강제로 workgroup 초기화 (보안파일 detach)
+            engine.SystemDB = ""
+            self._local.engine = engine
+        return engine
+
+    def init_thread(self):
+        """main thread 가 아닌 thread 에서 COM 을 쓰기 전에 (thread 마다 한 번)"""
+        if threading.current_thread() is not threading.main_thread() and \
+                not getattr(self._local, "com", False):
+            import pythoncom
+            pythoncom.CoInitialize()
+            self._local.com = True
+
+    @staticmethod
+    def detect_engine(): # DAO 엔진 자동 감지 (WinXP~Win10 호환)
+        from win32com.client import Dispatch
+
+        engine, engine_name = None, None
+        candidates = [
+            "DAO.DBEngine.35",   # Jet 3.5 (Win9x/XP)
+            "DAO.DBEngine.36",   # Jet 3.6 (WinXP)
+            "DAO.DBEngine.120",  # Jet 4.0 (Win7/Win10)
+            "DAO.DBEngine"       # fallback
+        ]
+        for v in candidates:
+            try:
+                engine = Dispatch(v)
+                engine_name = v
+            except:
+                continue
+        if engine == None:
+            raise RuntimeError("No usable DAO engine found.")
+
+        logger.info("DAO Engine: %s", engine_name)
+        return engine, engine_name
+
+    def open_db(self, mdb_path, password):
+        connect = "" if password is None else ";PWD={}".format(password)
+        # Exclusive: False, Read-Only: False
+        return self.engine.OpenDatabase(mdb_path, False, False, connect)
+
+    def compact_db(self, src_path, dst_path, password):
+        # COM 초기화 (XP 필수): main thread 는 win32com 이 이미 했다. 다른 thread 는 한 번만
+        self.init_thread()
+        src_conn = ";PWD=" + password if password else ""
+        self.engine.CompactDatabase(
+            src_path,
+            dst_path,
+            None,  # default locale
+            0,     # options
+            src_conn
+        )
+
+    def is_alive(self, db):
+        """닫혔거나 engine 이 없어진 Database 객체는 property 를 읽을 때 COM error 를 낸다"""
+        try:
+            db.Name
+            return True
+        except Exception:
+            return False
+
+    # Transaction 은 Workspace 단위다. OpenDatabase 는 Workspaces(0) 에 열린다.
+    def begin_trans(self, db):
+        self.engine.Workspaces(0).BeginTrans()
+
+    def commit_trans(self, db):
+        self.engine.Workspaces(0).CommitTrans()
+
+    def rollback(self, db):
+        self.engine.Workspaces(0).Rollback()
+
+
+# ------------------------
+# SQLite stand-in
+# ------------------------
+
+# DAO field type → SQLite column affinity
+SQLITE_TYPES = {
+    1: "INTEGER",  # YESNO
+    3: "INTEGER",  # INTEGER
+    4: "INTEGER",  # LONG
+    5: "REAL",     # CURRENCY
+    6: "REAL",     # SINGLE
+    7: "REAL",     # DOUBLE
+    8: "TEXT",     # DATETIME (ISO 8601)
+    10: "TEXT",    # TEXT
+    12: "TEXT",    # MEMO
+}
+
+_UTC = datetime.timezone.utc
+
+def _to_datetime(v):
+    # pywintypes datetime 처럼 항상 UTC tz-aware 로 돌려준다
+    if v is None or isinstance(v, datetime.datetime):
+        dt = v
+    else:
+        dt = datetime.datetime.fromisoformat(str(v).replace(" ", "T"))
+    if dt is not None and dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_UTC)
+    return dt
+
+def _to_sql(v):
+    """Python/DAO 값 → SQLite 저장 값"""
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, datetime.datetime):
+        return _to_datetime(v).isoformat()
+    if isinstance(v, datetime.date):
+        return _to_datetime(datetime.datetime(v.year, v.month, v.day)).isoformat()
+    return v
+
+def _from_sql_converter(field_type):
+    """SQLite 저장 값 → DAO 가 돌려주는 것과 같은 타입"""
+    if field_type == 5:
+        return lambda v: None if v is None else Decimal(repr(v))
+    if field_type == 8:
+        return lambda v: None if v is None else _to_datetime(v)
+    return None
+
+def _infer_type(v):
+    if isinstance(v, bool):
+        return 1
+    if isinstance(v, int):
+        return 4
+    if isinstance(v, float):
+        return 7
+    return 10
+
+def _fix(v): # Jet FIX(): 0 방향으로 버림
+    if v is None:
+        return None
+    return float(int(v))
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_DATE_LITERAL = re.compile(r"#(\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?)?)#")
+_FROM_TABLE = re.compile(r"\bFROM\s+\[?([^\s\];,()]+)", re.IGNORECASE)
+
+def jet_to_sqlite(sql):
+    """Jet SQL 방언 중 이 repo 에서 쓰는 것만 SQLite 로 옮긴다: #date# literal"""
+    parts = _STRING_LITERAL.split(sql)
+    for i in range(0, len(parts), 2):  # 짝수 index 가 문자열 literal 바깥
+        parts[i] = _DATE_LITERAL.sub(
+            lambda m: "'%s'" % _to_datetime(m.group(1)).isoformat(), parts[i])
+    return "".join(parts)
+
+
+class SqliteField:
+    def __init__(self, recordset, index, name, field_type, size=None):
+        self._rs = recordset
+        self._index = index
+        self._convert = _from_sql_converter(field_type)
+        self.Name = name
+        self.Type = field_type
+        self.Size = size
+        self.Attributes = 0
+
+    @property
+    def Value(self):
+        rs = self._rs
+        if rs._edit is not None and self.Name in rs._edit:
+            return rs._edit[self.Name]
+        if rs._row is None:
+            raise RuntimeError("No current record.")
+        v = rs._row[self._index]
+        return v if self._convert is None else self._convert(v)
+
+    @Value.setter
+    def Value(self, v):
+        if self._rs._edit is None:
+            raise RuntimeError("Update or CancelUpdate without AddNew or Edit.")
+        self._rs._edit[self.Name] = v
+
+
+class SqliteCollection: # DAO collection: iterate, Count, call by name or ordinal
+    def __init__(self, items):
+        self._items = items
+        self._by_name = {f.Name: f for f in items}
+        self._by_name.update({f.Name.upper(): f for f in items})
+        self.Count = len(items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __call__(self, key):
+        if isinstance(key, int):
+            return self._items[key]
+        f = self._by_name.get(key) or self._by_name.get(key.upper())
+        if f is None:
+            raise KeyError("Item not found in this collection: %s" % key)
+        return f
+
+
+class SqliteRecordset:
+    def __init__(self, db, sql, table=None):
+        self._db = db
+        self._sql = sql
+        self._table = table
+        self._edit = None
+        self._execute()
+
+    def _execute(self):
+        self._cursor = self._db._conn.execute(self._sql)
+        self._row = self._cursor.fetchone()
+        self._moved = False
+
+        ddl_types = self._db._field_types(self._table or self._source_table())
+        fields = []
+        for i, d in enumerate(self._cursor.description or ()):
+            name = d[0]
+            field_type = ddl_types.get(name) or ddl_types.get(name.upper())
+            if field_type is None:
+                field_type = _infer_type(self._row[i]) if self._row is not None else 10
+            fields.append(SqliteField(self, i, name, field_type))
+        self.Fields = SqliteCollection(fields)
+
+    def _source_table(self):
+        m = _FROM_TABLE.search(self._sql)
+        return m.group(1) if m else None
+
+    @property
+    def EOF(self):
+        return self._row is None
+
+    @property
+    def BOF(self):
+        return not self._moved and self._row is None
+
+    @property
+    def RecordCount(self): # DAO 처럼 지금까지 접근한 record 수가 아니라 전체 수
+        sql = "SELECT COUNT(*) FROM (%s)" % self._sql.rstrip().rstrip(";")
+        return self._db._conn.execute(sql).fetchone()[0]
+
+    def MoveFirst(self):
+        if self._moved:
+            self._execute()
+
+    def MoveNext(self):
+        if self._row is None:
+            raise RuntimeError("No current record.")
+        self._moved = True
+        self._row = self._cursor.fetchone()
+
+    def GetRows(self, rows=1):
+        """DAO GetRows: [field][row] 모양의 2 차원 tuple. 현재 record 부터 읽는다."""
+        if self._row is None:
+            return ()
+        fetched = [self._row]
+        if rows > 1:
+            fetched.extend(self._cursor.fetchmany(rows - 1))
+        self._moved = True
+        self._row = self._cursor.fetchone() if len(fetched) == rows else None
+
+        columns = []
+        for f, col in zip(self.Fields, zip(*fetched)):
+            if f._convert is not None:
+                col = tuple(f._convert(v) for v in col)
+            columns.append(col)
+        return tuple(columns)
+
+    def AddNew(self):
+        if self._table is None:
+            raise RuntimeError("Operation is not supported for this type of object.")
+        self._edit = {}
+
+    def Update(self):
+        if self._edit is None:
+            raise RuntimeError("Update or CancelUpdate without AddNew or Edit.")
+        edit, self._edit = self._edit, None
+        self._db._insert(self._table, list(edit.keys()), [list(edit.values())])
+
+    def CancelUpdate(self):
+        self._edit = None
+
+    def Close(self):
+        self._cursor.close()
+
+
+class SqliteTableDef:
+    def __init__(self, name, ddl):
+        self.Name = name
+        self.Fields = SqliteCollection(
+            [SqliteField(None, i, f["name"], f["type"], f.get("size"))
+                for i, f in enumerate(ddl["fields"])])
+        self.Indexes = [_SqliteIndex(i) for i in ddl.get("indexes", [])]
+
+
+class _SqliteIndex:
+    def __init__(self, idx):
+        self.Name = idx["name"]
+        self.Primary = idx.get("primary", False)
+        self.Unique = idx.get("unique", False)
+        self.Required = idx.get("required", False)
+        self.Fields = [_SqliteIndexField(f) for f in idx["fields"]]
+
+
+class _SqliteIndexField:
+    def __init__(self, name):
+        self.Name = name
+
+
+_PARAMETERS = re.compile(r"^\s*PARAMETERS\s+(.*?);\s*(.*)$", re.IGNORECASE | re.DOTALL)
+_PARAMETER = re.compile(r"^\s*\[?([^\]\s]+)\]?\s+(.+?)\s*$")
+
+class SqliteParameter:
+    def __init__(self, name, param_type):
+        self.Name = name
+        self.Type = param_type  # DAO 와 달리 PARAMETERS 에 쓴 type 문자열
+        self.Value = None
+
+
+class SqliteQueryDef:
+    """
+    DAO QueryDef: "PARAMETERS [p0] LONG, ...; INSERT ... VALUES ([p0], ...)".
+    SQL 은 만들 때 한 번 옮기고 (parameter → :name), Execute 는 Parameters 의 Value 로 실행한다
+    """
+    def __init__(self, db, name, sql):
+        self._db = db
+        self.Name = name
+        self.SQL = sql
+        params = []
+        m = _PARAMETERS.match(sql)
+        if m:
+            decls, sql = m.groups()
+            for decl in decls.split(","):
+                p = _PARAMETER.match(decl)
+                if p is None:
+                    raise RuntimeError("Syntax error in PARAMETERS clause: %s" % decl)
+                params.append(SqliteParameter(*p.groups()))
+        self.Parameters = SqliteCollection(params)
+
+        names = {p.Name for p in params}
+        parts = _STRING_LITERAL.split(jet_to_sqlite(sql))
+        for i in range(0, len(parts), 2):  # 짝수 index 가 문자열 literal 바깥
+            parts[i] = re.sub(r"\[([^\]]+)\]",
+                lambda m: ":" + m.group(1) if m.group(1) in names else m.group(0), parts[i])
+        self._sql = "".join(parts)
+
+    def Execute(self, options=None):
+        cur = self._db._conn.execute(self._sql, {p.Name: _to_sql(p.Value) for p in self.Parameters})
+        self._db.RecordsAffected = cur.rowcount
+
+    def Close(self):
+        pass
+
+
+class SqliteDatabase:
+    """DAO Database 객체 모양의 SQLite 연결"""
+    def __init__(self, backend, path, conn):
+        self._backend = backend
+        self._conn = conn
+        self._in_trans = False
+        self.Name = path
+        self.version = self.Version = "sqlite-" + sqlite3.sqlite_version
+        self.Updatable = True
+        self.ReadOnly = False
+        self.RecordsAffected = 0
+
+    def _field_types(self, table):
+        ddl = self._backend.ddl.get(table) if table else None
+        if ddl is None:
+            return {}
+        return {f["name"]: f["type"] for f in ddl["fields"]}
+
+    def _insert(self, table, cols, rows):
+        sql = "INSERT INTO [%s] (%s) VALUES (%s)" % (
+            table, ", ".join("[%s]" % c for c in cols), ", ".join("?" * len(cols)))
+        cur = self._conn.executemany(sql, ([_to_sql(v) for v in r] for r in rows))
+        return cur.rowcount
+
+    @property
+    def TableDefs(self):
+        return SqliteCollection(
+            [SqliteTableDef(name, ddl) for name, ddl in self._backend.ddl.items()])
+
+    def Execute(self, sql, options=None):
+        cur = self._conn.execute(jet_to_sqlite(sql))
+        self.RecordsAffected = cur.rowcount
+
+    def CreateQueryDef(self, name="", sql=""):
+        # name 이 "" 이면 저장하지 않는 임시 QueryDef (DAO 와 같다)
+        return SqliteQueryDef(self, name, sql)
+
+    def OpenRecordset(self, source, type=None):
+        name = source.strip().strip("[]")
+        if name in self._backend.ddl:
+            return SqliteRecordset(self, "SELECT * FROM [%s]" % name, table=name)
+        return SqliteRecordset(self, jet_to_sqlite(source))
+
+    def BeginTrans(self):
+        self._conn.execute("BEGIN")
+        self._in_trans = True
+
+    def CommitTrans(self):
+        self._conn.execute("COMMIT")
+        self._in_trans = False
+
+    def Rollback(self):
+        self._conn.execute("ROLLBACK")
+        self._in_trans = False
+
+    def Close(self):
+        if self._in_trans:
+            self.Rollback()
+        self._conn.close()
+
+
+class SqliteBackend:
+    name = "sqlite"
+    thread_affine = False  # check_same_thread=False: 어느 thread 에서나 닫는다
+    engine_name = "sqlite3 " + sqlite3.sqlite_version
+
+    def __init__(self, ddl_path=DDL_PATH):
+        self.ddl_path = ddl_path
+        self._ddl = None
+        self._memory = {}  # ":memory:" 이름 → 살려둘 연결 (닫히면 DB 가 사라진다)
+
+    @property
+    def ddl(self):
+        if self._ddl is None:
+            with open(self.ddl_path, "r", encoding="utf-8") as f:
+                self._ddl = json.load(f)
+        return self._ddl
+
+    def _connect(self, path):
+        if path.startswith(":memory:"):
+            # ":memory:sys", ":memory:ext" 처럼 이름별로 공유되는 in-memory DB
+            uri = "file:%s?mode=memory&cache=shared" % (path.replace(":", "_") or "memdb")
+            conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+            if path not in self._memory:
+                self._memory[path] = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        conn.create_function("FIX", 1, _fix)
+        return conn
+
+    def create_schema(self, conn):
+        for table, ddl in self.ddl.items():
+            cols = ["[%s] %s" % (f["name"], SQLITE_TYPES.get(f["type"], "TEXT")) for f in ddl["fields"]]
+            for idx in ddl.get("indexes", []):
+                if idx.get("primary"):
+                    cols.append("PRIMARY KEY (%s)" % ", ".join("[%s]" % f for f in idx["fields"]))
+            conn.execute("CREATE TABLE IF NOT EXISTS [%s] (%s)" % (table, ", ".join(cols)))
+
+    def open_db(self, mdb_path, password):
+        # password 는 Jet 전용. SQLite 에서는 무시한다
+        db = SqliteDatabase(self, mdb_path, self._connect(mdb_path))
+        self.create_schema(db._conn)
+        return db
+
+    def compact_db(self, src_path, dst_path, password):
+        conn = self._connect(src_path)
+        try:
+            conn.execute("VACUUM INTO ?", (dst_path,))
+        finally:
+            conn.close()
+
+    def init_thread(self):
+        pass
+
+    def is_alive(self, db):
+        try:
+            db._conn.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def begin_trans(self, db):
+        db.BeginTrans()
+
+    def commit_trans(self, db):
+        db.CommitTrans()
+
+    def rollback(self, db):
+        db.Rollback()
+
+    # -------- Seeding
+
+    def seed_table(self, db, table_name, rows):
+        """json dump 의 row(dict) 들을 그대로 table 에 넣는다"""
+        if not rows:
+            return 0
+        cols = [f["name"] for f in self.ddl[table_name]["fields"]]
+        db.BeginTrans()
+        try:
+            db._insert(table_name, cols, ([r.get(c) for c in cols] for r in rows))
+        except Exception:
+            db.Rollback()
+            raise
+        db.CommitTrans()
+        return len(rows)
+
+    def seed_from_dumps(self, db, dump_dir, prefix="medical.json_"):
+        """output/medical.json_<TABLE>.json dump 들로 table 을 채운다"""
+        counts = {}
+        for table_name in self.ddl:
+            path = os.path.join(dump_dir, prefix + table_name + ".json")
+            if not os.path.isfile(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                counts[table_name] = self.seed_table(db, table_name, json.load(f))
+        logger.info("Seeded from %s: %s", dump_dir, counts)
+        return counts
+
+
+BACKENDS = {
+    "dao": DaoBackend,
+    "sqlite": SqliteBackend,
+}
+_instances = {}
+
+def get_backend(backend=None):
+    """이름("dao", "sqlite") 또는 backend 객체 → backend 객체. 이름별로 하나만 만든다"""
+    if backend is None:
+        backend = "dao"
+    if not isinstance(backend, str):
+        return backend
+    if backend not in _instances:
+        if backend not in BACKENDS:
+            raise ValueError("Unknown storage backend: %s" % backend)
+        _instances[backend] = BACKENDS[backend]()
+    return _instances[backend]
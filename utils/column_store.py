@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# - M_DATA / M_HISTORY 의 column store (NumPy). 주파수 대역, DESP 별 시간, GRP 분포 같은
+#   질문을 Jet query 나 dict loop 없이 메모리에서 vectorized 로 답한다
+#
+#   store = ColumnStore.from_snapshot("db/data_table.snap")       # export_data_table 의 snapshot
+#   store = ColumnStore.from_rows("M_HISTORY", Sql.iter_query(db, "SELECT * FROM M_HISTORY"))
+#
+#   mask = store.between("DATA1", 10.0, 20.0) & store.isin("TYPE", "분석")
+#   store.take(mask, ("CODE", "DATA1"))             # → [{"CODE", "DATA1"}]
+#   store.group_by("DESP", "DATA2", "sum")          # → {DESP: 합}
+#   store.value_counts("GRP")                       # → {GRP: 개수}, 많은 것부터
+#
+# column:
+#   문자열 → Categorical: int32 code (-1 = None) + categories list. snapshot 의 "str" column 은
+#            string table index 를 그대로 code 로 읽는다 (np.frombuffer + np.unique)
+#   숫자   → float64 (None = NaN)
+#   그 외  → object array
+# numpy 는 이 module 에만 필요하다 (32bit Python 3.8: pip install "numpy<1.25")
+import sys, json
+
+from utils.snapshot import load_blocks, load_table, is_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # utils 의 다른 module 은 numpy 없이 쓴다
+    np = None
+
+AGGREGATES = ("count", "sum", "mean", "min", "max")
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("utils/column_store.py needs numpy. "
+                          "Install it with: pip install numpy (32bit Python 3.8: pip install \"numpy<1.25\")")
+
+
+class Categorical:
+    """문자열 column: codes[i] 는 categories 의 index, -1 은 None"""
+    __slots__ = ("codes", "categories", "_lookup")
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+        self._lookup = None
+
+    @classmethod
+    def from_values(cls, values):
+        lookup, categories = {}, []
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, v in enumerate(values):
+            if v is None:
+                codes[i] = -1
+                continue
+            c = lookup.get(v)
+            if c is None:
+                c = lookup[v] = len(categories)
+                categories.append(v)
+            codes[i] = c
+        return cls(codes, categories)
+
+    @classmethod
+    def from_codes(cls, codes, strings):
+        """codes: strings(여러 column 이 같이 쓰는 table) 의 index. 이 column 에 나오는 것만 남긴다"""
+        used, inverse = np.unique(codes, return_inverse=True)
+        offset = 1 if len(used) and used[0] < 0 else 0  # -1 (None) 은 category 가 아니다
+        codes = (inverse.astype(np.int32) - offset).reshape(codes.shape)
+        return cls(codes, [strings[i] for i in used[offset:]])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def code_of(self, value):
+        """value 의 code. None 은 -1, 없는 값은 -2 (어떤 row 와도 같지 않다)"""
+        if value is None:
+            return -1
+        if self._lookup is None:
+            self._lookup = {v: i for i, v in enumerate(self.categories)}
+        return self._lookup.get(value, -2)
+
+    def isin(self, values):
+        return np.isin(self.codes, [self.code_of(v) for v in values])
+
+    def decode(self, index = None):
+        codes = self.codes if index is None else self.codes[index]
+        cats = self.categories
+        return [None if c < 0 else cats[c] for c in codes.tolist()]
+
+
+class ColumnStore:
+    def __init__(self, table_name, columns, rows):
+        self.table_name = table_name
+        self.columns = columns  # name → Categorical | ndarray
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    # -------- Build
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """utils/snapshot.py 의 파일을 column 그대로 읽는다 (row dict 를 만들지 않는다)"""
+        require_numpy()
+        header, strings, blocks = load_blocks(path)
+        order = "<" if header["byteorder"] == "little" else ">"
+        columns = {}
+        for name, (kind, raw, nulls) in blocks.items():
+            if kind == "str":
+                columns[name] = Categorical.from_codes(np.frombuffer(raw, dtype=order + "i4"), strings)
+            elif kind in ("float", "int"):
+                a = np.frombuffer(raw, dtype=order + ("f8" if kind == "float" else "i8")).astype(np.float64)
+                if nulls:
+                    a[nulls] = np.nan
+                columns[name] = a
+            else:
+                columns[name] = cls._column(json.loads(raw.decode("utf-8")))
+        return cls(header["table"], columns, header["rows"])
+
+    @classmethod
+    def from_rows(cls, table_name, rows):
+        """row(dict) 의 iterable 또는 ColumnTable 에서"""
+        require_numpy()
+        if hasattr(rows, "column"):  # ColumnTable (utils/snapshot.py)
+            return cls(table_name, {n: cls._column(rows.column(n)) for n in rows.names}, len(rows))
+        rows = list(rows)
+        names = list(rows[0]) if rows else []
+        return cls(table_name, {n: cls._column([r.get(n) for r in rows]) for n in names}, len(rows))
+
+    @classmethod
+    def from_path(cls, table_name, path):
+        """export 파일 (snapshot 또는 json)"""
+        if is_snapshot(path):
+            return cls.from_snapshot(path)
+        return cls.from_rows(table_name, load_table(path))
+
+    @staticmethod
+    def _column(values):
+        kinds = {type(v) for v in values if v is not None}
+        if kinds and kinds <= {int, float}:
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        if kinds <= {str}:
+            return Categorical.from_values(values)
+        a = np.empty(len(values), dtype=object)
+        a[:] = values
+        return a
+
+    # -------- Columns and masks
+
+    def column(self, name):
+        return self.columns[name]
+
+    def between(self, name, lo, hi):
+        """lo <= value <= hi (SQL BETWEEN). NaN 은 False"""
+        a = self.columns[name]
+        return (a >= lo) & (a <= hi)
+
+    def isin(self, name, *values):
+        c = self.columns[name]
+        if isinstance(c, Categorical):
+            return c.isin(values)
+        return np.isin(c, values)
+
+    def values(self, name, mask = None):
+        """column 의 값 list (mask: bool array 또는 index array)"""
+        c = self.columns[name]
+        if isinstance(c, Categorical):
+            return c.decode(mask)
+        a = c if mask is None else c[mask]
+        if a.dtype == np.float64:
+            return [None if v != v else v for v in a.tolist()]  # NaN → None
+        return a.tolist()
+
+    def take(self, mask = None, names = None):
+        """mask 에 해당하는 row(dict) list"""
+        names = self.names if names is None else list(names)
+        if mask is not None and getattr(mask, "dtype", None) == bool:
+            mask = np.flatnonzero(mask)
+        cols = [self.values(n, mask) for n in names]
+        return [dict(zip(names, values)) for values in zip(*cols)]
+
+    # -------- Group-by
+
+    def group_by(self, key, value = None, agg = "count", mask = None):
+        """
+        key(Categorical column) 별 agg(value). {key 값: 결과}, key 가 None 인 row 는 None 으로 모은다.
+        sum/mean/min/max 는 value 의 NaN 을 뺀다. 한 row 도 없는 group 은 넣지 않는다
+        """
+        if agg not in AGGREGATES:
+            raise ValueError("Unknown aggregate: %s (one of %s)" % (agg, ", ".join(AGGREGATES)))
+        cat = self.columns[key]
+        if not isinstance(cat, Categorical):
+            cat = Categorical.from_values(self.values(key))
+        codes = cat.codes + 1  # 0 = None
+        n = len(cat.categories) + 1
+        vals = None
+        if value is not None:
+            vals = self.columns[value]
+        if mask is not None:
+            codes = codes[mask]
+            vals = vals[mask] if vals is not None else None
+
+        if agg == "count" or vals is None:
+            counts = np.bincount(codes, minlength=n)
+            result = counts
+        else:
+            ok = ~np.isnan(vals)
+            codes, vals = codes[ok], vals[ok]
+            counts = np.bincount(codes, minlength=n)
+            if agg == "sum":
+                result = np.bincount(codes, weights=vals, minlength=n)
+            elif agg == "mean":
+                result = np.bincount(codes, weights=vals, minlength=n) / np.maximum(counts, 1)
+            else:
+                result = np.full(n, np.inf if agg == "min" else -np.inf)
+                (np.minimum if agg == "min" else np.maximum).at(result, codes, vals)
+
+        keys = [None] + cat.categories
+        return {keys[i]: result[i].item() for i in np.flatnonzero(counts).tolist()}
+
+    def value_counts(self, name, mask = None):
+        """{값: 개수}, 많은 것부터"""
+        counts = self.group_by(name, mask=mask)
+        return dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+
+    def nbytes(self):
+        total = 0
+        for c in self.columns.values():
+            if isinstance(c, Categorical):
+                total += c.codes.nbytes + sum(sys.getsizeof(s) for s in c.categories)
+            else:
+                total += c.nbytes
+        return total
+
+
+# -------- M_DATA / M_HISTORY questions
+
+def codes_in_band(data, lo, hi, mask = None):
+    """M_DATA 에서 lo <= DATA1 (주파수) <= hi 인 CODE list"""
+    band = data.between("DATA1", lo, hi)
+    if mask is not None:
+        band &= mask
+    return data.values("CODE", band)
+
+def program_durations(history):
+    """M_HISTORY 의 DESP(program) 별 DATA2(시간) 합"""
+    return history.group_by("DESP", "DATA2", "sum")
+
+def grp_distribution(data):
+    """M_DATA 의 GRP 별 row 수, 많은 것부터"""
+    return data.value_counts("GRP")
@@ -8,9 +8,10 @@ class __Config(metaclass = SingletonMeta):
         self.exe_file = "medical.exe"
         self.mdb_file = "MEDICAL.mdb"
         self.password = "I1D2E3A4"
-        
+        self.backend = "dao"  # storage backend: "dao" | "sqlite" (utils/backend.py)
 
         self.data_table_file = "data_table.json" # export of M_DATA table
+        self.data_snapshot_file = "data_table.snap" # column snapshot of M_DATA table (utils/snapshot.py)
         self.program_table_file = "program_table.json" # the export of M_HISTORY table 
 
         self.program_file = "program.json"       # the final level result of auto_analyzer
@@ -90,23 +91,43 @@ class __Config(metaclass = SingletonMeta):
             "top_dir": os.getcwd(),  # os.path.dirname(os.getcwd())
         }
         # Export of M_DATA table
-        self.run_drv["data_table_path"] = os.path.join(self.run_drv["top_dir"], r"db\data_table.json") 
-        self.run_drv["ddl_path"]        = os.path.join(self.run_drv["top_dir"], r"db\ddl.json") 
+        self.run_drv["data_table_path"] = os.path.join(self.run_drv["top_dir"], "db", "data_table.json") 
+        self.run_drv["data_snapshot_path"] = os.path.join(self.run_drv["top_dir"], "db", "data_table.snap") 
+        self.run_drv["ddl_path"]        = os.path.join(self.run_drv["top_dir"], "db", "ddl.json") 
+        # Dump of all tables in ddl.json: medical.json_<TABLE>.json and count.json (utils/dump.py)
+        self.run_drv["dump_dir"]        = os.path.join(self.run_drv["top_dir"], "output") 
+        # Incremental exports of tables: manifest, base and delta files (utils/delta.py)
+        self.run_drv["delta_dir"]       = os.path.join(self.run_drv["top_dir"], "db", "delta") 
+        # Automatic compaction: baseline bytes/row, last check and compaction (utils/maintenance.py)
+        self.run_drv["maintenance_path"] = os.path.join(self.run_drv["top_dir"], "db", "maintenance.json") 
         # Storage for json files
-        self.run_drv["json_dir"]     = os.path.join(self.run_drv["top_dir"], r"temp\json")
-        self.run_drv["program_path"] = os.path.join(self.run_drv["json_dir"], r"program.json")
+        self.run_drv["json_dir"]     = os.path.join(self.run_drv["top_dir"], "temp", "json")
+        self.run_drv["program_path"] = os.path.join(self.run_drv["json_dir"], "program.json")
+        self.run_drv["program_report_path"] = os.path.join(self.run_drv["json_dir"], "program_report.json")
+
+        # The external drive is probed (26 drive letters) on the first access of ext_drv
+        self._ext_drv = None
+
+    @property
+    def ext_drv(self): 
+        if self._ext_drv is None: 
+            self._ext_drv = self._make_ext_drv(choose_external_drive_name())
+        return self._ext_drv
 
-        self.ext_drv = {  # need to be reconfigured
+    @staticmethod
+    def _make_ext_drv(drive_name): 
+        ext_drv = {  # need to be reconfigured
             # Python doc says: 
             #   - Raw string literal means backslashes do not introduce escape sequences.
             #     They are included in the string exactly as typed, except that
             #     a raw string cannot end with a single backslash.
-            "name": choose_external_drive_name() + ":\\", # ex) "E:\\" for "E:\"
+            "name": drive_name[0] + ":\\", # ex) "E:\\" for "E:\"
         }
-        self.ext_drv["top_dir"]    = self.ext_drv["name"] + r"medical" 
-        self.ext_drv["client_dir"] = os.path.join(self.ext_drv["top_dir"], r"client") 
-        self.ext_drv["mdb_dir"]    = os.path.join(self.ext_drv["top_dir"], r"temp\mdb")
-        self.ext_drv["mdb_path"]   = os.path.join(self.ext_drv["top_dir"], r"temp\mdb\MEDICAL.mdb")
+        ext_drv["top_dir"]    = ext_drv["name"] + r"medical" 
+        ext_drv["client_dir"] = os.path.join(ext_drv["top_dir"], r"client") 
+        ext_drv["mdb_dir"]    = os.path.join(ext_drv["top_dir"], r"temp\mdb")
+        ext_drv["mdb_path"]   = os.path.join(ext_drv["top_dir"], r"temp\mdb\MEDICAL.mdb")
+        return ext_drv
     
     def configure(self, sys_drv_top_dir = None, ext_drv_name = None): 
         # 1. Configure the internal directory, if not provided under self.sysdrv["top_dir"]
@@ -127,20 +148,20 @@ class __Config(metaclass = SingletonMeta):
                 logger.error("ERROR: No medical program is installed under %s", sys_drv_top_dir)
                 return None 
         
-        # 2. Reconfigure the external drive directory
+        # 2. Reconfigure the external drive directory: a given drive is not probed
         if ext_drv_name is not None: 
-            if self.ext_drv["name"][0].upper() != ext_drv_name[0].upper(): 
-                for i in self.ext_drv: 
-                    self.ext_drv[i][0] = ext_drv_name[0]
+            if self._ext_drv is None or self._ext_drv["name"][0].upper() != ext_drv_name[0].upper(): 
+                self._ext_drv = self._make_ext_drv(ext_drv_name)
 
         # self.clean_temp()
         logger.info("------------------------------------------------")
         logger.info("config: ")
         logger.info("    sys_drv: %s", self.sys_drv["top_dir"])
         logger.info("    run_drv: %s", self.run_drv["top_dir"])
-        logger.info("    ext_drv: %s", self.ext_drv["top_dir"])
+        ext_drv = self._ext_drv or {"top_dir": "(probed on first use)", "mdb_path": None}
+        logger.info("    ext_drv: %s", ext_drv["top_dir"])
         logger.info("            sys mdb_path: %s", self.sys_drv["mdb_path"])
-        logger.info("            ext mdb_path: %s", self.ext_drv["mdb_path"])
+        logger.info("            ext mdb_path: %s", ext_drv["mdb_path"])
         logger.info("------------------------------------------------")
         return self
 
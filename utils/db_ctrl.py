@@ -1,48 +1,153 @@
 # -*- coding: utf-8 -*-
 # - DAO 엔진 감지 + 테이블 목록 + 필드 타입
-import os, shutil, time, datetime
-import pythoncom
+import os, glob, shutil, time, datetime
+from contextlib import contextmanager
 from decimal import Decimal
-from win32com.client import Dispatch
-from functools import lru_cache
 
 from lib.singleton import SingletonMeta
 from lib.log import logger
+from lib import perf
+from utils.backend import get_backend, DaoBackend, dbOpenTable, dbFailOnError
+from utils.db_pool import DbPool
+from utils.json import save_json
+
+# 값 변환기: None 은 그대로 둔다
+def _to_decimal(v):
+    return None if v is None else Decimal(str(v))
+
+def _to_datetime(v):
+    if v is None:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(v)
+    except Exception:
+        return v
 
-class DbCtrl: 
-    def __init__(self, mdb_path, password = ""):
-        self.engine, self.engine_name = self.detect_engine()
-        # 강제로 workgroup 초기화 (보안파일 detach)
-        self.engine.SystemDB = ""
+def _to_float(v):
+    return None if v is None else float(v)
+
+def _to_isoformat(v):
+    return None if v is None else v.isoformat()
+
+
+class PlanCache:
+    """
+    insert 할 row 들의 restore plan. JSON 의 row 는 보통 field 순서가 모두 같으므로
+    지난 row 와 순서가 같으면 그 plan 을 다시 쓴다. keys: 지금 plan 의 field 순서
+    """
+    def __init__(self, table_ddl):
+        self.table_ddl = table_ddl
+        self.keys = None
+        self.plan = None
+        self._plans = {}
+
+    def get(self, row):
+        keys = tuple(row)
+        if keys != self.keys:
+            plan = self._plans.get(keys)
+            if plan is None:
+                plan = self._plans[keys] = DbCtrl.restore_plan(self.table_ddl, keys)
+            self.keys, self.plan = keys, plan
+        return self.plan
+
+
+# DAO field type → Jet SQL PARAMETERS 의 type
+PARAMETER_TYPES = {1: "BIT", 2: "BYTE", 3: "SHORT", 4: "LONG", 5: "CURRENCY", 6: "SINGLE",
+                   7: "DOUBLE", 8: "DATETIME", 10: "TEXT", 12: "MEMO"}
+
+class PreparedInsert:
+    """
+    Parameter 가 있는 QueryDef 로 하는 INSERT. table 의 field 순서마다 한 번 만들고 (CreateQueryDef)
+    row 마다 Parameters 의 값만 바꿔서 다시 Execute 한다.
+    Jet 은 SQL 을 한 번만 해석한다. 값은 SQL 문자열이 되지 않으므로 escape 도 없고,
+    HTIME 같은 날짜/시간도 시각까지 그대로 들어간다.
+
+      with PreparedInsert(db, table_name, table_ddl) as ins:
+          for row in rows:
+              ins.execute(row)
+    """
+    def __init__(self, db, table_name, table_ddl):
+        self.db = db
+        self.table_name = table_name
+        self.table_ddl = table_ddl
+        self.plans = PlanCache(table_ddl)
+        self.prepared = 0   # 만든 QueryDef 수
+        self._queries = {}  # field 순서 → (QueryDef, [Parameter])
+        self._keys, self._query = None, None
+
+    @staticmethod
+    def sql(table_name, table_ddl, fields):
+        params = ", ".join("[p%d] %s" % (i, PARAMETER_TYPES.get(table_ddl[f], "TEXT"))
+                                for i, f in enumerate(fields))
+        return "PARAMETERS %s; INSERT INTO [%s] (%s) VALUES (%s)" % (
+            params, table_name, ", ".join("[%s]" % f for f in fields),
+            ", ".join("[p%d]" % i for i in range(len(fields))))
+
+    def _prepare(self, keys):
+        sql = self.sql(self.table_name, self.table_ddl, keys)
+        logger.debug("--- QueryDef: %s", sql)
+        qd = self.db.CreateQueryDef("", sql)
+        query = self._queries[keys] = (qd, [qd.Parameters("p%d" % i) for i in range(len(keys))])
+        perf.com(1 + len(keys))
+        self.prepared += 1
+        return query
+
+    def execute(self, row):
+        plan = self.plans.get(row)
+        if self.plans.keys is not self._keys:
+            self._keys = self.plans.keys
+            self._query = self._queries.get(self._keys) or self._prepare(self._keys)
+        qd, params = self._query
+        for p, c, v in zip(params, plan, row.values()):
+            p.Value = v if c is None else c(v)
+        qd.Execute(dbFailOnError)
+        perf.com(1 + len(params))
+
+    def close(self):
+        for qd, _ in self._queries.values():
+            try:
+                qd.Close()
+            except Exception:
+                pass
+        self._queries.clear()
+        self._keys, self._query = None, None
+
+    def __enter__(self):
+        return self
 
-        ws = self.engine.CreateWorkspace("", "admin", "")
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class DbCtrl: 
+    def __init__(self, mdb_path, password = "", backend = None, pooled = True):
+        # backend: "dao"(default), "sqlite" 또는 backend 객체. utils/backend.py 참고
+        self.backend = get_backend(backend)
         self.mdb_path = mdb_path
         self.password = password 
+        # pooled: open_db() 는 DbPool 의 열린 Database 를 재사용한다. db.Close() 는 pool 로 돌려준다
+        self.pool = DbPool() if pooled else None
+        self._version = None
 
-        db = self.open_db()
-        self.version = DbCtrl.detect_version(db)
-        db.Close()
+    @property
+    def version(self):
+        if self._version is None: 
+            with self.connection() as db: 
+                self._version = DbCtrl.detect_version(db)
+        return self._version
 
-    @staticmethod
-    def detect_engine(): #self): # DAO 엔진 자동 감지 (WinXP~Win10 호환)
-        engine, engine_name = None, None
-        candidates = [
-            "DAO.DBEngine.35",   # Jet 3.5 (Win9x/XP)
-            "DAO.DBEngine.36",   # Jet 3.6 (WinXP)
-            "DAO.DBEngine.120",  # Jet 4.0 (Win7/Win10)
-            "DAO.DBEngine"       # fallback
-        ]
-        for v in candidates:
-            try:
-                engine_name = v
-                engine = Dispatch(v)
-            except:
-                continue
-        if engine == None: 
-            raise RuntimeError("No usable DAO engine found.")
+    @property
+    def engine(self):
+        return self.backend.engine
 
-        logger.info("DAO Engine: %s", engine_name)
-        return engine, engine_name
+    @property
+    def engine_name(self):
+        return self.backend.engine_name
+
+    @staticmethod
+    def detect_engine(): # DAO 엔진 자동 감지 (WinXP~Win10 호환)
+        return DaoBackend.detect_engine()
     
     @staticmethod
     def detect_version(db):
@@ -65,32 +170,81 @@ class DbCtrl:
         logger.info("version={}".format(db.version))
         return db.version
 
+    @perf.timed("DbCtrl.open_db")
     def open_db(self):
         logger.info("DB Opened: %s", self.mdb_path)
         # print(os.access(self.mdb_path, os.W_OK)) True. No prob
-        connect = "" if self.password is None else ";PWD={}".format(self.password)
-        # Exclusive: False, Read-Only: False
-        return self.engine.OpenDatabase(self.mdb_path, False, False, connect)
+        if self.pool is not None: 
+            return self.pool.acquire(self.backend, self.mdb_path, self.password)
+        perf.com()
+        return self.backend.open_db(self.mdb_path, self.password)
 
     def close_db(self, db):
         logger.info("DB Closeded: %s", self.mdb_path)
         db.Close() 
 
-    def compact_db(self, db_path, password=None):
+    @contextmanager
+    def connection(self): 
+        """with db_ctrl.connection() as db: ..."""
+        db = self.open_db()
+        try:
+            yield db
+        finally:
+            db.Close()
+
+    @contextmanager
+    def session(self):
+        """
+        with db_ctrl.session(): 안에서 이 thread 가 연 Database 를 재사용하고, 나갈 때 닫는다 (DbPool.session).
+        DAO 는 session 밖에서는 connection() 마다 열고 닫는다
+        """
+        if self.pool is None:
+            yield self
+        else:
+            with self.pool.session():
+                yield self
+
+    # Transaction (DAO: Workspace 단위, SQLite: 연결 단위)
+    def begin_trans(self, db):
+        self.backend.begin_trans(db)
+
+    def commit_trans(self, db):
+        self.backend.commit_trans(db)
+
+    def rollback(self, db):
+        self.backend.rollback(db)
+
+    @perf.timed("DbCtrl.compact_db")
+    def compact_db(self, db_path = None, password = None, keep_backups = None):
         """
-        :param db_path: 원본 MDB 경로
-        :param compact_path: compact 결과 저장할 파일 (None이면 자동 생성)
-        :param password: DB 비밀번호 (없으면 None)
+        :param db_path: 원본 MDB 경로 (None 이면 self.mdb_path)
+        :param password: DB 비밀번호 (None 이면 self.mdb_path 의 비밀번호)
+        :param keep_backups: 남길 .bak_* 파일 수 (None 이면 모두 남긴다)
         :return: True/False
         """
         if db_path is None: 
-            dp_path = self.mdb_path
+            db_path = self.mdb_path
+        if password is None and os.path.abspath(db_path) == os.path.abspath(self.mdb_path): 
             password = self.password
 
         if not os.path.exists(db_path):
             logger.error("ERROR: Source DB does not exist: %s", db_path)
             return False
 
+        # Compact 는 파일을 독점해야 한다: pool 에 열려 있는 것을 닫고, 끝날 때까지 열지 않는다
+        if self.pool is not None: 
+            with self.pool.exclusive(db_path) as closed: 
+                if not closed: 
+                    logger.error("ERROR: %s is still open: compact is skipped", db_path)
+                    return False
+                done = self._compact_db(db_path, password)
+        else: 
+            done = self._compact_db(db_path, password)
+        if done and keep_backups is not None: 
+            self.rotate_backups(db_path, keep_backups)
+        return done
+
+    def _compact_db(self, db_path, password):
         # Compact 후 생성될 파일
         base, ext = os.path.splitext(db_path)
         compact_path = base + "_compact" + ext
@@ -103,22 +257,11 @@ class DbCtrl:
                 logger.error("ERROR: Could not remove old compact file: %s", compact_path)
                 return False
 
-        # COM 초기화 (XP 필수)
-        pythoncom.CoInitialize()
-        self.engine, self.engine_name = self.detect_engine()
-        src_conn = ";PWD=" + password if password else ""
-        
-        logger.debug("------ %s", password)
         # 압축 실행
         logger.info("Compacting %s...", db_path)
         try:
-            self.engine.CompactDatabase(
-                db_path,
-                compact_path,
-                None,  # default locale
-                0,     # options
-                src_conn
-            )
+            perf.com()
+            self.backend.compact_db(db_path, compact_path, password)
         except Exception as e:
             logger.exception("ERROR: %s: Compact error:", e)
             return False
@@ -126,6 +269,11 @@ class DbCtrl:
         # Compact 성공, 원본 교체
         try:
             backup_path = db_path + ".bak_" + time.strftime("%Y%m%d_%H%M%S")
+            n = 0
+            while os.path.exists(backup_path if n == 0 else "%s_%d" % (backup_path, n)): 
+                n += 1  # 같은 초에 두 번 compact
+            if n: 
+                backup_path = "%s_%d" % (backup_path, n)
             shutil.move(db_path, backup_path)
             shutil.move(compact_path, db_path)
         except Exception as e:
@@ -137,10 +285,28 @@ class DbCtrl:
 
         return True
 
-    # 값 변환 (MDB → JSON)
+    # compact_db 가 남긴 <db_path>.bak_YYYYmmdd_HHMMSS 중 최근 keep 개만 남긴다
+    @staticmethod
+    def backups(db_path):
+        """오래된 것부터"""
+        return sorted(glob.glob(glob.escape(db_path) + ".bak_*"))
+
     @staticmethod
-    @lru_cache(maxsize=50000) 
-    def normalize_value(v): # self, v):
+    def rotate_backups(db_path, keep):
+        backups = DbCtrl.backups(db_path)
+        removed = backups[:max(0, len(backups) - keep)]
+        for path in removed: 
+            try:
+                os.remove(path)
+            except Exception as e:
+                logger.error("ERROR: %s: Could not remove old backup: %s", e, path)
+            else: 
+                logger.info("Old backup removed: %s", path)
+        return removed
+
+    # 값 변환 (MDB → JSON). field type 을 모를 때 (SELECT 결과 등) 쓴다
+    @staticmethod
+    def normalize_value(v):
         """DAO 값 → JSON-friendly 값"""
         if isinstance(v, Decimal):
             return float(v)
@@ -150,60 +316,246 @@ class DbCtrl:
             return v.isoformat()
         return v
 
-    # 값 역변환 (JSON → MDB)
+    # 값 역변환 (JSON → MDB). 값 하나만 바꿀 때 쓴다. row 를 바꿀 때는 restore_plan()
     @staticmethod
-    @lru_cache(maxsize=50000) 
-    def restore_value(v, field_type): # self, v, field_type):
+    def restore_value(v, field_type):
         """JSON 값 → Access DAO Field 값으로 역변환"""
-        # None 그대로
-        if v is None:
+        conv = DbCtrl.restore_converter(field_type)
+        return v if conv is None else conv(v)
+
+    # 필드 타입별 값 역변환기 (JSON → MDB). None 이면 그대로 쓴다
+    #
+    # DAO Field Type 참고:
+    # https://learn.microsoft.com/en-us/office/client-developer/access/desktop-database-reference/fieldtype-enumeration-dao
+    #
+    # 주요 타입:
+    # 1 YESNO
+    # 3 INTEGER
+    # 4 LONG
+    # 5 CURRENCY
+    # 6 SINGLE
+    # 7 DOUBLE
+    # 8 DATETIME
+    # 10 TEXT
+    # 12 MEMO
+    @staticmethod
+    def restore_converter(field_type):
+        if field_type in (3, 4, 5, 6, 7):  # 숫자
+            return _to_decimal
+        if field_type == 8:                # 날짜/시간
+            return _to_datetime
+        return None                        # TEXT/MEMO/기타
+
+    # 필드 타입별 값 변환기 (MDB → JSON). None 이면 그대로 쓴다
+    @staticmethod
+    def read_converter(field_type):
+        if field_type in (1, 2, 3, 4, 6, 7, 10, 12): # YESNO, BYTE, INTEGER, LONG, SINGLE, DOUBLE, TEXT, MEMO
             return None
+        if field_type in (5, 20):                    # CURRENCY, DECIMAL → Decimal
+            return _to_float
+        if field_type == 8:                          # DATETIME
+            return _to_isoformat
+        return DbCtrl.normalize_value
+
+    # 변환 plan: fields 순서의 converter tuple. table 의 ddl({field: type})로 한 번 만들고
+    # row 의 값에 위치로 적용한다: [v if c is None else c(v) for c, v in zip(plan, values)]
+    # ddl 에 없는 field 는 type 을 모르므로 값을 보고 바꾼다 (normalize_value)
+    @staticmethod
+    def restore_plan(table_ddl, fields):
+        return tuple(DbCtrl.restore_converter(table_ddl[f]) for f in fields)
 
-        # DAO Field Type 참고:
-        # https://learn.microsoft.com/en-us/office/client-developer/access/desktop-database-reference/fieldtype-enumeration-dao
-        #
-        # 주요 타입:
-        # 1 YESNO
-        # 3 INTEGER
-        # 4 LONG
-        # 5 CURRENCY
-        # 6 SINGLE
-        # 7 DOUBLE
-        # 8 DATETIME
-        # 10 TEXT
-        # 12 MEMO
-
-        # 숫자
-        if field_type in (3, 4, 5, 6, 7):
-            return Decimal(str(v))
-
-        # 날짜/시간
-        if field_type == 8:
-            try:
-                return datetime.datetime.fromisoformat(v)
-            except Exception:
-                return v
+    @staticmethod
+    def read_plan(table_ddl, fields):
+        return tuple(DbCtrl.read_converter(table_ddl.get(f)) for f in fields)
 
-        # TEXT/MEMO/기타
-        return v
+    @staticmethod
+    def apply_plan(plan, values):
+        return [v if c is None else c(v) for c, v in zip(plan, values)]
+
+    # GetRows 로 chunk_size 개씩 읽어서 column 단위로 변환한 row(dict) list 를 넘긴다
+    @staticmethod
+    def iter_recordset_chunks(rs, chunk_size = 1000):
+        fields = [f for f in rs.Fields]
+        names = [f.Name for f in fields]
+        converters = [DbCtrl.read_converter(f.Type) for f in fields]
+
+        perf.com(1 + 2 * len(fields))
+        if rs.EOF:
+            return
+        rs.MoveFirst()
+        while not rs.EOF:
+            columns = rs.GetRows(chunk_size)  # [field][row]
+            perf.com(2)  # GetRows, EOF
+            if not columns:
+                break
+            columns = [col if conv is None else [conv(v) for v in col] 
+                            for conv, col in zip(converters, columns)]
+            yield [dict(zip(names, values)) for values in zip(*columns)]
+
+    # Stream a table: chunks=False 이면 row(dict) 를, True 이면 row list 를 하나씩 넘긴다.
+    # 한 번에 chunk_size 개 row 만 메모리에 있다.
+    def iter_table(self, db, table_name, chunk_size = 1000, chunks = False):
+        rs = db.OpenRecordset(table_name)
+        perf.com(2)  # OpenRecordset, Close
+        try:
+            for chunk in self.iter_recordset_chunks(rs, chunk_size):
+                if chunks: 
+                    yield chunk
+                else: 
+                    yield from chunk
+        finally:
+            rs.Close()
 
     # Read a whole table
-    def read_table(self, db, table_name):
+    @perf.timed("DbCtrl.read_table", rows=len)
+    def read_table(self, db, table_name, fast = True, chunk_size = 1000):
+        if fast: # GetRows + column 단위 변환
+            return list(self.iter_table(db, table_name, chunk_size))
+
         rs = db.OpenRecordset(table_name)
 
         rows = []
         fields = [f.Name for f in rs.Fields]
+        plan = self.read_plan({f.Name: f.Type for f in rs.Fields}, fields)
 
         if not rs.EOF:
             rs.MoveFirst()
             while not rs.EOF:
-                row = {f: self.normalize_value(rs.Fields(f).Value) for f in fields}
-                rows.append(row)
+                values = [rs.Fields(f).Value for f in fields]
+                rows.append(dict(zip(fields, self.apply_plan(plan, values))))
                 rs.MoveNext()
 
         rs.Close()
+        perf.com(3 + 2 * len(fields) + len(rows) * (len(fields) + 2))
         return rows
 
+    # Build "INSERT INTO ... VALUES (...)" for a row
+    @staticmethod
+    def insert_sql(table_name, table_ddl, row, plan = None):
+        """plan: restore_plan(table_ddl, row 의 field 순서). 없으면 만든다"""
+        cols = list(row)
+        if plan is None:
+            plan = DbCtrl.restore_plan(table_ddl, cols)
+        vals = DbCtrl.apply_plan(plan, row.values())
+
+        col_list = ", ".join(cols)
+
+        # Build VALUES part
+        val_list = []
+        for v in vals:
+            if v is None:
+                val_list.append("NULL")
+            elif isinstance(v, (int, float)):
+                val_list.append(str(v))
+            elif isinstance(v, datetime.datetime):
+                val_list.append(v.strftime("#%Y-%m-%d %H:%M:%S#"))
+            elif isinstance(v, datetime.date):
+                val_list.append(v.strftime("#%Y-%m-%d 00:00:00#"))
+            else: 
+                s = str(v).replace("'", "''")
+                val_list.append("'" + s + "'")
+
+        val_expr = ", ".join(val_list)
+
+        return "INSERT INTO %s (%s) VALUES (%s)" % (
+            table_name, col_list, val_expr
+        )
+
+    # Insert a dict data into a table in batches of AddNew/Update
+    @staticmethod
+    @perf.timed("DbCtrl.bulk_insert", rows=lambda report: report["inserted"])
+    def bulk_insert(db, table_name, table_ddl, json_data, batch_size = 500, backend = None):
+        """
+        Insert rows through one updatable recordset, batch_size rows per transaction.
+        If BeginTrans() fails (some Jet/DAO modes), falls back to per-row INSERT (PreparedInsert).
+        A failed row does not stop the others: it is reported in "failed".
+        :return: {"rows", "inserted", "batches", "failed": [(index, row, error)],
+                  "mode": "bulk"|"row", "elapsed", "rows_per_sec"}
+        """
+        backend = get_backend(backend)
+        start = time.perf_counter()
+        report = {"table": table_name, "rows": len(json_data), "inserted": 0, "batches": 0, 
+                  "failed": [], "mode": "bulk"}
+
+        # 1. Is a transaction available?
+        try:
+            backend.begin_trans(db)
+        except Exception as e:
+            logger.warning("BeginTrans failed (%s): fall back to per-row insert", e)
+            report["mode"] = "row"
+
+        if report["mode"] == "row":
+            with PreparedInsert(db, table_name, table_ddl) as ins:
+                for i, row in enumerate(json_data):
+                    try:
+                        ins.execute(row)
+                        report["inserted"] += 1
+                    except Exception as e:
+                        report["failed"].append((i, row, str(e)))
+        else: 
+            # 2. AddNew/Update on one recordset. Field objects are cached by name
+            rs = db.OpenRecordset(table_name, dbOpenTable)
+            plans = PlanCache(table_ddl)
+            fields = {}
+            keys, targets = None, None  # 지난 row 의 field 순서와 그 Field 객체들
+            batch = []   # (index, row) in the current transaction
+            try:
+                for i, row in enumerate(json_data):
+                    if len(batch) >= batch_size: 
+                        DbCtrl._commit_batch(backend, db, batch, report)
+                        batch = []
+                        backend.begin_trans(db)
+
+                    batch.append((i, row))
+                    try:
+                        rs.AddNew()
+                        plan = plans.get(row)
+                        if plans.keys is not keys:
+                            keys = plans.keys
+                            for k in keys:
+                                if k not in fields:
+                                    fields[k] = rs.Fields(k)
+                            targets = [fields[k] for k in keys]
+                        for f, c, v in zip(targets, plan, row.values()):
+                            f.Value = v if c is None else c(v)
+                        rs.Update()
+                        perf.com(2 + len(targets))
+                    except Exception as e:
+                        try:
+                            rs.CancelUpdate()
+                        except Exception:
+                            pass
+                        batch.pop()
+                        report["failed"].append((i, row, str(e)))
+                DbCtrl._commit_batch(backend, db, batch, report)
+            except Exception:
+                backend.rollback(db)
+                raise
+            finally:
+                rs.Close()
+
+        # 3. Report
+        report["elapsed"] = time.perf_counter() - start
+        report["rows_per_sec"] = report["inserted"] / report["elapsed"] if report["elapsed"] else 0.0
+        logger.info("%s: %s/%s rows inserted (%s mode, %s batches, %.0f rows/s), %s failed", 
+            table_name, report["inserted"], report["rows"], report["mode"], report["batches"], 
+            report["rows_per_sec"], len(report["failed"]))
+        return report
+
+    @staticmethod
+    def _commit_batch(backend, db, batch, report): 
+        perf.com(2)  # CommitTrans, BeginTrans
+        try:
+            backend.commit_trans(db)
+        except Exception as e:
+            logger.error("ERROR: %s: batch of %s rows is rolled back", e, len(batch))
+            backend.rollback(db)
+            report["failed"].extend((i, row, str(e)) for i, row in batch)
+        else: 
+            if batch: 
+                report["inserted"] += len(batch)
+                report["batches"] += 1
+
 
 
 
@@ -214,21 +566,22 @@ class DbCtrl:
         """
         MDB 전체 테이블 구조(DDL에 대응하는 메타데이터)를 하나의 JSON으로 저장.
         """
-        tables = self.list_tables()
-        logger.info("Tables:", tables)
+        tables = self.list_tables(db)
+        logger.info("Tables: %s", tables)
 
         ddl = {}
 
         for tbl in tables:
             tdef = db.TableDefs(tbl)
-            ddl[tbl] = extract_table_ddl(tdef)
+            ddl[tbl] = self.get_table_ddl(tdef)
 
         if json_path: 
             save_json(ddl, json_path)
-            logger.info("DDL of tables saved:", json_path)
+            logger.info("DDL of tables saved: %s", json_path)
         return ddl
 
-    def list_tables(self, db):
+    @staticmethod
+    def list_tables(db):
         """Access 시스템 테이블 제외한 사용자 테이블 목록"""
         tables = []
         for t in db.TableDefs:
@@ -292,6 +645,7 @@ class DbCtrl:
 
 
 def diagnose_dao(path, password = "I1D2E3A4"):
+    import win32com.client
     print("=== DAO Diagnostic ===")
 
     dao = win32com.client.Dispatch("DAO.DBEngine.36")
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+# - 열린 Database 객체를 (mdb_path, password) 별로 재사용하는 pool
+#
+#   pool = DbPool()
+#   with pool.connection(backend, mdb_path, password) as db:
+#       ...
+#   db = pool.acquire(backend, mdb_path, password)  # db.Close() 는 pool 로 돌려준다
+#
+# - engine(DAO DBEngine)과 Workspaces(0) 는 backend 가 한 번 만들어 계속 쓴다 (utils/backend.py)
+# - 같은 key 를 다시 열면 열려 있는 Database 를 준다. 쓰는 곳이 여럿이어도 하나를 같이 쓴다
+# - 다시 줄 때 health check: backend.is_alive(db), 그리고 파일이 바뀌지 않았는지 (지우고 다시 만든 MDB)
+# - idle_timeout 초 동안 아무도 안 쓴 Database 는 다음 acquire 나 close_idle() 에서 닫는다
+# - COM 객체는 만든 thread 에서만 쓸 수 있으므로 thread 마다 따로 연다. 닫는 것도 그 thread 에서 한다:
+#   다른 thread 가 닫으려는 Database 는 doomed 로 표시해 두고, 연 thread 가 다음 acquire/release 에서 닫는다
+#   (backend.thread_affine 이 False 인 SQLite 나, 연 thread 가 이미 끝났으면 바로 닫는다)
+# - 그래서 thread_affine (DAO) 이면 Database 는 with pool.session(): 안에서만 열어 둔다. session 밖에서는
+#   users 가 0 이 되면 바로 닫고, session 을 나갈 때 그 thread 의 쓰지 않는 Database 를 닫는다.
+#   일을 마치고 놀고 있는 thread 가 MDB 를 열어 둔 채로 있지 않다 (Maintenance 의 compact 가 기다리지 않는다)
+# - compact 처럼 파일을 독점해야 할 때는 with pool.exclusive(mdb_path) as ok: 안에서 한다.
+#   그동안 acquire 는 기다리고, 쓰는 중인 Database 가 돌아오기를 기다렸다가 모두 닫는다
+import os, time, atexit, threading
+from contextlib import contextmanager
+
+from lib.singleton import SingletonMeta
+from lib.log import logger
+from lib import perf
+
+
+class PooledDatabase:
+    """
+    pool 의 Database 객체를 감싼다. Close() 만 pool 로 돌려주는 것으로 바뀌고,
+    나머지(Execute, OpenRecordset, Name, ...)는 그대로 넘긴다.
+    """
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._entry.db, name)
+
+    def Close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool.release(self._entry)
+
+
+class _Entry:
+    __slots__ = ("key", "backend", "db", "file_id", "users", "last_used", "doomed")
+
+    def __init__(self, key, backend, db, file_id):
+        self.key = key
+        self.backend = backend
+        self.db = db
+        self.file_id = file_id
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.doomed = False  # pool 에서 빠졌다. 연 thread 가 닫는다
+
+
+def _pool_path(path):
+    return path if path.startswith(":memory:") else os.path.abspath(path)
+
+def _live_threads():
+    return {t.ident for t in threading.enumerate()}
+
+def _file_id(path):
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None  # ":memory:..." 처럼 파일이 아닌 것
+    return (st.st_dev, st.st_ino)
+
+
+class DbPool(metaclass = SingletonMeta):
+    def __init__(self, idle_timeout = 300.0):
+        self.idle_timeout = idle_timeout
+        self._entries = {}  # (mdb_path, password, thread id) → _Entry
+        self._doomed = []   # pool 에서 뺐지만 아직 닫지 못한 _Entry (연 thread 가 닫는다)
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._exclusive = {}  # 독점 중인 mdb_path → [thread id, 깊이]
+        self._last_used = {}     # mdb_path → 마지막으로 쓰고 돌려준 시각 (monotonic)
+        self._local = threading.local()  # depth: 이 thread 의 session 깊이
+        self.counters = {"opens": 0, "reuses": 0, "health_failures": 0, "idle_closes": 0, "closes": 0}
+        atexit.register(self.close_all)
+
+    def acquire(self, backend, mdb_path, password = ""):
+        """열린 Database 를 주거나 새로 연다. 돌려줄 때는 db.Close()"""
+        self.close_idle()
+        key = (_pool_path(mdb_path), password, threading.get_ident())
+        with self._lock:
+            self._sweep()
+            while self._excluded(key[0]):
+                self._released.wait()
+                self._sweep()  # 기다리는 동안 doomed 가 된 이 thread 의 Database
+            entry = self._entries.get(key)
+            if entry is not None and not self._healthy(entry, mdb_path):
+                self.counters["health_failures"] += 1
+                logger.warning("Pooled DB %s failed the health check: reopen", mdb_path)
+                self._retire(entry)
+                entry = None
+            if entry is None:
+                perf.com()
+                entry = _Entry(key, backend, backend.open_db(mdb_path, password), _file_id(mdb_path))
+                self._entries[key] = entry
+                self.counters["opens"] += 1
+            else:
+                self.counters["reuses"] += 1
+            entry.users += 1
+            entry.last_used = time.monotonic()
+        return PooledDatabase(self, entry)
+
+    def release(self, entry):
+        with self._lock:
+            entry.users = max(0, entry.users - 1)
+            entry.last_used = self._last_used[entry.key[0]] = time.monotonic()
+            if entry.users == 0 and not entry.doomed and (self._excluded(entry.key[0]) or not self._keeps(entry)):
+                self._retire(entry)  # exclusive 가 기다리거나 session 밖이다: 연 thread 인 여기서 닫는다
+            self._sweep()
+            self._released.notify_all()
+
+    @contextmanager
+    def connection(self, backend, mdb_path, password = ""):
+        db = self.acquire(backend, mdb_path, password)
+        try:
+            yield db
+        finally:
+            db.Close()
+
+    @contextmanager
+    def session(self):
+        """
+        with pool.session(): 이 thread 가 안에서 돌려준 Database 를 열어 두고 재사용한다 (thread_affine 일 때).
+        나갈 때 (가장 바깥) 이 thread 의 쓰지 않는 Database 를 닫는다. 명령 하나, thread 하나의 일을 감싼다
+        """
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            yield self
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self.release_thread()
+
+    def release_thread(self):
+        """이 thread 가 연, 쓰지 않는 Database 를 모두 닫는다 (이 thread 가 한동안 DB 를 쓰지 않을 때)"""
+        me = threading.get_ident()
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.key[2] == me and entry.users == 0:
+                    self._retire(entry)
+                    self.counters["idle_closes"] += 1
+            self._sweep()
+
+    def _healthy(self, entry, mdb_path):
+        if entry.file_id != _file_id(mdb_path):
+            return False
+        return entry.backend.is_alive(entry.db)
+
+    # ---- 아래는 모두 self._lock 안에서
+    def _excluded(self, path):
+        """다른 thread 가 path 를 독점하고 있다"""
+        held = self._exclusive.get(path)
+        return held is not None and held[0] != threading.get_ident()
+
+    def _keeps(self, entry):
+        """돌려받은 entry 를 열어 둔다: 다른 thread 도 닫을 수 있거나, 연 thread 의 session 안이다"""
+        if not getattr(entry.backend, "thread_affine", True):
+            return True
+        return entry.key[2] == threading.get_ident() and getattr(self._local, "depth", 0) > 0
+
+    def _closable(self, entry, live = None):
+        """지금 이 thread 에서 닫아도 되나: 쓰는 곳이 없고, 연 thread 이거나 그 thread 가 끝났거나 COM 이 아니다"""
+        if entry.users:
+            return False
+        owner = entry.key[2]
+        if owner == threading.get_ident() or not getattr(entry.backend, "thread_affine", True):
+            return True
+        return owner not in (_live_threads() if live is None else live)
+
+    def _retire(self, entry):
+        """entry 를 pool 에서 뺀다. 지금 닫을 수 없으면 doomed: 연 thread 가 닫는다"""
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+        if self._closable(entry):
+            self._close(entry)
+        elif not entry.doomed:
+            entry.doomed = True
+            self._doomed.append(entry)
+            self._released.notify_all()  # acquire 에서 기다리는 연 thread 가 닫는다
+
+    def _sweep(self):
+        """doomed 중에서 이 thread 가 닫을 수 있는 것을 닫는다"""
+        if self._doomed:
+            live = _live_threads()
+            for entry in [e for e in self._doomed if self._closable(e, live)]:
+                self._close(entry)
+
+    def _close(self, entry):
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+        if entry.doomed:
+            self._doomed.remove(entry)
+            entry.doomed = False
+        try:
+            entry.db.Close()
+        except Exception as e:
+            logger.warning("%s: Failed in closing pooled DB %s", e, entry.key[0])
+        self.counters["closes"] += 1
+        self._released.notify_all()
+
+    def _open_entries(self, path):
+        return [e for e in list(self._entries.values()) + self._doomed if e.key[0] == path]
+
+    def close_idle(self, now = None):
+        """idle_timeout 이 지난, 아무도 쓰지 않는 Database 를 닫는다 (다른 thread 의 것은 그 thread 가)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.users == 0 and now - entry.last_used >= self.idle_timeout:
+                    self._retire(entry)
+                    self.counters["idle_closes"] += 1
+
+    def close(self, mdb_path):
+        """mdb_path 의 Database 를 모두 pool 에서 뺀다. 쓰는 중이거나 다른 thread 의 것은 그 thread 가 닫는다"""
+        path = _pool_path(mdb_path)
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.key[0] == path:
+                    self._retire(entry)
+
+    @contextmanager
+    def exclusive(self, mdb_path, timeout = 30.0):
+        """
+        with pool.exclusive(mdb_path) as ok:
+        끝날 때까지 다른 thread 의 그 path 의 acquire 는 기다린다. 쓰는 중인 Database 가 모두 돌아오기를
+        (users == 0) 기다렸다가 닫는다. 다른 thread 가 연 것은 그 thread 가 닫는다 (DAO).
+        ok: timeout 초 (None = 끝없이) 안에 모두 닫혔으면 True. False 면 파일이 아직 열려 있다.
+        같은 thread 에서 다시 들어갈 수 있다 (Maintenance.check → DbCtrl.compact_db)
+        """
+        path = _pool_path(mdb_path)
+        me = threading.get_ident()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            held = self._exclusive.get(path)
+            if held is not None and held[0] == me:
+                held[1] += 1
+            else:
+                while path in self._exclusive:
+                    if not self._wait(deadline):
+                        logger.warning("%s is held exclusively by another thread", path)
+                        held = None
+                        break
+                else:
+                    held = self._exclusive[path] = [me, 1]
+            # timeout=0 (Maintenance 의 자동 compact) 은 열려 있으면 그냥 다음 번에 한다: warning 을 남기지 않는다
+            log = logger.warning if timeout != 0 else logger.debug
+            ok = held is not None and self._drain(path, deadline, log)
+        try:
+            yield ok
+        finally:
+            if held is not None:
+                with self._lock:
+                    held[1] -= 1
+                    if held[1] == 0:
+                        del self._exclusive[path]
+                    self._released.notify_all()
+
+    def _wait(self, deadline):
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return False
+        self._released.wait(remaining)
+        return True
+
+    def _drain(self, path, deadline, log):
+        """path 의 Database 가 모두 닫힐 때까지 (deadline 까지) 기다린다. 닫혔으면 True"""
+        while True:
+            for entry in list(self._entries.values()):
+                if entry.key[0] == path and entry.users == 0:
+                    self._retire(entry)
+            self._sweep()
+            left = self._open_entries(path)
+            if not left:
+                return True
+            if not self._wait(deadline):
+                log("%s: %s pooled DB(s) are still open (in use: %s)", path, len(left),
+                               sum(1 for e in left if e.users))
+                return False
+
+    def idle_seconds(self, mdb_path, now = None):
+        """
+        mdb_path 를 아무도 쓰지 않은 지 몇 초. 쓰는 중이면 0.
+        pool 로 연 적이 없으면 float("inf")
+        """
+        path = _pool_path(mdb_path)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if path in self._exclusive or any(e.users for e in self._open_entries(path)):
+                return 0.0
+            last = self._last_used.get(path)
+        return float("inf") if last is None else max(0.0, now - last)
+
+    def close_all(self):
+        """모두 pool 에서 뺀다. 이 thread 와 끝난 thread 의 것은 닫는다 (atexit)"""
+        with self._lock:
+            for entry in list(self._entries.values()):
+                self._retire(entry)
+            self._sweep()
+
+    def stats(self):
+        """opens: 실제로 연 횟수, reuses: 열지 않고 재사용한 횟수 (= 줄인 open 횟수)"""
+        with self._lock:
+            return dict(self.counters, open = len(self._entries) + len(self._doomed), doomed = len(self._doomed),
+                        in_use = sum(1 for e in list(self._entries.values()) + self._doomed if e.users))
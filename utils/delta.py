@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# - Table 의 incremental (delta) export
+#
+# delta_dir/
+#   <table>.manifest.json : 마지막 export 의 version, source(MDB path/mtime/size), pk,
+#                           rows: {key: row hash}
+#   <table>.base.json     : version 0 의 전체 row (save_json 과 같은 형식)
+#   <table>.delta.<n>.json: version n 에서 바뀐 row
+#                           {"version", "table", "pk", "inserted": [row], "updated": [row], "deleted": [key]}
+#
+# key  : primary key 값들의 JSON (db/ddl.json 의 PrimaryKey index. M_DATA: CODE, M_HISTORY: HTIME, DESP, CODE)
+# hash : row 전체 JSON 의 blake2b 8 byte
+# MDB 의 mtime, size 가 manifest 와 같으면 table 을 읽지도 않는다.
+# 다르면 table 을 한 번 읽어서 hash 만 비교하고, 바뀐 row 만 파일로 쓴다.
+# replay() 는 base 에 delta 를 차례로 적용해서 전체 table 을 다시 만든다.
+import os, json, glob, hashlib
+
+from lib.log import logger
+from utils.json import load_json, save_json, save_json_stream
+
+
+def primary_key(ddl, table_name):
+    """db/ddl.json 의 PrimaryKey field list. 없으면 []"""
+    for idx in ddl.get(table_name, {}).get("indexes", []):
+        if idx.get("primary"):
+            return list(idx["fields"])
+    return []
+
+def row_key(row, pk):
+    return json.dumps([row.get(k) for k in pk], ensure_ascii=False)
+
+def row_hash(row):
+    return hashlib.blake2b(json.dumps(row, ensure_ascii=False, sort_keys=True).encode("utf-8"),
+                           digest_size=8).hexdigest()
+
+def manifest_path(delta_dir, table_name):
+    return os.path.join(delta_dir, "%s.manifest.json" % table_name)
+
+def base_path(delta_dir, table_name):
+    return os.path.join(delta_dir, "%s.base.json" % table_name)
+
+def delta_path(delta_dir, table_name, version):
+    return os.path.join(delta_dir, "%s.delta.%06d.json" % (table_name, version))
+
+def delta_paths(delta_dir, table_name):
+    """version 순서의 delta 파일 list"""
+    return sorted(glob.glob(os.path.join(delta_dir, "%s.delta.*.json" % table_name)))
+
+
+def export_delta(rows, table_name, pk, delta_dir, source = None):
+    """
+    rows(iterable of dict) 와 지난 manifest 를 비교해서 delta 파일 하나를 쓴다.
+    manifest 가 없으면 base 를 쓴다 (version 0).
+    :return: {"table", "version", "inserted", "updated", "deleted", "unchanged", "path"}
+             바뀐 row 가 없으면 path 는 None (파일을 쓰지 않는다)
+    """
+    if not pk:
+        raise ValueError("%s has no primary key for a delta export" % table_name)
+    os.makedirs(delta_dir, exist_ok=True)
+    m_path = manifest_path(delta_dir, table_name)
+    manifest = load_json(m_path) if os.path.isfile(m_path) else None
+
+    # 1. 처음: 전체를 base 로
+    if manifest is None:
+        hashes = {}
+        def hashed(rows):
+            for row in rows:
+                hashes[row_key(row, pk)] = row_hash(row)
+                yield row
+        path = base_path(delta_dir, table_name)
+        cnt = save_json_stream(hashed(rows), path)
+        result = {"table": table_name, "version": 0, "inserted": cnt, "updated": 0,
+                  "deleted": 0, "unchanged": 0, "path": path}
+    # 2. 다음부터: 바뀐 row 만
+    else:
+        old = manifest["rows"]
+        hashes = {}
+        inserted, updated = [], []
+        for row in rows:
+            key, h = row_key(row, pk), row_hash(row)
+            hashes[key] = h
+            prev = old.get(key)
+            if prev is None:
+                inserted.append(row)
+            elif prev != h:
+                updated.append(row)
+        deleted = [json.loads(k) for k in old if k not in hashes]
+        version = manifest["version"] + 1
+        result = {"table": table_name, "version": version, "inserted": len(inserted),
+                  "updated": len(updated), "deleted": len(deleted),
+                  "unchanged": len(hashes) - len(inserted) - len(updated), "path": None}
+        if inserted or updated or deleted:
+            result["path"] = delta_path(delta_dir, table_name, version)
+            save_json({"version": version, "table": table_name, "pk": pk, "inserted": inserted,
+                       "updated": updated, "deleted": deleted}, result["path"])
+        else:
+            version = manifest["version"]
+            result["version"] = version
+
+    save_json({"table": table_name, "version": result["version"], "pk": pk,
+               "source": source or {}, "rows": hashes}, m_path)
+    logger.info("%s delta v%s: %s inserted, %s updated, %s deleted, %s unchanged", table_name,
+                result["version"], result["inserted"], result["updated"], result["deleted"],
+                result["unchanged"])
+    return result
+
+def is_unchanged(delta_dir, table_name, source):
+    """manifest 를 만든 MDB 의 mtime, size 가 그대로이면 True"""
+    m_path = manifest_path(delta_dir, table_name)
+    if not os.path.isfile(m_path) or not source or source.get("mtime") is None:
+        return False
+    old = load_json(m_path).get("source") or {}
+    return all(old.get(k) == source.get(k) for k in ("path", "mtime", "size"))
+
+def replay(delta_dir, table_name, upto = None):
+    """base 에 delta 를 version 순서로 적용한 전체 row list. upto: 마지막으로 적용할 version"""
+    pk = load_json(manifest_path(delta_dir, table_name))["pk"]
+    rows = {row_key(row, pk): row for row in load_json(base_path(delta_dir, table_name))}
+
+    for path in delta_paths(delta_dir, table_name):
+        delta = load_json(path)
+        if upto is not None and delta["version"] > upto:
+            break
+        for key in delta["deleted"]:
+            rows.pop(json.dumps(key, ensure_ascii=False), None)
+        for row in delta["updated"] + delta["inserted"]:
+            rows[row_key(row, pk)] = row
+    return list(rows.values())
+
+def compact(delta_dir, table_name):
+    """replay 결과를 새 base 로 쓰고 delta 파일을 지운다. manifest 의 version 은 그대로"""
+    rows = replay(delta_dir, table_name)
+    save_json(rows, base_path(delta_dir, table_name))
+    for path in delta_paths(delta_dir, table_name):
+        os.remove(path)
+    logger.info("%s deltas are compacted into %s (%s rows)", table_name,
+                base_path(delta_dir, table_name), len(rows))
+    return len(rows)
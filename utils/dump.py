@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# - db/ddl.json 의 모든 table 을 dump (MDB → JSON) 하고 restore (JSON → MDB) 한다
+#
+#   dump_dir/
+#     medical.json_<TABLE>.json : table 의 row. output/ 의 예전 dump 와 같은 형식
+#     count.json                : {table: row 개수}. restore 뒤에 이 개수와 비교한다
+#
+# dump   : table 마다 worker thread 가 자기 연결로 읽어서 파일로 흘려 쓴다 (save_json_stream)
+# restore: 먼저 모든 table 을 참조하는 table 부터 (dependency_order 의 반대) 비우고, 참조되는 table 부터
+#          primary key 로 중복을 빼고 DbCtrl.bulk_insert. 다음 table 의 JSON 은 미리 다른 thread 에서 읽어 둔다.
+#          DELETE 가 실패한 table (Relations 등) 은 넣지 않고 보고한다
+import os, time
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.log import logger
+from utils.json import load_json, save_json, save_json_stream
+from utils.sql import Sql
+from utils.db_ctrl import DbCtrl
+from utils.delta import primary_key, row_key
+
+PREFIX = "medical.json_"
+COUNT_FILE = "count.json"
+
+
+def dump_path(dump_dir, table_name, prefix = PREFIX):
+    return os.path.join(dump_dir, prefix + table_name + ".json")
+
+def table_ddl(ddl, table_name):
+    """{field name: DAO type}"""
+    return {f["name"]: f["type"] for f in ddl[table_name]["fields"]}
+
+
+def db_relations(db):
+    """DAO Relations: [(참조되는 table, 참조하는 table)]. 없으면 []"""
+    try:
+        return [(r.Table, r.ForeignTable) for r in db.Relations]
+    except Exception:
+        return []
+
+def dependency_order(ddl, relations = ()):
+    """
+    참조되는 table 이 먼저 오는 table 순서. 같은 단계에서는 ddl.json 순서.
+    relations 가 없으면 (ddl.json 에는 관계가 없다) 다른 table 의 한 field primary key 와
+    이름이 같은 field 를 참조로 본다. 예) M_HISTORY.CODE, M_LIST.CODE → M_DATA.CODE
+    """
+    tables = list(ddl)
+    deps = {t: set() for t in tables}
+    if relations:
+        for parent, child in relations:
+            if parent in deps and child in deps and parent != child:
+                deps[child].add(parent)
+    else:
+        single_pk = {}
+        for t in tables:
+            pk = primary_key(ddl, t)
+            if len(pk) == 1:
+                single_pk.setdefault(pk[0], t)
+        for t in tables:
+            for f in ddl[t]["fields"]:
+                parent = single_pk.get(f["name"])
+                if parent and parent != t:
+                    deps[t].add(parent)
+
+    order = []
+    while len(order) < len(tables):
+        ready = [t for t in tables if t not in order and deps[t] <= set(order)]
+        if not ready:  # 순환: 남은 것은 ddl 순서대로
+            ready = [t for t in tables if t not in order]
+        order.extend(ready)
+    return order
+
+def dedupe(rows, pk):
+    """primary key 가 같은 row 는 처음 것만. (rows, 뺀 개수)"""
+    if not pk:
+        return rows, 0
+    seen = set()
+    out = []
+    for r in rows:
+        key = row_key(r, pk)
+        if key not in seen:
+            seen.add(key)
+            out.append(r)
+    return out, len(rows) - len(out)
+
+
+def _dump_1table(db_ctrl, table_name, path, chunk_size):
+    # worker thread 의 연결: pool 을 거치지 않고 열고 닫는다
+    db_ctrl.backend.init_thread()
+    db = db_ctrl.backend.open_db(db_ctrl.mdb_path, db_ctrl.password)
+    try:
+        start = time.perf_counter()
+        cnt = save_json_stream(db_ctrl.iter_table(db, table_name, chunk_size), path)
+        elapsed = time.perf_counter() - start
+        db_rows = Sql.table_row_count(db, table_name)
+    finally:
+        db.Close()
+    return {"table": table_name, "rows": cnt, "db_rows": db_rows, "elapsed": elapsed,
+            "rows_per_sec": cnt / elapsed if elapsed else 0.0,
+            "bytes": os.path.getsize(path), "path": path}
+
+def dump_tables(db_ctrl, dump_dir, ddl, tables = None, workers = 4, prefix = PREFIX,
+                chunk_size = 1000):
+    """
+    tables(기본: ddl.json 의 모든 table)를 dump_dir 에 쓰고 count.json 을 쓴다.
+    :return: [{"table", "rows", "db_rows", "elapsed", "rows_per_sec", "bytes", "path"}] (tables 순서)
+    """
+    tables = list(ddl) if tables is None else tables
+    os.makedirs(dump_dir, exist_ok=True)
+    start = time.perf_counter()
+    jobs = [(t, dump_path(dump_dir, t, prefix)) for t in tables]
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            reports = list(pool.map(lambda j: _dump_1table(db_ctrl, j[0], j[1], chunk_size), jobs))
+    else:
+        reports = [_dump_1table(db_ctrl, t, path, chunk_size) for t, path in jobs]
+
+    save_json({r["table"]: r["rows"] for r in reports}, os.path.join(dump_dir, COUNT_FILE))
+    log_reports("Dump of %s tables into %s" % (len(reports), dump_dir), reports,
+                time.perf_counter() - start)
+    for r in reports:
+        if r["rows"] != r["db_rows"]:
+            logger.error("ERROR: %s: %s rows dumped, but COUNT(*) = %s", r["table"], r["rows"], r["db_rows"])
+    return reports
+
+
+def restore_tables(db_ctrl, dump_dir, ddl, tables = None, prefix = PREFIX, batch_size = 500,
+                   replace = True):
+    """
+    dump_dir 의 dump 를 dependency 순서로 bulk load 한다. dump 파일이 없는 table 은 건너뛴다.
+    :param replace: table 의 row 를 먼저 지운다
+    :return: [{"table", "rows", "duplicates", "inserted", "failed", "elapsed", "rows_per_sec",
+               "expected", "db_rows", "error"}]. error: 비우지 못한 table 의 DELETE 오류 (넣지 않았다)
+    """
+    with db_ctrl.connection() as db:
+        order = [t for t in dependency_order(ddl, db_relations(db)) if tables is None or t in tables]
+        order = [t for t in order if os.path.isfile(dump_path(dump_dir, t, prefix))]
+        count_path = os.path.join(dump_dir, COUNT_FILE)
+        expected = load_json(count_path) if os.path.isfile(count_path) else {}
+        logger.info("Restore order: %s", order)
+
+        start = time.perf_counter()
+        reports = []
+        # 다음 table 의 JSON 하나만 미리 읽는다: 메모리에는 많아야 두 table 의 dump 가 있다
+        paths = [dump_path(dump_dir, t, prefix) for t in order]
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            load = pool.submit(load_json, paths[0]) if paths else None
+            # 참조하는 table 부터 비운다: 아직 참조되는 row 는 Relations 때문에 지워지지 않는다
+            errors = delete_tables(db, order[::-1]) if replace else {}
+            for i, table_name in enumerate(order):
+                rows, dups = dedupe(load.result(), primary_key(ddl, table_name))
+                load = pool.submit(load_json, paths[i + 1]) if i + 1 < len(paths) else None
+                report = {"table": table_name, "rows": len(rows) + dups, "duplicates": dups,
+                          "inserted": 0, "failed": 0, "elapsed": 0.0, "rows_per_sec": 0.0,
+                          "expected": expected.get(table_name), "db_rows": None,
+                          "error": errors.get(table_name)}
+                if report["error"] is None:
+                    r = DbCtrl.bulk_insert(db, table_name, table_ddl(ddl, table_name), rows, batch_size,
+                                           db_ctrl.backend)
+                    Sql.invalidate(db)
+                    report.update(inserted = r["inserted"], failed = len(r["failed"]), elapsed = r["elapsed"],
+                                  rows_per_sec = r["rows_per_sec"])
+                try:
+                    report["db_rows"] = Sql.table_row_count(db, table_name)
+                except Exception as e:
+                    report["error"] = report["error"] or str(e)
+                reports.append(report)
+
+    log_reports("Restore of %s tables from %s" % (len(reports), dump_dir), reports,
+                time.perf_counter() - start)
+    for r in reports:
+        if r["error"] is not None:
+            logger.error("ERROR: %s is not restored: %s", r["table"], r["error"])
+        elif r["expected"] is not None and r["db_rows"] != r["expected"]:
+            logger.error("ERROR: %s: %s rows in the db, but %s = %s", r["table"], r["db_rows"],
+                         COUNT_FILE, r["expected"])
+    return reports
+
+
+def delete_tables(db, tables):
+    """tables 를 주어진 순서로 비운다. 실패해도 다음 table 을 한다. :return: {table: 오류}"""
+    errors = {}
+    for table_name in tables:
+        try:
+            db.Execute("DELETE FROM [%s]" % table_name)
+        except Exception as e:
+            errors[table_name] = str(e)
+            logger.error("ERROR: %s: Failed in emptying %s", e, table_name)
+    Sql.invalidate(db)
+    return errors
+
+
+def log_reports(title, reports, elapsed):
+    logger.info("───────────────────────────────────")
+    logger.info(title)
+    for r in reports:
+        logger.info("    %-10s %8s rows %9.3f s %10.0f rows/s", r["table"], r["rows"], r["elapsed"],
+                    r["rows_per_sec"])
+    logger.info("    %-10s %8s rows %9.3f s", "total", sum(r["rows"] for r in reports), elapsed)
+    logger.info("───────────────────────────────────")
@@ -1,10 +1,158 @@
-import json
+# -*- coding: utf-8 -*-
+# - JSON codec: 모든 export / import 가 거치는 load_json / save_json
+#
+# backend : orjson > ujson > json (stdlib) 중 설치된 가장 빠른 것. MDB_JSON_BACKEND=json 등으로 고른다.
+#           backend 가 못 다루는 값 (Decimal, 64bit 를 넘는 int, 문자열이 아닌 dict key, NaN 이 든 파일)은
+#           stdlib 로 다시 한다.
+# 형식    : pretty (기본): indent=2, ensure_ascii=False. backend 에 따라 float 표기만 다를 수 있다
+#                           (1e-05 / 0.00001). 읽으면 같은 값이다
+#           compat=True   : 예전 save_json 과 byte 단위로 같은 출력 (stdlib)
+#           compact=True  : 공백 없이. program.json, data_table.json 처럼 program 끼리 주고받는 파일
+#           jsonl         : 한 줄에 JSON 하나 (save_jsonl / iter_jsonl). 한 줄씩 읽고 쓴다
+# 쓰기는 모두 atomic (utils/atomic.py): 같은 폴더의 임시 파일에 쓰고 os.replace 한다. 쓰다가 실패하면
+# 원래 파일은 그대로다. 읽는 쪽은 반쯤 쓴 파일을 보지 않는다. fsync: None 이면 atomic.FSYNC
+import os, json
+
+from utils.atomic import AtomicFile
+
+_BACKENDS = ("orjson", "ujson", "json")
+
+def _pick_backend(name = None):
+    names = [name] if name else list(_BACKENDS)
+    for n in names:
+        try:
+            return n, __import__(n)
+        except ImportError:
+            continue
+    return "json", json
+
+BACKEND, _backend = _pick_backend(os.environ.get("MDB_JSON_BACKEND", "").strip().lower() or None)
+
+
+def _std_dumps(obj, compact):
+    if compact:
+        s = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    else:
+        s = json.dumps(obj, ensure_ascii=False, indent=2)
+    return s.encode("utf-8")
+
+def dumps(obj, compact = False, compat = False):
+    """obj → UTF-8 bytes"""
+    if compat or BACKEND == "json":
+        return _std_dumps(obj, compact)
+    try:
+        if BACKEND == "orjson":
+            return _backend.dumps(obj, option=0 if compact else _backend.OPT_INDENT_2)
+        return _backend.dumps(obj, ensure_ascii=False, escape_forward_slashes=False,
+                              indent=0 if compact else 2).encode("utf-8")
+    except (TypeError, ValueError, OverflowError):
+        return _std_dumps(obj, compact)
+
+def loads(data):
+    """bytes 또는 str → obj"""
+    if BACKEND != "json":
+        try:
+            return _backend.loads(data)
+        except ValueError:
+            pass  # NaN, Infinity 등: stdlib 는 읽는다
+    return json.loads(data)
+
 
 def load_json(json_path):
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open(json_path, "rb") as f:
+        data = loads(f.read())
     return data # list of dict
 
-def save_json(json_data, json_path): 
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(json_data, f, ensure_ascii=False, indent=2)
+def save_json(json_data, json_path, compact = False, compat = False, fsync = None):
+    with AtomicFile(json_path, fsync) as f:
+        f.write(dumps(json_data, compact, compat))
+
+
+class JsonArrayWriter:
+    """
+    row 를 하나씩 받아서 JSON array 로 쓴다. 같은 compact/compat 의 save_json(list) 와 byte 단위로 같은 결과.
+        with JsonArrayWriter(path) as w:
+            w.write_rows(rows)
+    close() 에서 path 로 replace 한다 (AtomicFile). with 안에서 예외가 나면 path 는 그대로다.
+    """
+    def __init__(self, json_path, buffer_rows = 1000, compact = False, compat = False, fsync = None):
+        self.json_path = json_path
+        self.count = 0
+        self.buffer_rows = buffer_rows
+        self.compact = compact
+        self.compat = compat
+        self._buf = []
+        self.f = AtomicFile(json_path, fsync)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.discard()
+        return False
+
+    def write(self, row):
+        data = dumps(row, self.compact, self.compat)
+        if self.compact:
+            self._buf.append((b"[" if self.count == 0 else b",") + data)
+        else:
+            # indent=2 array 의 한 element: 모든 줄을 두 칸 들여 쓴다
+            self._buf.append((b"[\n  " if self.count == 0 else b",\n  ") + data.replace(b"\n", b"\n  "))
+        self.count += 1
+        if len(self._buf) >= self.buffer_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        self.f.write(b"".join(self._buf))
+        self._buf = []
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.flush()
+        if self.count:
+            self.f.write(b"]" if self.compact else b"\n]")
+        else:
+            self.f.write(b"[]")
+        self.f.close()
+
+def save_json_stream(rows, json_path, compact = False, compat = False, fsync = None):
+    """iterable 의 row 를 메모리에 모으지 않고 JSON array 로 쓴다. 쓴 row 개수를 돌려준다"""
+    with JsonArrayWriter(json_path, compact = compact, compat = compat, fsync = fsync) as w:
+        w.write_rows(rows)
+    return w.count
+
+
+# -------- JSON Lines: 한 줄에 row 하나
+
+def save_jsonl(rows, json_path, buffer_rows = 1000, fsync = None):
+    """iterable 의 row 를 한 줄씩 쓴다. 쓴 row 개수를 돌려준다"""
+    count, buf = 0, []
+    with AtomicFile(json_path, fsync) as f:
+        for row in rows:
+            buf.append(dumps(row, compact = True))
+            count += 1
+            if len(buf) >= buffer_rows:
+                f.write(b"\n".join(buf) + b"\n")
+                buf = []
+        if buf:
+            f.write(b"\n".join(buf) + b"\n")
+    return count
+
+def iter_jsonl(json_path):
+    """한 줄씩 읽어서 row 를 하나씩 넘긴다. 빈 줄은 건너뛴다"""
+    with open(json_path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield loads(line)
+
+def load_jsonl(json_path):
+    return list(iter_jsonl(json_path))
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# - MDB 자동 compact
+#
+# Jet 은 DELETE 한 자리를 바로 돌려주지 않는다. delete_all_rows_in_table + insert 를 되풀이하면
+# row 수는 그대로인데 파일만 커지고, 그 뒤의 읽기도 느려진다.
+#
+#   m = Maintenance(db_ctrl, state_path)
+#   m.start()      # background thread: interval 초마다 check → 필요하면 compact
+#   m.run_once()   # 지금 한 번 check → compact
+#   m.stop()
+#
+# check  : 파일 크기와 row 수로 byte/row 를 재서, 지난 compact 직후의 byte/row (baseline) 와 비교한다
+#          "fragmentation": byte/row 가 baseline 의 growth_ratio 배 이상 (min_size 보다 큰 파일만)
+#          "size"         : 파일이 max_size 이상 (Jet 은 2GB 가 한계)
+#          파일 크기가 지난 check 와 같으면 row 수도 세지 않는다.
+# run_once: DB 를 idle_sec 동안 아무도 쓰지 않았으면 (DbPool.idle_seconds) 먼저 DbPool.exclusive 로
+#          독점하고 나서 check → compact 한다. 그 사이에 누가 열지 못한다. 열려 있는 Database 를 바로 닫지
+#          못하면 (쓰는 중, 다른 thread 의 session 안의 DAO 연결) 기다리지 않고 다음 번에 한다.
+#          DAO 의 연결은 session 밖에서는 돌려줄 때 닫히므로 (DbPool.session) 놀고 있는 thread 가 막지 않는다.
+# compact: DbCtrl.compact_db, .bak_* 는 keep_backups 개만.
+#          전후의 크기와 모든 table 을 읽는 속도를 log 로 남긴다.
+# state  : state_path 의 JSON. baseline 과 지난 check, compact 기록
+import os, time, atexit, threading
+from contextlib import contextmanager
+
+from lib.log import logger
+from utils.json import load_json, save_json
+from utils.db_ctrl import DbCtrl
+from utils.sql import Sql
+
+
+class Maintenance:
+    def __init__(self, db_ctrl, state_path = None, growth_ratio = 1.5, min_size = 1 << 20,
+                 max_size = 1536 << 20, idle_sec = 30.0, interval = 60.0, keep_backups = 3):
+        self.db_ctrl = db_ctrl
+        self.state_path = state_path
+        self.growth_ratio = growth_ratio
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_sec = idle_sec
+        self.interval = interval
+        self.keep_backups = keep_backups
+        self.state = self._load_state()
+        self.reports = []  # 이번 process 의 compact 보고
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # check/compact 는 한 번에 하나
+
+    @property
+    def mdb_path(self):
+        return self.db_ctrl.mdb_path
+
+    def _load_state(self):
+        if self.state_path and os.path.isfile(self.state_path):
+            try:
+                return load_json(self.state_path)
+            except Exception as e:
+                logger.warning("%s: Maintenance state %s is ignored", e, self.state_path)
+        return {}
+
+    def _save_state(self):
+        if self.state_path:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            save_json(self.state, self.state_path)
+
+    # pool 을 거치지 않는 연결: pool 의 idle 시간을 바꾸지 않는다
+    def _open(self):
+        self.db_ctrl.backend.init_thread()
+        return self.db_ctrl.backend.open_db(self.mdb_path, self.db_ctrl.password)
+
+    def measure(self):
+        """{"size", "rows", "bytes_per_row"}"""
+        db = self._open()
+        try:
+            rows = sum(Sql.all_table_row_counts(db).values())
+        finally:
+            db.Close()
+        size = os.path.getsize(self.mdb_path)
+        return {"size": size, "rows": rows, "bytes_per_row": size / max(rows, 1)}
+
+    def read_speed(self):
+        """모든 table 을 한 번씩 읽는다: (rows, 초)"""
+        db = self._open()
+        try:
+            start = time.perf_counter()
+            rows = 0
+            for table_name in DbCtrl.list_tables(db):
+                for chunk in self.db_ctrl.iter_table(db, table_name, chunks=True):
+                    rows += len(chunk)
+            return rows, time.perf_counter() - start
+        finally:
+            db.Close()
+
+    @contextmanager
+    def _exclusive(self, timeout):
+        """pool 의 연결을 모두 닫고 그동안 열지 못하게 한다. 닫았으면 True"""
+        if self.db_ctrl.pool is None:
+            yield True
+        else:
+            with self.db_ctrl.pool.exclusive(self.mdb_path, timeout) as ok:
+                yield ok
+
+    def idle(self):
+        """DB 를 idle_sec 동안 아무도 쓰지 않았다"""
+        return self.db_ctrl.pool is None or self.db_ctrl.pool.idle_seconds(self.mdb_path) >= self.idle_sec
+
+    def check(self, force = False):
+        """compact 할 이유 ("size" | "fragmentation") 또는 None"""
+        if not os.path.isfile(self.mdb_path):
+            return None
+        size = os.path.getsize(self.mdb_path)
+        if not force and size == self.state.get("checked_size"):
+            return None  # 지난 check 뒤로 바뀌지 않았다
+
+        m = self.measure()
+        if not self.state.get("baseline_bytes_per_row"):
+            self.state["baseline_bytes_per_row"] = m["bytes_per_row"]
+        ratio = m["bytes_per_row"] / self.state["baseline_bytes_per_row"]
+        self.state.update(checked_size = m["size"], checked_rows = m["rows"], checked_ratio = ratio)
+        self._save_state()
+        logger.debug("Maintenance check %s: %s bytes, %s rows, %.0f bytes/row (x%.2f of the baseline)",
+                     self.mdb_path, m["size"], m["rows"], m["bytes_per_row"], ratio)
+
+        if m["size"] >= self.max_size:
+            return "size"
+        if m["size"] >= self.min_size and ratio >= self.growth_ratio:
+            return "fragmentation"
+        return None
+
+    def compact(self, reason = "manual", timeout = 30.0):
+        """
+        :param timeout: 열려 있는 Database 가 닫히기를 기다리는 초. 그래도 열려 있으면 하지 않고 None
+        :return: {"reason", "done", "size_before", "size_after", "read_before", "read_after", ...}
+        """
+        with self._exclusive(timeout) as closed:
+            if not closed:
+                logger.warning("%s is in use: compact is skipped", self.mdb_path)
+                return None
+            return self._compact(reason)
+
+    def _compact(self, reason):
+        before = self.measure()
+        rows, read_before = self.read_speed()
+        start = time.perf_counter()
+        done = self.db_ctrl.compact_db(keep_backups = self.keep_backups)
+        elapsed = time.perf_counter() - start
+        after = self.measure()
+        _, read_after = self.read_speed()
+
+        report = {"reason": reason, "done": done, "elapsed": elapsed, "rows": rows,
+                  "size_before": before["size"], "size_after": after["size"],
+                  "read_before": read_before, "read_after": read_after,
+                  "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        if done:
+            self.state.update(baseline_bytes_per_row = after["bytes_per_row"],
+                              checked_size = after["size"], checked_rows = after["rows"], checked_ratio = 1.0,
+                              last_compact = report)
+            self._save_state()
+        self.reports.append(report)
+
+        logger.info("───────────────────────────────────")
+        logger.info("Compact %s (%s): %s in %.2f s", self.mdb_path, reason, "done" if done else "FAILED", elapsed)
+        logger.info("    size: %10s → %10s bytes (%.0f%%)", before["size"], after["size"],
+                    100.0 * after["size"] / before["size"] if before["size"] else 0.0)
+        logger.info("    read: %10.3f → %10.3f s for %s rows (%.0f → %.0f rows/s)", read_before, read_after,
+                    rows, rows / read_before if read_before else 0.0, rows / read_after if read_after else 0.0)
+        logger.info("───────────────────────────────────")
+        return report
+
+    def run_once(self, force = False):
+        """
+        독점하고 check 해서 필요하면 compact. :return: compact 보고 또는 None
+        force: idle 이 아니어도, 열려 있는 Database 가 닫히기를 기다려서 한다
+        """
+        with self._lock:
+            if not force and not self.idle():
+                return None  # 쓰는 중
+            # 먼저 독점한다: check 와 compact 사이에 누가 열지 못한다. 자동일 때는 기다리지 않는다
+            with self._exclusive(30.0 if force else 0) as closed:
+                if not closed:
+                    logger.debug("%s is in use: maintenance is skipped", self.mdb_path)
+                    return None
+                reason = self.check(force)
+                if reason is None and not force:
+                    return None
+                return self._compact(reason or "manual")
+
+    # -------- Background thread
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._loop, name = "maintenance", daemon = True)
+        self._thread.start()
+        atexit.register(self.stop)  # compact 중이면 끝날 때까지 기다린다
+        logger.info("Maintenance of %s every %s s (idle %s s, x%s growth, keep %s backups)",
+                    self.mdb_path, self.interval, self.idle_sec, self.growth_ratio, self.keep_backups)
+        return self
+
+    def stop(self, timeout = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.exception("ERROR: %s: Maintenance of %s failed", e, self.mdb_path)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# - (TYPE, ITEM, MEMO) 정규화 prefix → M_DATA row 위치 index 를 파일로 저장/재사용
+#
+# index 파일은 M_DATA export 옆에 둔다 (data_table.snap → data_table.idx).
+# fingerprint = sha1(export 파일 내용, prefix_len, 정규화 규칙) 이 같을 때만 다시 쓴다.
+# export 가 바뀌거나 prefix_len, 정규화 규칙이 바뀌면 자동으로 다시 만든다.
+import os, hashlib, pickle
+
+from lib.log import logger
+from utils.atomic import AtomicFile
+
+INDEX_VERSION = 1
+
+
+def index_path_for(data_table_path):
+    return os.path.splitext(data_table_path)[0] + ".idx"
+
+def file_digest(path, block_size = 1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def index_fingerprint(data_digest, prefix_len, rules):
+    h = hashlib.sha1()
+    h.update(repr((INDEX_VERSION, data_digest, prefix_len, rules)).encode("utf-8"))
+    return h.hexdigest()
+
+
+class MatchIndex:
+    """
+    key → M_DATA row 위치(list). build_hash 의 dict 처럼 get(key) 로 row list 를 준다.
+    """
+    def __init__(self, table, positions, fingerprint = None):
+        self.table = table
+        self.positions = positions  # key → [row index]
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_keys(cls, table, keys, fingerprint = None):
+        """keys[i] 는 table[i] 의 key"""
+        positions = {}
+        for i, key in enumerate(keys):
+            positions.setdefault(key, []).append(i)
+        return cls(table, positions, fingerprint)
+
+    @classmethod
+    def builder(cls, key_func, chunk_rows = 5000):
+        """export 하는 row 를 하나씩 받아서 만든다 (table 을 메모리에 두지 않는다). IndexBuilder"""
+        return IndexBuilder(cls, key_func, chunk_rows)
+
+    def get(self, key, default = None):
+        pos = self.positions.get(key)
+        if pos is None:
+            return default
+        table = self.table
+        return [table[i] for i in pos]
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def save(self, path):
+        with AtomicFile(path) as f:
+            pickle.dump({"fingerprint": self.fingerprint, "positions": self.positions}, f, protocol=4)
+        logger.info("Match index (%s keys) is saved as %s", len(self.positions), path)
+
+    @classmethod
+    def load(cls, path, table, fingerprint):
+        """저장된 index 의 fingerprint 가 다르거나 읽을 수 없으면 None"""
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logger.warning("Match index %s is not readable: %s", path, e)
+            return None
+        if data.get("fingerprint") != fingerprint:
+            logger.info("Match index %s is stale", path)
+            return None
+        return cls(table, data["positions"], fingerprint)
+
+
+class CodeIndex:
+    """
+    M_DATA.CODE (primary key, db/ddl.json) → row. 분석 항목의 code 로 O(1) 에 찾는다.
+    정규화가 없어서 만드는 비용은 CODE column 을 한 번 읽는 것뿐이다.
+    """
+    def __init__(self, table):
+        self.table = table
+        if hasattr(table, "column"): # ColumnTable (utils/snapshot.py)
+            codes = table.column("CODE")
+        else:
+            codes = [row.get("CODE") for row in table]
+        self.positions = {}
+        for i, code in enumerate(codes):
+            if code is not None:
+                self.positions.setdefault(code, i)  # primary key: 처음 것만
+
+    def get(self, code, default = None):
+        pos = self.positions.get(code)
+        if pos is None:
+            return default
+        return self.table[pos]
+
+    def __contains__(self, code):
+        return code in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class IndexBuilder:
+    """
+    b = MatchIndex.builder(key_func)   # key_func(rows) → [key], rows 는 chunk_rows 개씩
+    b.write(row) ...                    # row 순서 = export 파일의 row 순서
+    index = b.close(fingerprint)        # index.table 은 None
+    """
+    def __init__(self, cls, key_func, chunk_rows = 5000):
+        self.cls = cls
+        self.key_func = key_func
+        self.chunk_rows = chunk_rows
+        self.positions = {}
+        self.count = 0
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        positions = self.positions
+        for i, key in enumerate(self.key_func(self._rows), self.count):
+            positions.setdefault(key, []).append(i)
+        self.count += len(self._rows)
+        self._rows = []
+
+    def close(self, fingerprint = None):
+        self._flush()
+        return self.cls(None, self.positions, fingerprint)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# - exact match 에 실패한 분석 항목을 위한 2 단계 matcher
+#
+# (TYPE, ITEM) 정규화 값별 bucket 안에서, 잘리지 않은 정규화 MEMO 로 찾는다.
+#   "prefix" : 분석 설명과 MEMO 중 하나가 다른 하나로 시작한다
+#              (doc/medical2.md 의 A0877015: MEMO 뒤에 "...기타)(#1)" 이 더 붙어 있다)
+#   "fuzzy"  : 글자 bigram 의 Dice 계수가 min_score 이상
+#   "code"   : bucket 에서 못 찾으면 분석 항목의 code 로 M_DATA.CODE 를 찾는다
+# 순위는 prefix > fuzzy > code, 같은 mode 안에서는 score(0~1) 순.
+# index 는 처음 match() 할 때 만든다. miss 가 없으면 비용도 없다. 만든 뒤에는 읽기만 한다.
+import threading
+from collections import Counter
+
+from utils import text
+
+FULL_LEN = 1 << 16  # 정규화할 때 자르지 않는다
+MIN_PREFIX_LEN = 4  # 이보다 짧은 설명은 prefix 로 보지 않는다
+MODES = ("prefix", "fuzzy", "code")
+
+
+def bigrams(s):
+    if len(s) < 2:
+        return {s} if s else set()
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+class Candidate:
+    __slots__ = ("score", "mode", "pos", "row")
+
+    def __init__(self, score, mode, pos, row):
+        self.score = score
+        self.mode = mode
+        self.pos = pos
+        self.row = row
+
+    def __repr__(self):
+        return "Candidate(%.3f, %s, %s)" % (self.score, self.mode, self.row.get("CODE"))
+
+
+class FuzzyMatcher:
+    def __init__(self, table, min_score = 0.6):
+        self.table = table
+        self.min_score = min_score
+        self._built = False
+        self._lock = threading.Lock()  # build_1program 의 worker 들이 같이 쓴다
+
+    def _build(self):
+        with self._lock:
+            if not self._built:
+                self._build_index()
+
+    def _build_index(self):
+        table = self.table
+        if hasattr(table, "column"): # ColumnTable (utils/snapshot.py)
+            cats, subcats, memos, codes = (table.column(c) for c in ("TYPE", "ITEM", "MEMO", "CODE"))
+        else:
+            cats, subcats, memos, codes = ([row.get(c) for row in table]
+                                                for c in ("TYPE", "ITEM", "MEMO", "CODE"))
+        self.memos = text.normalize_column(memos, FULL_LEN)
+        self.gram_counts = []
+        self.buckets = {}  # (TYPE, ITEM) → {bigram: [pos]}
+        for pos, key in enumerate(zip(text.normalize_column(cats, FULL_LEN),
+                                      text.normalize_column(subcats, FULL_LEN))):
+            grams = self.buckets.setdefault(key, {})
+            memo_grams = bigrams(self.memos[pos])
+            self.gram_counts.append(len(memo_grams))
+            for g in memo_grams:
+                grams.setdefault(g, []).append(pos)
+        self.codes = {}
+        for pos, code in enumerate(codes):
+            self.codes.setdefault(code, []).append(pos)
+        self._built = True
+
+    def match(self, item, limit = 5):
+        """item: 분석 결과 element (cat, subcat, description, code). 점수 순 Candidate list"""
+        if not self._built:
+            self._build()
+
+        key = (text.str_normalize_cached(item.get("cat"), FULL_LEN),
+               text.str_normalize_cached(item.get("subcat"), FULL_LEN))
+        desc = text.str_normalize(item.get("description"), FULL_LEN)
+        grams = self.buckets.get(key)
+
+        found = []
+        if grams and desc:
+            q = bigrams(desc)
+            overlap = Counter()
+            for g in q:
+                overlap.update(grams.get(g, ()))
+            for pos, n in overlap.items():
+                memo = self.memos[pos]
+                shorter, longer = sorted((len(memo), len(desc)))
+                if shorter >= MIN_PREFIX_LEN and (memo.startswith(desc) or desc.startswith(memo)):
+                    found.append(Candidate(shorter / longer, "prefix", pos, None))
+                    continue
+                score = 2.0 * n / (len(q) + self.gram_counts[pos])
+                if score >= self.min_score:
+                    found.append(Candidate(score, "fuzzy", pos, None))
+
+        if not found and item.get("code") in self.codes:
+            found = [Candidate(1.0, "code", pos, None) for pos in self.codes[item["code"]]]
+
+        found.sort(key=lambda c: (MODES.index(c.mode), -c.score, c.pos))
+        found = found[:limit]
+        for c in found:
+            c.row = self.table[c.pos]
+        return found
+
+    def best(self, item):
+        """가장 높은 점수의 (mode, score, rows). 같은 점수는 모두. 없으면 (None, 0.0, [])"""
+        found = self.match(item)
+        if not found:
+            return None, 0.0, []
+        top = [c for c in found if (c.mode, c.score) == (found[0].mode, found[0].score)]
+        return found[0].mode, found[0].score, [c.row for c in top]
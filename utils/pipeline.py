@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# - USB workflow 를 겹쳐서 돌린다: MDB copy, M_DATA export/load, 분석 파일 읽기, matching, insert
+#
+#   pipe = SessionPipeline(program_ctrl, session_json_dirs)
+#   result = pipe.run()        # 다른 thread (UI 등) 에서 pipe.cancel() 하면 멈춘다. Ctrl+C 도 같다
+#
+# stage   thread               언제 시작하나
+#   copy    io pool              바로. sys MDB → ext MDB 를 chunk 단위로 (atomic_copy). progress("copy", byte, 전체)
+#   export  io pool              바로 (export=True, 또는 None 이고 M_DATA export 가 없을 때). sys MDB 에서
+#   tables  io pool              export 다음. snapshot + match index + matcher (load_match_tables)
+#   read    io pool (readers)    바로. 분석 파일 load_json
+#   match   match thread (1)     그 파일의 read 와 tables 가 끝나면. GIL 을 잡는 Python 이라 thread 하나
+#   save    main thread          session 의 파일이 모두 match 되면 program.json, program_report.json
+#   insert  insert thread (1)    copy 가 끝나고 session 이 save 되면. session 이 끝나는 순서대로
+# - thread 를 쓴다 (asyncio 가 아니다): DAO (COM) 객체는 만든 thread 에서만 쓸 수 있고, 나머지 code 도
+#   ThreadPoolExecutor 로 되어 있다. insert 는 한 thread 가 ext MDB 하나를 연다 (Jet 의 쓰기는 하나씩)
+# - copy 하는 동안 ext MDB 는 DbPool.exclusive: pool 의 연결을 닫고 insert 는 copy 가 끝나기를 기다린다
+# - cancel: 아직 시작하지 않은 일은 하지 않고 Cancelled 로 끝난다. copy 는 chunk 사이에서 멈추고 ext MDB 는
+#           그대로다 (임시 파일만 지운다). insert 는 하던 session 까지 마친다 (program 이 반만 들어가지 않게)
+# - result["stages"]: stage 별 start/end (run 시작부터 초), elapsed (= end - start), busy (일한 시간의 합),
+#   count, status (done | cancelled | failed). perf 가 켜져 있으면 "pipeline.<stage>" span 으로도 남는다
+import os, time, threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from lib.log import logger
+from lib import perf
+from utils.atomic import atomic_copy
+
+STAGES = ("copy", "export", "tables", "read", "match", "save", "insert")
+
+
+class Cancelled(Exception):
+    """SessionPipeline.cancel() 로 멈춘 stage"""
+
+
+class StageTimes:
+    """stage 별 시간. 여러 thread 가 같이 쓴다"""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        status = "done"
+        try:
+            with perf.span("pipeline." + name):
+                yield
+        except Cancelled:
+            status = "cancelled"
+            raise
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            self.add(name, start, time.perf_counter(), status)
+
+    def add(self, name, start, end, status = "done"):
+        start, end = start - self.t0, end - self.t0
+        with self._lock:
+            s = self.stats.get(name)
+            if s is None:
+                s = self.stats[name] = {"start": start, "end": end, "busy": 0.0, "count": 0, "status": "done"}
+            s["start"] = min(s["start"], start)
+            s["end"] = max(s["end"], end)
+            s["busy"] += end - start
+            s["count"] += 1
+            if status != "done" and s["status"] != "failed":
+                s["status"] = status
+
+    def report(self):
+        with self._lock:
+            stats = {n: dict(s) for n, s in self.stats.items()}
+        for s in stats.values():
+            s["elapsed"] = s["end"] - s["start"]
+        return {n: stats[n] for n in STAGES if n in stats}
+
+
+class SessionPipeline:
+    """
+    :param session_json_dirs: client session json folder list. None = program_ctrl.client_sessions()
+    :param prog_name: DESP of the programs. None = "<client name>_<timestamp>" (ProgramCtrl.session_name)
+    :param readers: 분석 파일을 읽는 thread 수
+    :param copy: sys MDB 를 ext MDB 로 복사한다. False 면 ext MDB 에 바로 insert 한다
+    :param export: M_DATA 를 sys MDB 에서 export 한다. None = export 가 없을 때만
+    :param insert: program 을 ext MDB 에 insert 한다. False 면 program.json 까지만
+    :param progress: progress(stage, done, total). copy 는 byte, 나머지는 session/파일 수. 예외를 내면 멈춘다
+    """
+    def __init__(self, program_ctrl, session_json_dirs = None, prog_name = None, readers = 2,
+                 copy = True, export = None, insert = True, batch_size = 500, chunk_size = 1 << 20,
+                 progress = None):
+        self.p = program_ctrl
+        self.session_json_dirs = session_json_dirs
+        self.prog_name = prog_name
+        self.readers = max(1, readers)
+        self.copy = copy
+        self.export = export
+        self.insert = insert
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.progress = progress or self._log_progress
+        self.times = None
+        self._cancel = threading.Event()
+        self._logged = {}
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def _log_progress(self, stage, done, total):
+        # 10% 마다 한 번
+        step = int(done * 10 / total) if total else 10
+        if self._logged.get(stage, -1) < step:
+            self._logged[stage] = step
+            logger.info("  %s: %s / %s", stage, done, total)
+
+    # -------- stages: 모두 worker thread 에서
+    def _copy(self):
+        src, dst = self.p.cfg.sys_drv["mdb_path"], self.p.cfg.ext_drv["mdb_path"]
+        total = os.path.getsize(src)
+
+        def progress(copied):
+            self._check()
+            self.progress("copy", copied, total)
+
+        with self.times.stage("copy"):
+            self._check()
+            pool = self.p.ext_db_ctrl.pool
+            if pool is not None:
+                with pool.exclusive(dst) as closed:
+                    if not closed:
+                        raise RuntimeError("%s is still open: it cannot be replaced" % dst)
+                    atomic_copy(src, dst, buffer_size = self.chunk_size, progress = progress)
+            else:
+                atomic_copy(src, dst, buffer_size = self.chunk_size, progress = progress)
+        logger.info("%s is copied as %s", src, dst)
+        return total
+
+    def _load_tables(self):
+        export = self.export
+        if export is None:
+            export = not os.path.isfile(self.p._get_data_table_path())
+        if export:
+            self._check()
+            with self.times.stage("export"):
+                with self.p.sys_db_ctrl.connection() as db:
+                    self.p.export_data_table(db)
+        self._check()
+        with self.times.stage("tables"):
+            return self.p.load_match_tables()
+
+    def _read(self, af_path):
+        self._check()
+        with self.times.stage("read"):
+            return self.p._load_1file(af_path)
+
+    def _match(self, tables_f, read_f, af_path, prog_name):
+        tables = tables_f.result()
+        af_data, load_sec = read_f.result()
+        self._check()
+        with self.times.stage("match"):
+            return self.p._match_1file(tables, af_path, af_data, prog_name, load_sec)
+
+    def _save(self, session_json_dir, outputs):
+        program_data, file_reports = [], []
+        for rows, report in outputs:
+            program_data.extend(rows)
+            file_reports.append(report)
+        with self.times.stage("save"):
+            self.p._save_program(program_data, file_reports, *self.p.session_outputs(session_json_dir))
+        return program_data
+
+    def _insert(self, copy_f, session_json_dir, program_data):
+        if copy_f is not None:
+            copy_f.result()
+        self._check()
+        ctrl = self.p.ext_db_ctrl
+        with self.times.stage("insert"):
+            ctrl.backend.init_thread()
+            with ctrl.connection() as db:
+                report = self.p.bulk_insert(db, self.p.program_table, self.p.program_table_ddl,
+                                            program_data, self.batch_size)
+        logger.info("%s: %s rows are inserted into %s", session_json_dir, report["inserted"], ctrl.mdb_path)
+        return session_json_dir, report
+
+    # -------- run
+    def run(self):
+        """
+        :return: {"sessions": {session json folder: program rows}, "inserted", "failed" (insert 못 한 row),
+                  "copied" (byte), "cancelled", "elapsed", "stages": {stage: {...}}}
+        """
+        p = self.p
+        dirs = self.session_json_dirs
+        if dirs is None:
+            dirs = p.client_sessions()
+        jobs = [(d, p.session_name(d, self.prog_name), p.session_files(d)) for d in dirs]
+        n_files = sum(len(files) for _, _, files in jobs)
+
+        self.times = StageTimes()
+        result = {"sessions": {}, "inserted": 0, "failed": 0, "copied": 0, "cancelled": False}
+        io = ThreadPoolExecutor(max_workers = 2 + self.readers, thread_name_prefix = "pipeline-io")
+        matchers = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "pipeline-match")
+        inserter = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "pipeline-insert")
+        tables_f = None
+        try:
+            copy_f = io.submit(self._copy) if self.copy else None
+            tables_f = io.submit(self._load_tables)
+
+            # 파일은 session 순서대로 읽고, 읽히는 대로 match 한다
+            file_fs = {}
+            for si, (d, name, files) in enumerate(jobs):
+                for fi, af_path in enumerate(files):
+                    read_f = io.submit(self._read, af_path)
+                    file_fs[matchers.submit(self._match, tables_f, read_f, af_path, name)] = (si, fi)
+
+            outputs = [[None] * len(files) for _, _, files in jobs]
+            remaining = [len(files) for _, _, files in jobs]
+            insert_fs = []
+
+            def session_done(si):
+                d = jobs[si][0]
+                program_data = self._save(d, outputs[si])
+                result["sessions"][d] = len(program_data)
+                self.progress("save", len(result["sessions"]), len(jobs))
+                if self.insert:
+                    insert_fs.append(inserter.submit(self._insert, copy_f, d, program_data))
+
+            for si, left in enumerate(remaining):
+                if left == 0:
+                    session_done(si)
+            for done, f in enumerate(as_completed(file_fs), 1):
+                si, fi = file_fs[f]
+                outputs[si][fi] = f.result()
+                self.progress("match", done, n_files)
+                remaining[si] -= 1
+                if remaining[si] == 0:
+                    session_done(si)
+
+            for f in insert_fs:
+                _, report = f.result()
+                result["inserted"] += report["inserted"]
+                result["failed"] += len(report["failed"])
+            if copy_f is not None:
+                result["copied"] = copy_f.result()
+        except Cancelled:
+            self.cancel()  # progress 가 Cancelled 를 낸 경우에도 나머지를 멈춘다
+            result["cancelled"] = True
+            logger.warning("Session pipeline is cancelled")
+        except BaseException:
+            self.cancel()  # 아직 시작하지 않은 일은 하지 않는다
+            raise
+        finally:
+            for ex in (io, matchers, inserter):
+                ex.shutdown(wait = True)
+            if tables_f is not None and not tables_f.cancelled() and tables_f.exception() is None:
+                p.close_match_tables(tables_f.result())
+
+        result["elapsed"] = time.perf_counter() - self.times.t0
+        result["stages"] = self.times.report()
+        logger.info("Session pipeline: %s sessions, %s files, %s rows inserted in %.3f s%s", len(jobs), n_files,
+                    result["inserted"], result["elapsed"], " (cancelled)" if result["cancelled"] else "")
+        for name, s in result["stages"].items():
+            logger.info("    %-7s %8.3f → %8.3f s  busy %8.3f s  x%-4s %s", name, s["start"], s["end"],
+                        s["busy"], s["count"], s["status"])
+        return result
@@ -1,55 +1,100 @@
 # mdb_sync.py
-import json, os, sys, shutil, datetime, subprocess, time
-import unicodedata, re
-import win32com.client
+import json, os, re, sys, shutil, datetime, time
+from collections import Counter
 
 from lib.singleton import SingletonMeta
 from lib.log import logger
-from utils.json import save_json, load_json
+from lib import perf
+from utils.json import save_json, load_json, save_json_stream
 from utils.sql import Sql
 from utils.config import Config
 from utils.sys import path_type
-from utils.db_ctrl import DbCtrl
+from utils import text
+from utils.db_ctrl import DbCtrl, PlanCache, PreparedInsert
+from utils.maintenance import Maintenance
+from utils.backend import get_backend
+from utils.snapshot import SnapshotWriter, SnapshotMismatch, snapshot_source, load_table
+from utils.match_index import MatchIndex, CodeIndex, index_path_for, index_fingerprint, file_digest
+from utils.matcher import FuzzyMatcher
+from utils import delta
 
 
 class ProgramCtrl(metaclass = SingletonMeta): 
+    # str_normalize rules. A change there invalidates the persisted match index
+    NORMALIZE_RULES = text.NORMALIZE_RULES
+
     def __init__(self, config): 
         self.cfg = config
         self.sql = Sql
+        # The SELECT cache is opt-in (self.sql.enable_cache()): exports and syncs stream and never use it
         self.data_table = "M_DATA"
         self.program_table = "M_HISTORY"
 
-        ddl_data = load_json(self._get_json_path("ddl_path", None))
-        ddl_data = ddl_data[self.program_table]["fields"]
-        self.program_table_ddl = {f["name"]:f["type"] for f in ddl_data}
-        logger.debug("%s DDL = %s", self.program_table, self.program_table_ddl)
-
-        # This instance is to update MEDICAL.mdb in the system
-        self.sys_db_ctrl = DbCtrl(config.sys_drv["mdb_path"], config.password)
-        self.ext_db_ctrl = DbCtrl(config.ext_drv["mdb_path"], config.password)
+        # ddl.json and the DB controls are made on the first use (a command pays only for what it uses)
+        self._ddl = None
+        self._program_table_ddl = None
+        self._sys_db_ctrl = None
+        self._ext_db_ctrl = None
+        self._maintenance = None
 
         # Hash table for data table
         self.prefix_len = 24  # cat2's string length to compare
+        # Items missed by the exact match go to the prefix/fuzzy/code matcher (utils/matcher.py). 
+        # Approximate matches would change the programs of existing builds: unless fuzzy_match is True, 
+        # the candidate is only reported ("suggested" in program_report.json) and the item is dropped
+        self.fuzzy_match = False
+        self.fuzzy_report = True
+        # Items carrying an M_DATA code are resolved by CODE first; the text only validates it
+        self.code_first = True
 
         # For a program, htime is fixed as today's 00:00:00.000000
         self.htime = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
+    @property
+    def ddl(self): 
+        if self._ddl is None: 
+            self._ddl = load_json(self._get_json_path("ddl_path", None))
+        return self._ddl
+
+    @property
+    def program_table_ddl(self): 
+        if self._program_table_ddl is None: 
+            ddl_data = self.ddl[self.program_table]["fields"]
+            self._program_table_ddl = {f["name"]:f["type"] for f in ddl_data}
+            logger.debug("%s DDL = %s", self.program_table, self._program_table_ddl)
+        return self._program_table_ddl
+
+    @property
+    def db_backend(self): 
+        return get_backend(self.cfg.backend)
+
+    # This instance is to update MEDICAL.mdb in the system
+    @property
+    def sys_db_ctrl(self): 
+        if self._sys_db_ctrl is None: 
+            self._sys_db_ctrl = DbCtrl(self.cfg.sys_drv["mdb_path"], self.cfg.password, self.cfg.backend)
+        return self._sys_db_ctrl
+
+    # Automatic compaction of the system MEDICAL.mdb (utils/maintenance.py). start() runs it in the background
+    @property
+    def maintenance(self): 
+        if self._maintenance is None: 
+            self._maintenance = Maintenance(self.sys_db_ctrl, self.cfg.run_drv["maintenance_path"])
+        return self._maintenance
+
+    # The copy of MEDICAL.mdb on the external drive: the drive is probed here, if not yet
+    @property
+    def ext_db_ctrl(self): 
+        if self._ext_db_ctrl is None: 
+            self._ext_db_ctrl = DbCtrl(self.cfg.ext_drv["mdb_path"], self.cfg.password, self.cfg.backend)
+        return self._ext_db_ctrl
+
     @staticmethod # Remove all white spaces and the get the prefix of <len> length
     def str_normalize(s, len):
         # Normalize Korean/English text for matching while preserving () , [] {}.
-        if not s:
-            return ""
-        s = unicodedata.normalize("NFKC", s) # Unicode Normalize
-        s = s.lower() # Lowercase (영문만 영향)
-        s = s.strip() # Strip leading/trailing spaces
-
-        # Remove ALL white spaces (space/tabs/newlines)
-        s = re.sub(r"[ \t\r\n]+", "", s)
-        # Remove punctuation EXCEPT (), [], {}, and ,
-        # we remove: . , ; : ! ? ' " - _ / \ |
-        s = re.sub(r"[.;:!?'\"/_\\\-|]+", "", s)
-
-        return s[:len]
+        # NFKC, lowercase, strip, and remove white spaces and . ; : ! ? ' " - _ / \ |
+        # (utils/text.py)
+        return text.str_normalize(s, len)
 
         # TODO: 그냥 matching 하는 것과 비교해 보기. 맨 앞 20글자만 matching 했을 때와도 비교하기
         # 개수를 봐서 차이가 있는지 없는지 확인하기 
@@ -57,15 +102,27 @@ class ProgramCtrl(metaclass = SingletonMeta):
     
     @staticmethod
     def hash_key(cat, subcat, value, str_len): 
-        return (ProgramCtrl.str_normalize(cat, str_len),    # 대분류
-                ProgramCtrl.str_normalize(subcat, str_len), # 소분류
-                ProgramCtrl.str_normalize(value, str_len))  # 값
+        return (text.str_normalize_cached(cat, str_len),    # 대분류
+                text.str_normalize_cached(subcat, str_len), # 소분류
+                text.str_normalize(value, str_len))         # 값
+
+    @staticmethod  # hash_key of every row, column by column
+    def hash_keys(table_rows, str_len): 
+        if hasattr(table_rows, "column"): # ColumnTable (utils/snapshot.py)
+            cats, subcats, values = (table_rows.column(c) for c in ("TYPE", "ITEM", "MEMO"))
+        else: 
+            cats = [row.get("TYPE") for row in table_rows]
+            subcats = [row.get("ITEM") for row in table_rows]
+            values = [row.get("MEMO") for row in table_rows]
+        return list(zip(text.normalize_column(cats, str_len), 
+                        text.normalize_column(subcats, str_len), 
+                        text.normalize_column(values, str_len)))
     
     @staticmethod  # Build the hash for exact match: key = (TYPE, ITEM, MEMO), value = row
+    @perf.timed("ProgramCtrl.build_hash", rows="table_rows")
     def build_hash(table_rows, str_len):
         index = {}
-        for row in table_rows:
-            key = ProgramCtrl.hash_key(row.get("TYPE"), row.get("ITEM"), row.get("MEMO"), str_len)  
+        for row, key in zip(table_rows, ProgramCtrl.hash_keys(table_rows, str_len)):
             # 대분류, 소분류, 값
             index.setdefault(key, []).append(row)
 
@@ -76,10 +133,41 @@ class ProgramCtrl(metaclass = SingletonMeta):
         #         print("key = {}".format(item))
         return index
 
+    def _index_fingerprint(self, data_table_path): 
+        return index_fingerprint(file_digest(data_table_path), self.prefix_len, self.NORMALIZE_RULES)
+
+    # The persisted index next to the M_DATA export if it is up to date, 
+    # otherwise build it and save it
+    def load_hash(self, data_table, data_table_path, rebuild = False):
+        fingerprint = self._index_fingerprint(data_table_path)
+        index_path = index_path_for(data_table_path)
+        index = None if rebuild else MatchIndex.load(index_path, data_table, fingerprint)
+        if index is None: 
+            index = MatchIndex.from_keys(data_table, self.hash_keys(data_table, self.prefix_len), 
+                                         fingerprint)
+            index.save(index_path)
+        return index
+
     def exact_match(self, item, hash_table):
         key = ProgramCtrl.hash_key(item["cat"], item["subcat"], item["description"], self.prefix_len)
         return hash_table.get(key)   # 없으면 []
 
+    # Resolve an item by its M_DATA code. 
+    # :return: (row, mismatch) or (None, None). mismatch lists the fields whose text 
+    #          disagrees with the row: "cat"/TYPE, "subcat"/ITEM, "description"/MEMO
+    def code_match(self, item, code_index): 
+        row = code_index.get(item.get("code"))
+        if row is None: 
+            return None, None
+        mismatch = []
+        for field, col in (("cat", "TYPE"), ("subcat", "ITEM"), ("description", "MEMO")): 
+            a, b = item.get(field), row.get(col)
+            if a == b:  # the common case: no normalization
+                continue
+            if text.str_normalize(a, self.prefix_len) != text.str_normalize(b, self.prefix_len): 
+                mismatch.append(field)
+        return row, mismatch
+
     def _get_json_path(self, default_path_key, json_path): 
         if json_path == None: 
             if default_path_key: 
@@ -101,7 +189,8 @@ class ProgramCtrl(metaclass = SingletonMeta):
                 json_path = os.path.abspath(json_path)
         return json_path
 
-    def export_data_table(self, db, json_path = None): 
+    def export_data_table(self, db, json_path = None, snapshot_path = None, 
+                          write_json = True, write_snapshot = True, write_index = True): 
         '''{
                 "CODE": "A0001002",
                 "TYPE": "기관",   # 대분류
@@ -127,6 +216,45 @@ class ProgramCtrl(metaclass = SingletonMeta):
         logger.info("%s rows in M_DATA table", self.sql.query(db, sql))
 
         # 2. Read meaningful columns from M_DATA table
+        # 3. Save as a json file and/or a column snapshot (for build_1program)
+        #    in one pass: stream rows from the recordset into the files. 
+        #    The json is read by programs only: compact (no indent)
+        rows = self._iter_data_table(db)
+        snapshot = None
+        if write_snapshot: 
+            snapshot = SnapshotWriter(self._get_json_path("data_snapshot_path", snapshot_path), 
+                                      self.data_table, self.ddl.get(self.data_table), 
+                                      snapshot_source(getattr(db, "Name", None)))
+            rows = self._tee(rows, snapshot)
+        # 4. Build the match index in the same pass, so that program builds only load it. 
+        #    Neither the snapshot nor the index keeps the whole table in memory
+        index = None
+        if write_index and (write_json or write_snapshot): 
+            index = MatchIndex.builder(lambda chunk: self.hash_keys(chunk, self.prefix_len))
+            rows = self._tee(rows, index)
+
+        if write_json: 
+            json_path = self._get_json_path("data_table_path", json_path)
+            cnt = save_json_stream(rows, json_path, compact = True)
+            logger.info("%s rows in M_DATA table are saved in %s", cnt, json_path)
+        else: 
+            cnt = sum(1 for _ in rows)
+        if snapshot is not None: 
+            snapshot.close()
+        elif write_json: 
+            # A snapshot from an earlier export would shadow this json (_get_data_table_path)
+            self._remove_stale_snapshot(snapshot_path)
+
+        if index is not None: 
+            data_table_path = self._get_data_table_path()
+            index.close(self._index_fingerprint(data_table_path)).save(index_path_for(data_table_path))
+        elif write_index: 
+            data_table_path = self._get_data_table_path()
+            self.load_hash(load_table(data_table_path), data_table_path, rebuild = True)
+        return cnt
+
+    # Meaningful columns of M_DATA table, row by row
+    def _iter_data_table(self, db): 
         def build_query(): 
             return (
                 "SELECT " 
@@ -134,21 +262,66 @@ class ProgramCtrl(metaclass = SingletonMeta):
                     "FIX(DATA2 / 60) AS DATA200, GRP, VIDEO, MEMO "
                 "FROM M_DATA;"
             )   # TYPE: 대분류, ITEM: 소분류, DATA1: 주파수, MEMO: 주파수 설명, GRP: 혈자리
-        sql = build_query()
-        json_data = self.sql.query(db, sql)
-
-        for d in json_data: 
+        for d in self.sql.iter_query(db, build_query()): 
             v = d.pop("DATA200")
             d["DATA2"] = v
-        # logger.info("%s rows in M_DATA table: Example row: %s", \
-        #     len(json_data), json_data[100])
+            yield d
+
+    # Export only the rows inserted, updated or deleted since the last export (utils/delta.py).
+    # M_DATA rows are the same as export_data_table, the other tables are SELECT *.
+    # If the MDB file has the same mtime and size as the last export, the table is not read.
+    # :return: {"table", "version", "inserted", "updated", "deleted", "unchanged", "path"}, 
+    #          and "skipped": True if the MDB is unchanged
+    def export_delta(self, db, table_name, delta_dir = None, force = False): 
+        delta_dir = self._get_json_path("delta_dir", delta_dir)
+        source = snapshot_source(getattr(db, "Name", None))
+        if not force and delta.is_unchanged(delta_dir, table_name, source): 
+            logger.info("%s is unchanged since the last export: %s", table_name, source)
+            return {"table": table_name, "skipped": True}
+
+        if table_name == self.data_table: 
+            rows = self._iter_data_table(db)
+        else: 
+            rows = self.sql.iter_query(db, "SELECT * FROM %s" % table_name)
+        return delta.export_delta(rows, table_name, delta.primary_key(self.ddl, table_name), 
+                                  delta_dir, source)
+
+    @staticmethod
+    def _tee(rows, writer): 
+        for row in rows: 
+            writer.write(row)
+            yield row
+
+    def _remove_stale_snapshot(self, snapshot_path = None): 
+        path = self._get_json_path("data_snapshot_path", snapshot_path)
+        if path and os.path.isfile(path): 
+            os.remove(path)
+            logger.info("The old snapshot %s is removed", path)
+
+    # The M_DATA export to read: the snapshot if there is and it is not older than the json, 
+    # otherwise the json
+    def _get_data_table_path(self): 
+        path = self._get_json_path("data_snapshot_path", None)
+        json_path = self._get_json_path("data_table_path", None)
+        if path and os.path.isfile(path): 
+            if not os.path.isfile(json_path) or os.path.getmtime(path) >= os.path.getmtime(json_path): 
+                return path
+            logger.warning("%s is older than %s: the json is read", path, json_path)
+        return json_path
 
-        # 3. Save as a json file 
-        json_path = self._get_json_path("data_table_path", json_path)
-        save_json(json_data, json_path)
-        logger.info("%s rows in M_DATA table are saved in %s", len(json_data), json_path)
+    # NumPy column store of a table for range/group-by questions (utils/column_store.py, needs numpy)
+    #   M_DATA: the export (export_data_table) is loaded as is. DATA2 there is FIX(DATA2/60)
+    #   others: read from db with one SELECT
+    def column_store(self, table_name = None, db = None): 
+        from utils.column_store import ColumnStore
+        table_name = table_name or self.data_table
+        if table_name == self.data_table and db is None: 
+            return ColumnStore.from_path(table_name, self._get_data_table_path())
+        return ColumnStore.from_rows(table_name, self.sql.iter_query(db, "SELECT * FROM %s" % table_name))
     
-    def _build_1program(self, data_table_hash, analysis_data, prog_name): 
+    @perf.timed("ProgramCtrl._build_1program", rows="analysis_data")
+    def _build_1program(self, data_table_hash, analysis_data, prog_name, matcher = None, 
+                        code_index = None): 
         # Convert analysis json data into a program json data
         logger.info("Build a program for the analysis result...") #, flush=True)
 
@@ -156,18 +329,59 @@ class ProgramCtrl(metaclass = SingletonMeta):
         skipped_json_cnt = 0 # json element 기준으로 실패한 개수
         added_list = []
         skipped_list = []
+        match_list = []      # 분석 항목마다 어떻게 match 됐는지: code, exact, prefix, fuzzy, dropped
+        mismatch_cnt = 0     # code 로 찾았지만 text 가 다른 항목 개수
         for item in analysis_data:
+            # 0) Look up the code first: one row by primary key
+            mismatch = None
+            matched_rows = None
+            if code_index is not None: 
+                row, mismatch = self.code_match(item, code_index)
+                if row is not None: 
+                    mode, score, matched_rows = "code", 1.0, [row]
+                    if mismatch: 
+                        mismatch_cnt += 1
+                        logger.warning("WARNING: --- %s: text differs from M_DATA in %s: %s", 
+                                       item.get("code"), mismatch, item)
+
             # 1) Do exact match of a json element and M_DATA table 
             #    and get rows in M_DATA table
-            matched_rows = self.exact_match(item, data_table_hash)
+            if not matched_rows: 
+                mode, score = "exact", 1.0
+                matched_rows = self.exact_match(item, data_table_hash)
+
+            # 1-1) Missed: try the prefix, fuzzy and code match (programmed only if fuzzy_match)
+            suggested = None
+            if not matched_rows and matcher is not None: 
+                best = matcher.best(item)
+                if self.fuzzy_match: 
+                    mode, score, matched_rows = best
+                elif best[2]: 
+                    suggested = {"mode": best[0], "score": round(best[1], 3), 
+                                 "matched": [r.get("CODE") for r in best[2]]}
+
             if not matched_rows:
-                skipped_list.append([item, norm_desc])
+                mode, score = "dropped", 0.0
+                skipped_list.append([item, self.str_normalize(item.get("description"), self.prefix_len)])
                 skipped_json_cnt += 1
                 logger.error(f"ERROR: --- dropped {item}")
+            else: 
+                logger.info(f"--- Programmed {len(matched_rows)} row(s) by {mode} match for {item}")
+            match_list.append({
+                "code": item.get("code"), 
+                "description": item.get("description"), 
+                "mode": mode, 
+                "score": round(score, 3), 
+                "matched": [r.get("CODE") for r in matched_rows or ()]
+            })
+            if mismatch: 
+                match_list[-1]["mismatch"] = mismatch
+            if suggested: 
+                match_list[-1]["suggested"] = suggested
+            if not matched_rows: 
                 continue
 
             # 2) Add the matched rows into M_HISTORY table
-            logger.info(f"--- Programmed {len(matched_rows)} row(s) for {item}")
             for table_row in matched_rows:
                 added_row_cnt += 1
                 added_list.append({
@@ -184,125 +398,376 @@ class ProgramCtrl(metaclass = SingletonMeta):
         logger.info("")
         logger.info("───────────────────────────────────")
         logger.info("Completed programming from %s analysis results", len(analysis_data))
+        logger.info("    Matched : %s", dict(Counter(m["mode"] for m in match_list)))
         logger.info("    Dropped : %s", skipped_json_cnt)
+        logger.info("    Code/text mismatches: %s", mismatch_cnt)
         logger.info("    Programs: %s", added_row_cnt)
         logger.info("    Dropped details: %s", skipped_list)
         logger.info("───────────────────────────────────")
-        return added_row_cnt, added_list, skipped_json_cnt, skipped_list
+        return added_row_cnt, added_list, skipped_json_cnt, skipped_list, match_list
 
-    # Build a program for the analysis results
-    def build_1program(self, analysis_file_list, prog_name):
+    # The read-only inputs shared by every analysis file: M_DATA, its indexes and the matcher. 
+    # A snapshot made from another MDB, or before the MDB was changed, is not used: M_DATA is exported again. 
+    # close_match_tables() when done (the snapshot stays mmap-ed)
+    def load_match_tables(self): 
         # 1) Read table M_DATA
         logger.info(f"Loading data table...") #, flush=True)
-        data_table_path = self._get_json_path('data_table_path', None)
-        data_table = load_json(data_table_path)
-
-        # 2) Build a hash table for table M_DATA
-        logger.info("Building hash table for fast exact matching...") # , flush=True)
-        data_table_hash = self.build_hash(data_table, self.prefix_len)  # 24 characters only
-
-        program_data = []
-        for af in analysis_file_list:
-            # 3) Read analysis result data, that is new prescription to add into M_HISTORY
-            logger.info("Loading analysis result...") #, flush=True)
-            af_path = self._get_json_path(None, af)
-            af_data = load_json(af_path)
-
-            # 4) Build a program for the analysis result
-            result = self._build_1program(data_table_hash, af_data, prog_name)
-            program_data.extend(result[1])
-
-        # 5) Save the program
-        program_path = self._get_json_path("program_path", None)
-        subprocess.call("rm %s" % (program_path), shell = True)
-        time.sleep(0.3)
-
-        save_json(program_data, program_path)
+        data_table_path = self._get_data_table_path()
+        source = snapshot_source(self.sys_db_ctrl.mdb_path)
+        try: 
+            data_table = load_table(data_table_path, source if source["mtime"] is not None else None)
+        except SnapshotMismatch as e: 
+            logger.warning("%s: M_DATA is exported again", e)
+            with self.sys_db_ctrl.connection() as db: 
+                self.export_data_table(db)
+            data_table_path = self._get_data_table_path()
+            data_table = load_table(data_table_path)
+
+        # 2) Load (or build) the hash table for table M_DATA
+        logger.info("Loading hash table for fast exact matching...") # , flush=True)
+        data_table_hash = self.load_hash(data_table, data_table_path)  # 24 characters only
+
+        matcher = FuzzyMatcher(data_table) if self.fuzzy_match or self.fuzzy_report else None
+        code_index = CodeIndex(data_table) if self.code_first else None
+        return data_table_hash, matcher, code_index
+
+    @staticmethod
+    def close_match_tables(tables): 
+        table = tables[0].table
+        if hasattr(table, "close"):  # ColumnTable: unmap the snapshot
+            table.close()
+
+    # Load and match one analysis file. tables are only read
+    def _build_1file(self, tables, af_path, prog_name): 
+        af_data, load_sec = self._load_1file(af_path)
+        return self._match_1file(tables, af_path, af_data, prog_name, load_sec)
+
+    # 3) Read analysis result data, that is new prescription to add into M_HISTORY
+    # :return: (data, seconds)
+    def _load_1file(self, af_path): 
+        start = time.perf_counter()
+        logger.info("Loading analysis result %s...", af_path) #, flush=True)
+        af_data = load_json(af_path)
+        return af_data, time.perf_counter() - start
+
+    # 4) Build a program for the analysis result
+    # :return: (program rows, file report)
+    def _match_1file(self, tables, af_path, af_data, prog_name, load_sec = 0.0): 
+        loaded = time.perf_counter()
+        result = self._build_1program(tables[0], af_data, prog_name, tables[1], tables[2])
+        end = time.perf_counter()
+        report = {
+            "file": af_path, 
+            "items": len(af_data), 
+            "rows": result[0], 
+            "dropped": result[2], 
+            "modes": dict(Counter(m["mode"] for m in result[4])), 
+            "mismatches": sum(1 for m in result[4] if m.get("mismatch")), 
+            "load_sec": round(load_sec, 4), 
+            "match_sec": round(end - loaded, 4), 
+            "matches": result[4], 
+        }
+        return result[1], report
+
+    # Build the files of every job one by one on the tables loaded once. Results keep the input order.
+    # Matching is pure Python and holds the GIL: a thread pool was not faster (bench_sessions)
+    # :param jobs: [(prog_name, [analysis file path])]
+    # :return: [(program_data, [file report])] per job
+    def _build_jobs(self, jobs): 
+        tables = self.load_match_tables()
+        merged = []
+        try: 
+            for prog_name, files in jobs: 
+                program_data, file_reports = [], []
+                for af_path in files: 
+                    rows, report = self._build_1file(tables, af_path, prog_name)
+                    program_data.extend(rows)
+                    file_reports.append(report)
+                merged.append((program_data, file_reports))
+        finally: 
+            self.close_match_tables(tables)
+        return merged
+
+    def _save_program(self, program_data, file_reports, program_path, report_path): 
+        # 5) Save the program: the previous one stays until the new one is complete (atomic replace)
+        save_json(program_data, program_path, compact = True)  # read by insert_from_json only
         logger.info("%s programs are saved as %s", len(program_data), program_path)
+
+        # 6) Save how each analysis item was matched, so that drops are measurable
+        save_json(file_reports, report_path)
+        logger.info("Match report is saved as %s", report_path)
+        for r in file_reports: 
+            logger.info("    %s: %s items, %s rows, %s dropped, load %.3f s, match %.3f s", 
+                        os.path.basename(r["file"]), r["items"], r["rows"], r["dropped"], 
+                        r["load_sec"], r["match_sec"])
+
+    # Build a program for the analysis results
+    def build_1program(self, analysis_file_list, prog_name):
+        files = [self._get_json_path(None, af) for af in analysis_file_list]
+        (program_data, file_reports), = self._build_jobs([(prog_name, files)])
+        self._save_program(program_data, file_reports, 
+                           self._get_json_path("program_path", None), 
+                           self._get_json_path("program_report_path", None))
         return program_data
 
+    # The analysis files of a client session folder (client/<name>/<timestamp>/json/)
+    def session_files(self, session_json_dir): 
+        skip = (self.cfg.program_file, os.path.basename(self.cfg.run_drv["program_report_path"]))
+        names = sorted(n for n in os.listdir(session_json_dir) 
+                         if n.endswith(".json") and n not in skip)
+        first = [n for n in (self.cfg.must_have_file, self.cfg.good_to_have_file, 
+                             self.cfg.virus_file) if n in names]
+        return [os.path.join(session_json_dir, n) for n in first + [n for n in names if n not in first]]
+
+    # DESP of the program of a session: prog_name, or "<client name>_<timestamp>"
+    @staticmethod
+    def session_name(session_json_dir, prog_name = None): 
+        if prog_name: 
+            return prog_name
+        session_dir = os.path.dirname(os.path.abspath(session_json_dir))
+        return "%s_%s" % (os.path.basename(os.path.dirname(session_dir)), os.path.basename(session_dir))
+
+    # Where the program of a session is saved: (program.json, program_report.json) in the session json folder
+    def session_outputs(self, session_json_dir): 
+        return (os.path.join(session_json_dir, self.cfg.program_file), 
+                os.path.join(session_json_dir, os.path.basename(self.cfg.run_drv["program_report_path"])))
+
+    # All client session json folders: client/<name>/<timestamp>/json/
+    def client_sessions(self, client_dir = None): 
+        client_dir = client_dir or self.cfg.ext_drv["client_dir"]
+        sessions = []
+        for name in sorted(os.listdir(client_dir)): 
+            client_path = os.path.join(client_dir, name)
+            if not os.path.isdir(client_path): 
+                continue
+            for ts in sorted(os.listdir(client_path)): 
+                json_dir = os.path.join(client_path, ts, "json")
+                if os.path.isdir(json_dir): 
+                    sessions.append(json_dir)
+        return sessions
+
+    # Build a program for each client session in one run, against one loaded M_DATA.
+    # program.json and program_report.json are saved in each session json folder.
+    # :param prog_name: DESP of the programs. None = "<client name>_<timestamp>"
+    # :return: {session json folder: the number of program rows}
+    def build_programs(self, session_json_dirs, prog_name = None): 
+        jobs = [(self.session_name(d, prog_name), self.session_files(d)) for d in session_json_dirs]
+
+        counts = {}
+        for d, (program_data, file_reports) in zip(session_json_dirs, self._build_jobs(jobs)): 
+            self._save_program(program_data, file_reports, *self.session_outputs(d))
+            counts[d] = len(program_data)
+        logger.info("Programs are built for %s sessions: %s rows", len(counts), sum(counts.values()))
+        return counts
+
     # Delete all rows of a table
     def delete_all_rows_in_table(self, db, table_name): 
         sql = "DELETE FROM %s" % (table_name)
+        perf.com()
         try:
             db.Execute(sql) # "DELETE FROM M_HISTORY")
         except Exception as e:
             logger.error("%s: ERROR: Failed in empty table %s: %s", e, table_name, sql)
         else: 
             logger.info("Table %s gets empty", table_name)
+        finally: 
+            self.sql.invalidate(db)
     
+    # Build "INSERT INTO ... VALUES (...)" for a row (DbCtrl.insert_sql)
+    insert_sql = staticmethod(DbCtrl.insert_sql)
+
     # Insert a dict data into a table
-    def insert(self, db, table_name, table_ddl, json_data):
+    @perf.timed("ProgramCtrl.insert", rows="json_data")
+    def insert(self, db, table_name, table_ddl, json_data, prepared = True):
         """
         Insert rows from json_data into DAO table without using transactions.
         Compatible with all Jet/DAO modes, including cases where BeginTrans() fails.
+        prepared: one parameterized QueryDef per column set, re-executed with each row's values
+                  (PreparedInsert). False: an INSERT statement built as a string for each row
         """
+        self.sql.invalidate(db)
+        if prepared:
+            with PreparedInsert(db, table_name, table_ddl) as ins:
+                for row in json_data:
+                    ins.execute(row)
+            return
+
         cnt = 0
+        plans = PlanCache(table_ddl)
         for row in json_data:
-            cols = []
-            vals = []
-
-            for k, v in row.items():
-                cols.append(k)
-                v = DbCtrl.restore_value(v, table_ddl[k])
-                vals.append(v)
-
-            col_list = ", ".join(cols)
-
-            # Build VALUES part
-            val_list = []
-            for v in vals:
-                if v is None:
-                    val_list.append("NULL")
-                elif isinstance(v, (int, float)):
-                    val_list.append(str(v))
-                elif isinstance(v, (datetime.datetime, datetime.date)):
-                    val_list.append("#%04d-%02d-%02d 00:00:00#" % (v.year, v.month, v.day))
-                else: 
-                    s = str(v).replace("'", "''")
-                    val_list.append("'" + s + "'")
-
-            val_expr = ", ".join(val_list)
-
-            sql = "INSERT INTO %s (%s) VALUES (%s)" % (
-                table_name, col_list, val_expr
-            )
+            sql = DbCtrl.insert_sql(table_name, table_ddl, row, plans.get(row))
             if cnt < 3: 
                 logger.debug("--- %s", sql)
                 cnt += 1
             # Execute immediately (auto-commit mode)
             db.Execute(sql)
+            perf.com()
+
+    # Insert a dict data into a table in batches of AddNew/Update (DbCtrl.bulk_insert)
+    def bulk_insert(self, db, table_name, table_ddl, json_data, batch_size = 500):
+        self.sql.invalidate(db)
+        return DbCtrl.bulk_insert(db, table_name, table_ddl, json_data, batch_size, self.db_backend)
 
     # Insert multiple program files into the program table of the db
-    def insert_from_json(self, db, json_path_list):
+    def insert_from_json(self, db, json_path_list, bulk = True, batch_size = 500):
+        reports = []
         for path in json_path_list: 
             # 1. Load a json file 
             path = self._get_json_path(None, path)
             data = load_json(path)
 
             # 2. Insert the json dagta
-            self.insert(db, self.program_table, self.program_table_ddl, data)
+            if bulk: 
+                reports.append(self.bulk_insert(db, self.program_table, self.program_table_ddl, 
+                                                data, batch_size))
+            else: 
+                self.insert(db, self.program_table, self.program_table_ddl, data)
             logger.info("%s rows are inserted into %s from %s", \
                 len(data), self.program_table, path)
+        return reports
 
     # Export multiple programs from the program table of the db
+    # :return: (the number of exported rows, json path). The rows are streamed into the file, not
+    #          returned: callers that need them read the file (load_json). Until the streaming export
+    #          this returned (rows, json path)
     def export_programs(self, db, program_name_list, json_path): 
-        # 1. Find the json path to export
+        # 1. Find the json path to export. An existing file is replaced when the export is complete
         json_path = self._get_json_path(None, json_path)
-        if os.path.exists(json_path): 
-            os.remove(json_path)
 
         # 2. Read and save the program list table (M_HISTORY)
         set_phrase = ",".join("'{}'".format(s.replace("'", "''")) for s in program_name_list)
         sql = r"SELECT * FROM M_HISTORY WHERE DESP IN ({})".format(set_phrase)
         logger.debug("--- SQL: %s", sql)
-        data = self.sql.query(db, sql)
-
-        # 3. Save as a json file 
-        save_json(data, json_path)
-        logger.info("%s rows are exported as %s", len(data), json_path)
-        return data, json_path
 
+        # 3. Save as a json file: stream rows from the recordset into the file 
+        cnt = save_json_stream(self.sql.iter_query(db, sql), json_path)
+        logger.info("%s rows are exported as %s", cnt, json_path)
+        return cnt, json_path
+
+    # (HTIME, CODE) key set of each program (DESP) in the program table: one key-only query
+    def program_keys(self, db): 
+        keys = {}
+        sql = "SELECT DESP, HTIME, CODE FROM %s" % self.program_table
+        for r in self.sql.iter_query(db, sql): 
+            keys.setdefault(r["DESP"], set()).add((r["HTIME"], r["CODE"]))
+        return keys
+
+    @staticmethod  # "기억_2" → "기억"
+    def program_family(desp): 
+        return re.sub(r"_\d+$", "", desp)
+
+    # What to move from src to dst, from the key sets only
+    # :return: [{"desp", "target", "action", "keys"}], action is 
+    #     "skip"  : dst has all the rows under the name, or the same rows under a renamed one 
+    #               of the family ("기억" and "기억_1"): a program renamed by an earlier sync
+    #     "copy"  : dst has no such program 
+    #     "resume": dst has the program partly (a sync stopped in the middle): the missing rows
+    #     "rename": dst has another program with the name: copy as "<desp>_1", "<desp>_2", ...
+    # :param taken: more names not to rename to (the targets of the other direction)
+    @staticmethod
+    def plan_sync(src_keys, dst_keys, taken = ()): 
+        family = {}
+        for desp, keys in dst_keys.items(): 
+            family.setdefault(ProgramCtrl.program_family(desp), []).append(keys)
+        taken = set(src_keys) | set(dst_keys) | set(taken)
+
+        plan = []
+        for desp in sorted(src_keys): 
+            keys = src_keys[desp]
+            dst = dst_keys.get(desp)
+            if dst is not None and keys <= dst: 
+                plan.append({"desp": desp, "target": desp, "action": "skip", "keys": set()})
+            elif not (dst is not None and dst <= keys) and \
+                    any(keys == k for k in family.get(ProgramCtrl.program_family(desp), ())): 
+                plan.append({"desp": desp, "target": desp, "action": "skip", "keys": set()})
+            elif dst is None: 
+                plan.append({"desp": desp, "target": desp, "action": "copy", "keys": keys})
+            elif dst <= keys: 
+                plan.append({"desp": desp, "target": desp, "action": "resume", "keys": keys - dst})
+            else: 
+                n = 1
+                while "%s_%d" % (desp, n) in taken: 
+                    n += 1
+                target = "%s_%d" % (desp, n)
+                taken.add(target)
+                plan.append({"desp": desp, "target": target, "action": "rename", "keys": keys})
+        return plan
+
+    @staticmethod  # The planned rows, renamed to the target DESP
+    def planned_rows(rows, plan): 
+        by_desp = {a["desp"]: a for a in plan if a["keys"]}
+        for r in rows: 
+            a = by_desp.get(r["DESP"])
+            if a is not None and (r["HTIME"], r["CODE"]) in a["keys"]: 
+                r["DESP"] = a["target"]
+                yield r
+
+    # Move the planned rows from src to dst in bulk
+    def _apply_sync(self, src_db, dst_db, plan, batch_size): 
+        moves = [a for a in plan if a["keys"]]
+        if not moves: 
+            return None
+        set_phrase = ",".join("'{}'".format(a["desp"].replace("'", "''")) for a in moves)
+        sql = "SELECT * FROM %s WHERE DESP IN (%s)" % (self.program_table, set_phrase)
+        rows = list(self.planned_rows(self.sql.iter_query(src_db, sql), moves))
+        return self.bulk_insert(dst_db, self.program_table, self.program_table_ddl, rows, batch_size)
+
+    # Import exported programs (export_programs) into the db, with the same plan as sync_programs: 
+    # rows already in the db are skipped and a colliding DESP is renamed "<DESP>_1"
+    # :return: (plan, bulk_insert report or None)
+    def import_programs(self, db, json_path, batch_size = 500): 
+        rows = load_json(self._get_json_path(None, json_path))
+        keys = {}
+        for r in rows: 
+            keys.setdefault(r["DESP"], set()).add((r["HTIME"], r["CODE"]))
+        plan = self.plan_sync(keys, self.program_keys(db))
+        rows = list(self.planned_rows(rows, plan))
+        report = self.bulk_insert(db, self.program_table, self.program_table_ddl, rows, batch_size) \
+                 if rows else None
+        return plan, report
+
+    # Sync the programs (M_HISTORY) between two MDBs: only missing rows are moved, in bulk.
+    # A program whose DESP is used by another program in the target is copied as "<DESP>_1".
+    # :param both_ways: also move the programs of db_b missing in db_a
+    # :param dry_run: only plan
+    # :return: {"plan": {"a->b": [...], "b->a": [...]}, "inserted": {...}, "failed": {...}, 
+    #           "timings": {"keys", "plan", "move"}}
+    def sync_programs(self, db_a, db_b, both_ways = True, dry_run = False, batch_size = 500): 
+        timings = {}
+        start = time.perf_counter()
+        keys_a, keys_b = self.program_keys(db_a), self.program_keys(db_b)
+        timings["keys"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        directions = [("a->b", db_a, db_b, self.plan_sync(keys_a, keys_b))]
+        if both_ways: 
+            # A name renamed to in one db does not mean another program in the other db
+            renamed = [a["target"] for a in directions[0][3]]
+            directions.append(("b->a", db_b, db_a, self.plan_sync(keys_b, keys_a, renamed)))
+        timings["plan"] = time.perf_counter() - start
+
+        result = {"plan": {}, "inserted": {}, "failed": {}, "dry_run": dry_run, "timings": timings}
+        for name, _, _, plan in directions: 
+            result["plan"][name] = [{"desp": a["desp"], "target": a["target"], 
+                                     "action": a["action"], "rows": len(a["keys"])} for a in plan]
+            for a in result["plan"][name]: 
+                if a["action"] != "skip": 
+                    logger.info("    %s %-6s %s → %s: %s rows", name, a["action"], 
+                                a["desp"], a["target"], a["rows"])
+
+        start = time.perf_counter()
+        if not dry_run: 
+            for name, src, dst, plan in directions: 
+                report = self._apply_sync(src, dst, plan, batch_size)
+                result["inserted"][name] = report["inserted"] if report else 0
+                result["failed"][name] = report["failed"] if report else []
+        timings["move"] = time.perf_counter() - start
+
+        logger.info("Program sync%s: %s, keys %.3f s, plan %.3f s, move %.3f s", 
+                    " (dry run)" if dry_run else "", 
+                    {n: sum(a["rows"] for a in p) for n, p in result["plan"].items()}, 
+                    timings["keys"], timings["plan"], timings["move"])
+        return result
 
 
 if __name__ == "__main__": 
@@ -338,18 +803,14 @@ if __name__ == "__main__":
     # 4. Export the program table (M_HISTORY) to the external driver
     program_list = ["기억"]
     db = p.sys_db_ctrl.open_db()
-    json_data, path = p.export_programs(db, program_list, "exported_programs.json")
+    cnt, path = p.export_programs(db, program_list, "exported_programs.json")
     db.Close()
     logger.info("%s directory: %s", c.run_drv["json_dir"], os.listdir(c.run_drv["json_dir"]))
 
-    # --- DO delete some program from the system mdb --- 
-    input("Enter when ready: ")
-
-    # 5. Import the programs that are not in the system mdb
-    json_list = ["exported_programs.json"]
-    db = p.ext_db_ctrl.open_db()
-    # p.insert(db, p.program_table, p.program_table_ddl, json_data)
-    p.insert_from_json(db, json_list)
-    db.Close()
-
-
+    # 5. Sync the programs between the system and the external mdb: 
+    #    plan first, then move only the missing rows
+    sys_db, ext_db = p.sys_db_ctrl.open_db(), p.ext_db_ctrl.open_db()
+    p.sync_programs(sys_db, ext_db, dry_run = True)
+    p.sync_programs(sys_db, ext_db)
+    sys_db.Close()
+    ext_db.Close()
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+# - Column 단위 binary snapshot (data_table.json 대신 build_1program 이 읽는 파일)
+#
+#   MAGIC(8) | header 길이(uint32 LE) | header(JSON) | column block ...
+#
+#   header: table, rows, source(MDB 의 path/mtime/size), ddl, byteorder,
+#           columns: [{name, kind, offset, length, nulls}], strings: {offset, length}
+#   kind:
+#     "str"   : int32 index → 모든 column 이 같이 쓰는 string table (-1 = None)
+#     "float" : float64 (None 은 nulls mask)
+#     "int"   : int64   (None 은 nulls mask)
+#     "json"  : 섞인 타입. JSON list
+#   string table: "\0" 로 이은 UTF-8 한 덩어리. split 한 번으로 읽는다.
+#                 쓸 때 같은 값은 한 번만 넣는다 (최근 값 4096 개까지 기억한다)
+#
+# 읽을 때는 mmap 한 파일에서 array 로 바로 옮기므로 JSON parse 가 (거의) 없다. column 은 쓸 때 decode 하고,
+# row 하나는 mmap 에서 값만 읽는다 (ColumnTable). source 를 주면 지금의 MDB 에서 만든 것인지 확인한다.
+import os, sys, json, mmap, shutil, tempfile
+from array import array
+
+from lib.log import logger
+from utils.json import load_json
+from utils.atomic import AtomicFile
+
+MAGIC = b"MDBSNAP1"
+ALIGN = 8
+
+
+def snapshot_source(mdb_path):
+    """snapshot 을 만든 MDB 파일의 path, mtime, size"""
+    if not mdb_path or not os.path.isfile(mdb_path):
+        return {"path": mdb_path, "mtime": None, "size": None}
+    st = os.stat(mdb_path)
+    return {"path": mdb_path, "mtime": st.st_mtime, "size": st.st_size}
+
+def same_source(a, b):
+    """snapshot_source 두 개가 같은 MDB 파일, 같은 mtime, size 이다"""
+    if not a or not b or a.get("mtime") is None:
+        return False
+    path = lambda s: os.path.normcase(os.path.abspath(s["path"])) if s.get("path") else None
+    return path(a) == path(b) and all(a.get(k) == b.get(k) for k in ("mtime", "size"))
+
+def _kind(values):
+    """values 의 kind. None 뿐이면 None"""
+    kinds = set()
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, str):
+            if "\0" in v: # string table 의 구분자
+                return "json"
+            kinds.add("str")
+        elif isinstance(v, float):
+            kinds.add("float")
+        elif isinstance(v, int) and not isinstance(v, bool):
+            kinds.add("int")
+        else:
+            return "json"
+        if len(kinds) > 1:
+            return "json"
+    return kinds.pop() if kinds else None
+
+def _merge_kind(a, b):
+    if a is None or a == b:
+        return b
+    return a if b is None else "json"
+
+def _column_kind(values):
+    return _kind(values) or "str"
+
+
+class _StringTable:
+    """쓰는 중인 string table. 임시 파일에 바로 쓰고, 같은 값을 찾는 dict 는 max_ids 개까지만 둔다"""
+    def __init__(self, max_ids = 1 << 12):
+        self.f = tempfile.TemporaryFile()
+        self.max_ids = max_ids
+        self.count = 0
+        self._ids = {}
+
+    def id(self, v):
+        i = self._ids.get(v)
+        if i is None:
+            if len(self._ids) >= self.max_ids:
+                self._ids.clear()
+            if self.count:
+                self.f.write(b"\0")
+            self.f.write(v.encode("utf-8"))
+            i = self._ids[v] = self.count
+            self.count += 1
+        return i
+
+
+class SnapshotWriter:
+    """
+    row(dict) 를 받아서 column 으로 모은 뒤 close() 에서 snapshot 파일을 쓴다.
+        with SnapshotWriter(path, "M_DATA", ddl, source) as w:
+            w.write_rows(rows)
+    column 과 string table 은 chunk_rows 개마다 임시 파일로 내보낸다: 메모리에는 chunk 하나만 둔다
+    """
+    def __init__(self, path, table_name, ddl = None, source = None, chunk_rows = 10000):
+        self.path = path
+        self.table_name = table_name
+        self.ddl = ddl
+        self.source = source or {}
+        self.chunk_rows = chunk_rows
+        self.names = None
+        self.columns = None
+        self.kinds = None
+        self.count = 0
+        self._spills = None  # column 별 임시 파일: chunk 마다 JSON list 한 줄
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+        return False
+
+    def write(self, row):
+        if self.names is None:
+            self.names = list(row.keys())
+            self.columns = [[] for _ in self.names]
+            self.kinds = [None] * len(self.names)
+            self._spills = [tempfile.TemporaryFile() for _ in self.names]
+        for col, name in zip(self.columns, self.names):
+            col.append(row.get(name))
+        self.count += 1
+        if len(self.columns[0]) >= self.chunk_rows:
+            self._spill()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def _spill(self):
+        for i, (values, f) in enumerate(zip(self.columns, self._spills)):
+            if values:
+                self.kinds[i] = _merge_kind(self.kinds[i], _kind(values))
+                f.write(json.dumps(values, ensure_ascii=False).encode("utf-8"))
+                f.write(b"\n")
+            values.clear()
+
+    def _chunks(self, i):
+        f = self._spills[i]
+        f.seek(0)
+        for line in f:
+            yield json.loads(line)
+
+    def _discard(self):
+        for f in self._spills or ():
+            f.close()
+        self._spills = None
+
+    def _encode(self, i, kind, strings, out):
+        """column i 의 chunk 들을 kind 로 out 에 쓴다. :return: nulls (row 번호) 또는 None"""
+        nulls, base = [], 0
+        if kind == "json":
+            out.write(b"[")
+        for values in self._chunks(i):
+            if kind == "str":
+                string_id = strings.id
+                out.write(array("i", [-1 if v is None else string_id(v) for v in values]).tobytes())
+            elif kind in ("float", "int"):
+                if None in values:
+                    nulls.extend(base + j for j, v in enumerate(values) if v is None)
+                    values = [0 if v is None else v for v in values]
+                out.write(array("d" if kind == "float" else "q", values).tobytes())
+            else:
+                if base:
+                    out.write(b", ")
+                out.write(json.dumps(values, ensure_ascii=False)[1:-1].encode("utf-8"))
+            base += len(values)
+        if kind == "json":
+            out.write(b"]")
+        return nulls or None
+
+    def close(self):
+        names = self.names or []
+        if names:
+            self._spill()
+        strings = _StringTable()
+        blocks, meta = [], []
+        try:
+            for i, name in enumerate(names):
+                kind = self.kinds[i] or "str"
+                out = tempfile.TemporaryFile()
+                blocks.append(out)
+                nulls = self._encode(i, kind, strings, out)
+                meta.append({"name": name, "kind": kind, "length": out.tell(), "nulls": nulls})
+                self._spills[i].close()
+            string_length = strings.f.tell()
+
+            # offset 은 header 다음부터 센다
+            offset = 0
+            for m in meta + [None]:
+                offset += (-offset) % ALIGN
+                if m is not None:
+                    m["offset"] = offset
+                    offset += m["length"]
+                else:
+                    string_offset = offset
+
+            header = {
+                "table": self.table_name,
+                "rows": self.count,
+                "source": self.source,
+                "ddl": self.ddl,
+                "byteorder": sys.byteorder,
+                "columns": meta,
+                "strings": {"offset": string_offset, "length": string_length, "count": strings.count},
+            }
+            head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            head += b" " * ((-(len(MAGIC) + 4 + len(head))) % ALIGN)
+
+            with AtomicFile(self.path) as f:
+                f.write(MAGIC)
+                f.write(len(head).to_bytes(4, "little"))
+                f.write(head)
+                pos = 0
+                for block in blocks + [strings.f]:
+                    f.write(b"\0" * ((-pos) % ALIGN))
+                    pos += (-pos) % ALIGN
+                    length = block.tell()
+                    block.seek(0)
+                    shutil.copyfileobj(block, f)
+                    pos += length
+        finally:
+            for block in blocks + [strings.f]:
+                block.close()
+            self._discard()
+        logger.info("%s rows of %s are saved as snapshot %s", self.count, self.table_name, self.path)
+
+
+class SnapshotMismatch(ValueError):
+    """snapshot 이 지금의 MDB 에서 만든 것이 아니다 (source 의 path, mtime, size 가 다르다)"""
+
+
+class ColumnTable:
+    """
+    snapshot 을 읽은 결과. list of dict 처럼 쓸 수 있다 (len, index, iterate).
+    파일은 mmap 한 채로 두고 column 은 처음 쓸 때 decode 한다: column(name) 은 column 전체를 list 로,
+    table[i] 는 row 하나의 값만 읽는다. 다 쓰면 close() (Windows 에서는 mmap 된 파일을 바꿀 수 없다)
+    """
+    def __init__(self, header, mm, base):
+        self.header = header
+        self.names = [c["name"] for c in header["columns"]]
+        self._meta = {c["name"]: c for c in header["columns"]}
+        self._mm = mm
+        self._base = base
+        self._swap = header["byteorder"] != sys.byteorder
+        self._strings = None
+        self._columns = {}  # name → list (decode 한 column)
+        self._views = {}    # name → (memoryview, nulls set): 값 하나씩 읽는다
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def close(self):
+        for view, _ in self._views.values():
+            view.release()
+        self._views.clear()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _raw(self, c):
+        start = self._base + c["offset"]
+        return self._mm[start:start + c["length"]]
+
+    def strings(self):
+        if self._strings is None:
+            s = self.header["strings"]
+            data = self._mm[self._base + s["offset"]:self._base + s["offset"] + s["length"]].decode("utf-8")
+            self._strings = data.split("\0") if s["count"] else []
+        return self._strings
+
+    def column(self, name):
+        values = self._columns.get(name)
+        if values is None:
+            values = self._columns[name] = self._decode(self._meta[name])
+        return values
+
+    def _decode(self, c):
+        kind, raw = c["kind"], self._raw(c)
+        if kind == "json":
+            return json.loads(raw.decode("utf-8"))
+        a = array({"str": "i", "float": "d", "int": "q"}[kind])
+        a.frombytes(raw)
+        if self._swap:
+            a.byteswap()
+        if kind == "str":
+            strings = self.strings()
+            return [None if i < 0 else strings[i] for i in a]
+        values = a.tolist()
+        for i in c["nulls"] or ():
+            values[i] = None
+        return values
+
+    def _value(self, name, i):
+        values = self._columns.get(name)
+        if values is not None:
+            return values[i]
+        view = self._views.get(name)
+        if view is None:
+            c = self._meta[name]
+            if c["kind"] == "json" or self._swap:
+                return self.column(name)[i]
+            start = self._base + c["offset"]
+            view = self._views[name] = (memoryview(self._mm)[start:start + c["length"]].cast(
+                                            {"str": "i", "float": "d", "int": "q"}[c["kind"]]),
+                                        set(c["nulls"] or ()) if c["kind"] != "str" else None)
+        values, nulls = view
+        v = values[i]
+        if nulls is None:
+            return None if v < 0 else self.strings()[v]
+        return None if (i if i >= 0 else i + len(self)) in nulls else v
+
+    def __getitem__(self, i):
+        return {name: self._value(name, i) for name in self.names}
+
+    def __iter__(self):
+        names = self.names
+        for values in zip(*(self.column(n) for n in names)):
+            yield dict(zip(names, values))
+
+    def to_list(self):
+        return list(self)
+
+
+def is_snapshot(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _read_header(mm, path):
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a snapshot file: %s" % path)
+    head_len = int.from_bytes(mm[len(MAGIC):len(MAGIC) + 4], "little")
+    base = len(MAGIC) + 4 + head_len
+    return json.loads(mm[len(MAGIC) + 4:base].decode("utf-8")), base
+
+def load_blocks(path):
+    """
+    snapshot 파일의 header, string table, column 별 (kind, raw bytes, nulls).
+    raw 는 파일 byte 그대로 (byteorder 가 다르면 읽는 쪽이 바꾼다). utils/column_store.py 도 쓴다
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header, base = _read_header(mm, path)
+
+            s = header["strings"]
+            strings = mm[base + s["offset"]:base + s["offset"] + s["length"]].decode("utf-8")
+            strings = strings.split("\0") if s["count"] else []
+
+            blocks = {c["name"]: (c["kind"], mm[base + c["offset"]:base + c["offset"] + c["length"]],
+                                  c["nulls"]) for c in header["columns"]}
+        finally:
+            mm.close()
+    return header, strings, blocks
+
+def load_snapshot(path, source = None):
+    """
+    :param source: snapshot_source(지금의 MDB). 주면 snapshot 의 source 와 같아야 한다 (아니면 SnapshotMismatch)
+    :return: ColumnTable (mmap 한 채로)
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        header, base = _read_header(mm, path)
+        if source is not None and not same_source(header.get("source"), source):
+            raise SnapshotMismatch("%s is made from %s, not from %s" % (path, header.get("source"), source))
+    except Exception:
+        mm.close()
+        raise
+    return ColumnTable(header, mm, base)
+
+def load_table(path, source = None):
+    """snapshot 이면 load_snapshot (source 는 load_snapshot 참고), 아니면 load_json. 둘 다 row(dict) 의 sequence"""
+    if is_snapshot(path):
+        return load_snapshot(path, source)
+    return load_json(path)
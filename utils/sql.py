@@ -1,11 +1,147 @@
-import datetime
+import os, re, sys, datetime, threading
+from collections import OrderedDict
 from decimal import Decimal
 
 from lib.singleton import SingletonMeta
 from lib.log import logger
+from lib import perf
 from utils.db_ctrl import DbCtrl
 
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_SPACES = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    """문자열 literal 밖의 공백을 하나로, 끝의 ; 는 뺀다. cache key 용"""
+    parts = _STRING_LITERAL.split(sql.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _SPACES.sub(" ", parts[i])
+    return "".join(parts)
+
+def result_size(rows, sample = 100):
+    """rows(list of dict) 의 대략적인 byte 수: 앞 sample 개 row 의 평균 x row 수"""
+    if not rows:
+        return sys.getsizeof(rows)
+    head = rows[:sample]
+    per_row = sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values()) for r in head) / len(head)
+    return int(sys.getsizeof(rows) + per_row * len(rows))
+
+
+class QueryCache:
+    """
+    SELECT 결과 cache. key: (MDB path, 정규화한 SQL), 값과 같이 MDB 의 version 을 저장한다.
+      version: (파일의 inode, mtime, size, 이 process 에서 바꾼 횟수)
+    version 이 다르면 (다른 process 가 바꿨거나, execute()/invalidate() 뒤) miss 로 본다.
+    max_bytes 를 넘으면 가장 오래 쓰지 않은 결과부터 버린다 (LRU).
+    결과는 복사해서 준다: 받은 쪽이 row 를 고쳐도 cache 는 그대로다.
+    """
+    def __init__(self, max_bytes = 64 << 20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # (path, sql) → (version, rows, size)
+        self._changes = {}             # path → execute()/invalidate() 횟수
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def db_path(db):
+        name = db.Name
+        return name if name.startswith(":memory:") else os.path.abspath(name)
+
+    def version(self, path):
+        try:
+            st = os.stat(path)
+            stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except (OSError, ValueError):
+            stat = None  # ":memory:..."
+        return (stat, self._changes.get(path, 0))
+
+    def get(self, db, sql):
+        """cache 된 결과의 복사본. 없으면 None"""
+        path = self.db_path(db)
+        key = (path, normalize_sql(sql))
+        version = self.version(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if entry[0] != version:
+                self._drop(key)
+                self.counters["stale"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            rows = entry[1]
+        return [dict(r) for r in rows]
+
+    def put(self, db, sql, rows, copy = True):
+        """rows 를 저장한다 (copy: 복사해서). max_bytes 보다 큰 결과는 저장하지 않는다"""
+        path = self.db_path(db)
+        key = (path, normalize_sql(sql))
+        version = self.version(path)
+        size = result_size(rows)
+        if size > self.max_bytes:
+            return False
+        if copy:
+            rows = [dict(r) for r in rows]
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (version, rows, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+        return True
+
+    def _drop(self, key):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def invalidate(self, db = None):
+        """db(None 이면 모든 MDB) 의 결과를 버린다. 다음 version 도 바뀐다"""
+        with self._lock:
+            paths = {k[0] for k in self._entries} if db is None else {self.db_path(db)}
+            for path in paths:
+                self._changes[path] = self._changes.get(path, 0) + 1
+            for key in [k for k in self._entries if k[0] in paths]:
+                self._drop(key)
+            self.counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries = len(self._entries), bytes = self.bytes,
+                        max_bytes = self.max_bytes,
+                        hit_rate = self.counters["hits"] / lookups if lookups else 0.0)
+
+
 class __SQL(metaclass=SingletonMeta): 
+    # SELECT 결과 cache (QueryCache). enable_cache() 로 켠다. None 이면 매번 DB 에서 읽는다
+    cache = None
+
+    def enable_cache(self, max_bytes = 64 << 20):
+        if self.cache is None:
+            self.cache = QueryCache(max_bytes)
+        else:
+            self.cache.max_bytes = max_bytes
+        return self.cache
+
+    def disable_cache(self):
+        self.cache = None
+
+    def invalidate(self, db = None):
+        """Sql.execute() 를 거치지 않고 db 를 바꾼 뒤에 (bulk_insert, db.Execute, ...)"""
+        if self.cache is not None:
+            self.cache.invalidate(db)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
 
     # 값 변환 (MDB → JSON)
     def normalize_value(self, v):
@@ -60,16 +196,86 @@ class __SQL(metaclass=SingletonMeta):
         UPDATE, INSERT, DELETE 등 결과를 반환하지 않는 SQL 실행.
         """
         logger.debug("SQL: %s", sql)
+        perf.com()
         try:
             db.Execute(sql)
         except Exception as e:
             raise RuntimeError(f"SQL Error: {sql} → {e}")
+        finally:
+            self.invalidate(db)
+
+    # SELECT 실행 → row(dict) 를 하나씩 (chunks=True 이면 row list 를) 넘긴다
+    def iter_query(self, db, sql, chunk_size = 1000, chunks = False, cache = False):
+        """
+        SELECT 결과를 GetRows 로 chunk_size 개씩 읽어서 흘려 보낸다.
+        결과 전체를 list 로 모으지 않으므로 메모리 사용량이 결과 크기와 무관하다.
+        cache: True 이고 enable_cache() 했으면 cache 의 결과를 넘긴다. 없으면 읽으면서 모아서 넣는다.
+               모은 것이 max_bytes 의 반을 넘으면 그만 모은다 (큰 결과는 cache 하지 않는다).
+               모으는 동안은 메모리가 결과 크기만큼 늘어난다: 되풀이하는 작은 조회에만 쓴다.
+               export, sync 처럼 table 을 흘려 쓰는 곳은 기본값 (False) 그대로
+        """
+        if not cache or self.cache is None:
+            yield from self._iter_query(db, sql, chunk_size, chunks)
+            return
+
+        rows = self.cache.get(db, sql)
+        if rows is not None:
+            for i in range(0, len(rows), chunk_size):
+                if chunks:
+                    yield rows[i:i + chunk_size]
+                else:
+                    yield from rows[i:i + chunk_size]
+            return
+
+        collected, limit = [], self.cache.max_bytes // 2
+        for chunk in self._iter_query(db, sql, chunk_size, chunks = True):
+            if collected is not None:
+                collected.extend(map(dict, chunk))  # 받는 쪽이 row 를 고칠 수 있다
+                if result_size(collected) > limit:
+                    collected = None
+            if chunks:
+                yield chunk
+            else:
+                yield from chunk
+        if collected is not None:
+            self.cache.put(db, sql, collected, copy = False)
+
+    def _iter_query(self, db, sql, chunk_size = 1000, chunks = False):
+        try:
+            rs = db.OpenRecordset(sql)
+        except Exception as e:
+            raise RuntimeError("ERROR: %s: SQL = %s", e, sql)
+
+        perf.com(2)  # OpenRecordset, Close
+        try:
+            for chunk in DbCtrl.iter_recordset_chunks(rs, chunk_size):
+                if chunks: 
+                    yield chunk
+                else: 
+                    yield from chunk
+        finally:
+            rs.Close()
 
     # SELECT 실행 → 리스트(dict) 반환
-    def query(self, db, sql):
+    @perf.timed("Sql.query", rows=len)
+    def query(self, db, sql, fast = True, chunk_size = 1000, cache = True):
         """
         SELECT 쿼리를 실행하고 결과를 list[dict] 형태로 반환.
+        fast: GetRows 로 chunk_size 개씩 읽고 column 단위로 변환한다 (iter_query)
+        cache: enable_cache() 했으면 같은 SQL 의 결과를 (MDB 가 그대로이면) 다시 쓴다. False 면 쓰지 않는다
         """
+        if cache and self.cache is not None: 
+            rows = self.cache.get(db, sql)
+            if rows is None: 
+                rows = self._query(db, sql, fast, chunk_size)
+                self.cache.put(db, sql, rows)
+            return rows
+        return self._query(db, sql, fast, chunk_size)
+
+    def _query(self, db, sql, fast, chunk_size):
+        if fast: 
+            return list(self._iter_query(db, sql, chunk_size))
+
         # logger.debug("SQL: %s", sql)
         try:
             rs = db.OpenRecordset(sql)
@@ -82,15 +288,17 @@ class __SQL(metaclass=SingletonMeta):
             return rows
 
         fields = [f.Name for f in rs.Fields]
+        plan = DbCtrl.read_plan({f.Name: f.Type for f in rs.Fields}, fields)
 
         rs.MoveFirst()
         while not rs.EOF:
             # row = {f: rs.Fields(f).Value for f in fields}
-            row = {f: DbCtrl.normalize_value(rs.Fields(f).Value) for f in fields}
-            rows.append(row)
+            values = [rs.Fields(f).Value for f in fields]
+            rows.append(dict(zip(fields, DbCtrl.apply_plan(plan, values))))
             rs.MoveNext()
 
         rs.Close()
+        perf.com(3 + 2 * len(fields) + len(rows) * (len(fields) + 2))
         return rows
 
     # 단일 값 SELECT (예: COUNT)
@@ -98,7 +306,7 @@ class __SQL(metaclass=SingletonMeta):
         """
         SELECT COUNT(*) AS CNT FROM ... 같이 단일 값만 반환하는 쿼리.
         """
-        result = query_sql(db, sql)
+        result = self.query(db, sql)
         if not result:
             return None
 
@@ -108,18 +316,18 @@ class __SQL(metaclass=SingletonMeta):
     # 각 테이블의 Row Count 얻기
     def table_row_count(self, db, table_name):
         sql = f"SELECT COUNT(*) AS CNT FROM [{table_name}]"
-        return query_scalar(db, sql)
+        return self.query_scalar(db, sql)
 
     def all_table_row_counts(self, db):
         """
         DB의 모든 테이블에 대해 Row Count 반환
         { "TableA": 123, "TableB": 4421, ... }
         """
-        tables = [t.Name for t in db.TableDefs if not t.Name.startswith("MSys")]
+        tables = DbCtrl.list_tables(db)
 
         counts = {}
         for tbl in tables:
-            cnt = table_row_count(db, tbl)
+            cnt = self.table_row_count(db, tbl)
             counts[tbl] = cnt
         return counts
 
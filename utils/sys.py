@@ -111,8 +111,10 @@ def get_drive_label(drive_letter):
 
 def list_removable_drive_labels():
     """USB / SD Card 만 출력"""
-    kernel32 = ctypes.windll.kernel32
     labels = {}
+    if not hasattr(ctypes, "windll"): # Windows 가 아니면 (CI 등) 외장 드라이브 없음
+        return labels
+    kernel32 = ctypes.windll.kernel32
 
     bitmask = kernel32.GetLogicalDrives()
 
@@ -134,7 +136,7 @@ def choose_external_drive_name(): # The earliest detected one
         if drive.lower() < selected.lower(): 
             selected = drive
 
-    print("selected drive: %s" % (drive)) # E
+    print("selected drive: %s" % (selected)) # E
     return selected
     
 # -----------------------
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# - Matching 용 문자열 정규화
+#
+#   NFKC → lower → strip → 공백( \t\r\n) 과 구두점(. ; : ! ? ' " / _ \ - |) 제거 → 앞 length 글자
+#   (), [], {}, "," 는 남긴다.
+# 공백/구두점 제거는 미리 compile 한 regex 한 번으로 한다 (예전의 re.sub 두 번과 결과가 같다).
+# str.translate 는 한글 문자열에서 글자마다 table 을 찾느라 이 regex 보다 느리다.
+import re, unicodedata
+from functools import lru_cache
+
+WHITESPACE = " \t\r\n"
+PUNCTUATION = ".;:!?'\"/_\\-|"
+_REMOVE = re.compile("[%s]+" % re.escape(WHITESPACE + PUNCTUATION))
+
+# 규칙이 바뀌면 저장된 match index 도 다시 만든다 (utils/match_index.py)
+NORMALIZE_RULES = ("NFKC", "lower", "strip", WHITESPACE, PUNCTUATION)
+
+
+def str_normalize(s, length):
+    if not s:
+        return ""
+    return _REMOVE.sub("", unicodedata.normalize("NFKC", s).lower().strip())[:length]
+
+# TYPE, ITEM 처럼 종류가 몇 백 개뿐인 값에 쓴다. MEMO 처럼 거의 다 다른 값에는 쓰지 않는다
+@lru_cache(maxsize=4096)
+def str_normalize_cached(s, length):
+    return str_normalize(s, length)
+
+def normalize_column(values, length):
+    """column 전체를 정규화. 같은 값은 한 번만 계산한다"""
+    memo = {}
+    out = []
+    for v in values:
+        r = memo.get(v)
+        if r is None:
+            r = memo[v] = str_normalize(v, length)
+        out.append(r)
+    return out